@@ -0,0 +1,336 @@
+"""Хранилище контекста диалогов бота.
+
+Раньше история жила в словаре в памяти процесса: не вытеснялась, терялась
+при рестарте и не делилась между репликами. Теперь это подключаемое хранилище:
+
+* ``memory``  — LRU в памяти с вытеснением по числу чатов и неактивности;
+* ``sqlite``  — файл SQLite (локальный запуск, несколько воркеров на одной машине);
+* ``backend`` — таблица bot_conversations в Postgres через API бекенда
+  (несколько реплик бота на разных машинах).
+
+Перед durable-хранилищем можно включить кэш в памяти (CONVERSATION_CACHE_TTL),
+но по умолчанию он выключен: при нескольких репликах кэш отдаёт устаревший
+контекст. Запись идёт с проверкой версии, поэтому параллельные реплики не
+затирают сообщения друг друга. История каждого чата ограничена числом
+сообщений и оценкой токенов.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import httpx
+
+from http_clients import http_clients
+from prompt_budget import message_tokens
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз перечитывать и повторять запись при конфликте версий
+SAVE_ATTEMPTS = 3
+
+
+def trim_history(messages: list[dict], max_messages: int, max_tokens: int) -> list[dict]:
+    """Оставить самые свежие сообщения в пределах лимитов по числу и токенам.
+
+    Последнее сообщение остаётся всегда, даже если оно одно больше лимита.
+    """
+    kept: list[dict] = []
+    tokens = 0
+    for message in reversed(messages[-max_messages:] if max_messages > 0 else messages):
+        tokens += message_tokens(message)
+        if kept and tokens > max_tokens:
+            break
+        kept.append(message)
+    kept.reverse()
+    return kept
+
+
+@dataclass
+class Conversation:
+    messages: list[dict] = field(default_factory=list)
+    # 0 — диалога в хранилище нет
+    version: int = 0
+
+
+class ConversationStore(ABC):
+    """Базовое хранилище: чтение, дописывание с ограничением размера и сброс."""
+
+    def __init__(self, max_messages: int, max_tokens: int, idle_ttl: float):
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        # Диалог без новых сообщений дольше idle_ttl секунд начинается заново (0 — бессрочно)
+        self.idle_ttl = idle_ttl
+
+    async def get(self, chat_id: int) -> list[dict]:
+        """История чата для промта (в хронологическом порядке)."""
+        return (await self.load(chat_id)).messages
+
+    async def append(self, chat_id: int, new_messages: list[dict]) -> list[dict]:
+        """Дописать сообщения, обрезать историю по лимитам и сохранить.
+
+        При конфликте версий (диалог параллельно изменила другая реплика)
+        перечитывает диалог и повторяет запись. Возвращает сохранённую историю.
+        """
+        for _attempt in range(SAVE_ATTEMPTS):
+            conversation = await self.load(chat_id)
+            messages = trim_history(conversation.messages + new_messages, self.max_messages, self.max_tokens)
+            if await self.save(chat_id, messages, conversation.version) is not None:
+                return messages
+        logger.warning("Не удалось сохранить диалог %s: конфликт версий %s раза подряд", chat_id, SAVE_ATTEMPTS)
+        return messages
+
+    @abstractmethod
+    async def load(self, chat_id: int) -> Conversation:
+        """Сохранённый диалог; отсутствующий или истёкший — пустой."""
+
+    @abstractmethod
+    async def save(self, chat_id: int, messages: list[dict], expected_version: int) -> int | None:
+        """Записать диалог, если его версия всё ещё expected_version.
+
+        Возвращает новую версию или None при конфликте.
+        """
+
+    @abstractmethod
+    async def reset(self, chat_id: int) -> None:
+        """Забыть диалог (/start, /reset)."""
+
+    async def close(self) -> None:
+        """Освободить ресурсы хранилища при остановке бота."""
+
+
+class MemoryConversationStore(ConversationStore):
+    """LRU в памяти процесса: не больше max_chats диалогов, истёкшие вытесняются."""
+
+    def __init__(self, max_messages: int, max_tokens: int, idle_ttl: float, max_chats: int):
+        super().__init__(max_messages, max_tokens, idle_ttl)
+        self.max_chats = max_chats
+        # chat_id -> (messages, version, monotonic-время последней записи)
+        self._entries: OrderedDict[int, tuple[list[dict], int, float]] = OrderedDict()
+
+    def peek(self, chat_id: int) -> Conversation | None:
+        """Диалог, если он есть и не истёк; None — нет в памяти."""
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return None
+        messages, version, saved_at = entry
+        if self.idle_ttl and time.monotonic() - saved_at > self.idle_ttl:
+            del self._entries[chat_id]
+            return None
+        self._entries.move_to_end(chat_id)
+        return Conversation(list(messages), version)
+
+    def put(self, chat_id: int, messages: list[dict], version: int) -> None:
+        self._entries[chat_id] = (list(messages), version, time.monotonic())
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self.max_chats:
+            self._entries.popitem(last=False)
+
+    async def load(self, chat_id: int) -> Conversation:
+        return self.peek(chat_id) or Conversation()
+
+    async def save(self, chat_id: int, messages: list[dict], expected_version: int) -> int | None:
+        current = self.peek(chat_id)
+        if (current.version if current else 0) != expected_version:
+            return None
+        self.put(chat_id, messages, expected_version + 1)
+        return expected_version + 1
+
+    async def reset(self, chat_id: int) -> None:
+        self._entries.pop(chat_id, None)
+
+
+class SqliteConversationStore(ConversationStore):
+    """Диалоги в файле SQLite (WAL), общем для воркеров на одной машине.
+
+    sqlite3 синхронный, поэтому запросы выполняются в пуле потоков.
+    """
+
+    # Как часто удалять истёкшие диалоги из файла, секунды
+    PURGE_INTERVAL = 3600
+
+    def __init__(self, max_messages: int, max_tokens: int, idle_ttl: float, path: str):
+        super().__init__(max_messages, max_tokens, idle_ttl)
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        # Одно соединение на процесс; sqlite3.Connection нельзя использовать из двух потоков сразу
+        self._lock = asyncio.Lock()
+        self._purged_at = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversations (
+                    chat_id INTEGER PRIMARY KEY,
+                    messages TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, func, *args):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+    def _load_sync(self, chat_id: int) -> Conversation:
+        row = self._connect().execute(
+            "SELECT messages, version, updated_at FROM conversations WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        if row is None:
+            return Conversation()
+        messages, version, updated_at = row
+        if self.idle_ttl and time.time() - updated_at > self.idle_ttl:
+            # Версию сохраняем: следующая запись перезапишет строку без конфликта
+            return Conversation([], version)
+        return Conversation(json.loads(messages), version)
+
+    def _save_sync(self, chat_id: int, messages: list[dict], expected_version: int) -> int | None:
+        connection = self._connect()
+        now = time.time()
+        payload = json.dumps(messages, ensure_ascii=False, separators=(",", ":"))
+        if expected_version == 0:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO conversations (chat_id, messages, version, updated_at) VALUES (?, ?, 1, ?)",
+                (chat_id, payload, now),
+            )
+        else:
+            cursor = connection.execute(
+                "UPDATE conversations SET messages = ?, version = version + 1, updated_at = ? "
+                "WHERE chat_id = ? AND version = ?",
+                (payload, now, chat_id, expected_version),
+            )
+        if self.idle_ttl and now - self._purged_at > self.PURGE_INTERVAL:
+            self._purged_at = now
+            connection.execute("DELETE FROM conversations WHERE updated_at < ?", (now - self.idle_ttl,))
+        return expected_version + 1 if cursor.rowcount == 1 else None
+
+    def _reset_sync(self, chat_id: int) -> None:
+        self._connect().execute("DELETE FROM conversations WHERE chat_id = ?", (chat_id,))
+
+    async def load(self, chat_id: int) -> Conversation:
+        return await self._run(self._load_sync, chat_id)
+
+    async def save(self, chat_id: int, messages: list[dict], expected_version: int) -> int | None:
+        return await self._run(self._save_sync, chat_id, messages, expected_version)
+
+    async def reset(self, chat_id: int) -> None:
+        await self._run(self._reset_sync, chat_id)
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class BackendConversationStore(ConversationStore):
+    """Диалоги в Postgres бекенда (/api/bot/conversations) — общие для всех реплик."""
+
+    def __init__(self, max_messages: int, max_tokens: int, idle_ttl: float, backend_url: str):
+        super().__init__(max_messages, max_tokens, idle_ttl)
+        self.backend_url = backend_url.rstrip("/")
+
+    def _url(self, chat_id: int) -> str:
+        return f"{self.backend_url}/api/bot/conversations/{chat_id}"
+
+    async def load(self, chat_id: int) -> Conversation:
+        params = {"max_idle_seconds": int(self.idle_ttl)} if self.idle_ttl >= 1 else None
+        response = await http_clients.get("backend").get(self._url(chat_id), params=params)
+        response.raise_for_status()
+        data = response.json()
+        return Conversation(data["messages"], data["version"])
+
+    async def save(self, chat_id: int, messages: list[dict], expected_version: int) -> int | None:
+        response = await http_clients.get("backend").put(
+            self._url(chat_id),
+            json={"messages": messages, "expected_version": expected_version},
+        )
+        if response.status_code == httpx.codes.CONFLICT:
+            return None
+        response.raise_for_status()
+        return response.json()["version"]
+
+    async def reset(self, chat_id: int) -> None:
+        response = await http_clients.get("backend").delete(self._url(chat_id))
+        response.raise_for_status()
+
+
+class TieredConversationStore(ConversationStore):
+    """Кэш в памяти перед durable-хранилищем.
+
+    Запись всегда идёт в durable-хранилище с проверкой версии, кэш лишь
+    экономит чтения в пределах cache_ttl.
+    """
+
+    def __init__(self, cache: MemoryConversationStore, durable: ConversationStore):
+        super().__init__(durable.max_messages, durable.max_tokens, durable.idle_ttl)
+        self.cache = cache
+        self.durable = durable
+
+    async def load(self, chat_id: int) -> Conversation:
+        conversation = self.cache.peek(chat_id)
+        if conversation is None:
+            conversation = await self.durable.load(chat_id)
+            self.cache.put(chat_id, conversation.messages, conversation.version)
+        return conversation
+
+    async def save(self, chat_id: int, messages: list[dict], expected_version: int) -> int | None:
+        version = await self.durable.save(chat_id, messages, expected_version)
+        if version is None:
+            # В кэше устаревшая версия — следующая попытка перечитает durable-хранилище
+            await self.cache.reset(chat_id)
+        else:
+            self.cache.put(chat_id, messages, version)
+        return version
+
+    async def reset(self, chat_id: int) -> None:
+        await self.cache.reset(chat_id)
+        await self.durable.reset(chat_id)
+
+    async def close(self) -> None:
+        await self.durable.close()
+
+
+def create_conversation_store() -> ConversationStore:
+    """Хранилище по переменным окружения (читаются при вызове, после load_dotenv)."""
+    kind = os.getenv("CONVERSATION_STORE", "memory").lower()
+    # Лимиты на диалог: число сообщений и оценка токенов
+    max_messages = int(os.getenv("CONVERSATION_MAX_MESSAGES", "15"))
+    max_tokens = int(os.getenv("CONVERSATION_MAX_TOKENS", "3000"))
+    # Диалог без сообщений дольше этого начинается заново, секунды (0 — бессрочно)
+    idle_ttl = float(os.getenv("CONVERSATION_IDLE_TTL", str(7 * 24 * 3600)))
+    max_chats = int(os.getenv("CONVERSATION_MAX_CHATS", "10000"))
+
+    if kind == "memory":
+        return MemoryConversationStore(max_messages, max_tokens, idle_ttl, max_chats)
+    if kind == "sqlite":
+        durable: ConversationStore = SqliteConversationStore(
+            max_messages, max_tokens, idle_ttl, os.getenv("CONVERSATION_SQLITE_PATH", "conversations.sqlite3")
+        )
+    elif kind == "backend":
+        durable = BackendConversationStore(
+            max_messages, max_tokens, idle_ttl, os.getenv("BACKEND_URL", "http://localhost:8000")
+        )
+    else:
+        raise RuntimeError(f"Неизвестное CONVERSATION_STORE={kind!r}: ожидается memory, sqlite или backend")
+
+    cache_ttl = float(os.getenv("CONVERSATION_CACHE_TTL", "0"))
+    if cache_ttl <= 0:
+        return durable
+    return TieredConversationStore(
+        MemoryConversationStore(max_messages, max_tokens, cache_ttl, max_chats), durable
+    )
@@ -0,0 +1,63 @@
+"""Общие httpx-клиенты бота: Timeweb AI и бекенд CRM.
+
+Клиенты создаются в post_init и закрываются в post_shutdown, соединения
+переиспользуются между сообщениями (keep-alive), поэтому TLS-рукопожатие
+с Timeweb не платится на каждый ответ.
+"""
+
+import importlib.util
+import os
+
+import httpx
+
+# HTTP/2 включаем, только если установлен пакет h2 (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# Апстрим -> (таймаут ответа в секундах, максимум соединений)
+UPSTREAMS = {
+    "timeweb": (
+        float(os.getenv("TIMEWEB_TIMEOUT", "40")),
+        int(os.getenv("TIMEWEB_MAX_CONNECTIONS", "20")),
+    ),
+    "backend": (
+        float(os.getenv("BACKEND_TIMEOUT", "10")),
+        int(os.getenv("BACKEND_MAX_CONNECTIONS", "10")),
+    ),
+}
+
+
+class HttpClientRegistry:
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def open(self) -> None:
+        for name in UPSTREAMS:
+            self.get(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            timeout, max_connections = UPSTREAMS[name]
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                http2=HTTP2_AVAILABLE,
+            )
+            self._clients[name] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+http_clients = HttpClientRegistry()
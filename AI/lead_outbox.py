@@ -0,0 +1,303 @@
+"""Фоновая отправка заявок в бекенд (outbox).
+
+Раньше handle_message ждал PUT заявки в бекенд до ответа клиенту, и каждый
+ответ Азизы задерживался на запросы к бекенду и их ретраи. Теперь заявка
+кладётся в outbox и клиенту сразу уходит ответ, а фоновый воркер:
+
+* склеивает обновления одного чата в один upsert (поля — последние,
+  сообщения — все по порядку);
+* отправляет пачками до OUTBOX_BATCH_SIZE чатов параллельно;
+* при недоступном бекенде повторяет с экспоненциальной задержкой.
+
+Каждая заявка сначала дописывается в локальный журнал (JSONL), а после
+успешной отправки в журнал пишется подтверждение. При перезапуске
+неподтверждённые заявки читаются из журнала и отправляются снова; повтор
+уже сохранённых сообщений бекенд отбрасывает по их id.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import uuid
+from dataclasses import dataclass, field
+
+import httpx
+
+from http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых повтор не поможет: заявка отбрасывается
+PERMANENT_STATUSES = {400, 404, 409, 422}
+
+
+@dataclass
+class PendingLead:
+    """Склеенные обновления заявки одного чата."""
+
+    data: dict
+    # Номер последней записи журнала, вошедшей в заявку
+    seq: int
+    attempts: int = 0
+    # Один ключ на одно содержимое: ретраи той же заявки не применяются дважды
+    idempotency_key: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    def merge(self, data: dict, seq: int) -> None:
+        """Дописать более позднее обновление того же чата."""
+        messages = self.data.get("messages", []) + data.get("messages", [])
+        budget = data.get("budget") or self.data.get("budget")
+        self.data = {**self.data, **data, "messages": messages, "budget": budget}
+        self.seq = max(self.seq, seq)
+        self.idempotency_key = uuid.uuid4().hex
+
+
+class LeadOutbox:
+    def __init__(
+        self,
+        backend_url: str,
+        journal_path: str,
+        max_pending: int,
+        batch_size: int,
+        retry_base: float,
+        retry_max: float,
+        compact_every: int,
+    ):
+        self.backend_url = backend_url.rstrip("/")
+        self.journal_path = journal_path
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.compact_every = compact_every
+
+        # chat_id -> заявка, ещё не взятая воркером; ключи совпадают с chat_id в очереди
+        self._pending: dict[int, PendingLead] = {}
+        # Очередь chat_id; чат попадает в неё один раз, пока его заявка ждёт отправки
+        self._queue: asyncio.Queue[int] | None = None
+        # Чаты, чьи заявки не поместились в очередь и есть только в журнале.
+        # Их новые заявки тоже идут только в журнал, иначе подтверждение более
+        # поздней заявки пометило бы отложенную как отправленную.
+        self._deferred: set[int] = set()
+        self._worker: asyncio.Task | None = None
+        self._journal = None
+        self._seq = 0
+        self._acks_since_compact = 0
+        self._failures = 0
+
+        # Метрики для логов и отладки
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.retries = 0
+
+    # --- жизненный цикл ---------------------------------------------------
+
+    async def start(self) -> None:
+        """Поднять неотправленные заявки из журнала и запустить воркер."""
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._compact()
+        self._enqueue_all(self._replay_journal())
+        if self._pending:
+            logger.info("Outbox: из журнала восстановлено заявок: %s", len(self._pending))
+        self._worker = asyncio.create_task(self._run(), name="lead-outbox")
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Дослать накопленное за timeout секунд; остальное останется в журнале."""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox: при остановке не отправлено заявок: %s (остались в журнале)", len(self._pending))
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    # --- постановка в очередь ---------------------------------------------
+
+    def submit(self, chat_id: int, data: dict) -> None:
+        """Поставить заявку чата на отправку. Не ждёт бекенд и не бросает исключений."""
+        self._seq += 1
+        self._write_journal({"op": "put", "seq": self._seq, "chat_id": chat_id, "data": data})
+
+        lead = self._pending.get(chat_id)
+        if lead is not None:
+            lead.merge(data, self._seq)
+            self.coalesced += 1
+            return
+        if self._queue is None or self._queue.full() or chat_id in self._deferred:
+            # Переполнение: заявка остаётся только в журнале, воркер дочитает её позже
+            self._deferred.add(chat_id)
+            self.dropped += 1
+            logger.warning("Outbox переполнен (%s чатов), заявка чата %s отложена в журнал", self.max_pending, chat_id)
+            return
+        self._pending[chat_id] = PendingLead(data, self._seq)
+        self._queue.put_nowait(chat_id)
+
+    def _enqueue_all(self, leads: dict[int, PendingLead]) -> None:
+        for chat_id, lead in leads.items():
+            if self._queue.full():
+                self._deferred.add(chat_id)
+                continue
+            self._pending[chat_id] = lead
+            self._queue.put_nowait(chat_id)
+
+    # --- воркер -----------------------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            chat_ids = [await self._queue.get()]
+            while len(chat_ids) < self.batch_size and not self._queue.empty():
+                chat_ids.append(self._queue.get_nowait())
+
+            batch = {chat_id: self._pending.pop(chat_id) for chat_id in chat_ids}
+            results = await asyncio.gather(*(self._send(chat_id, lead) for chat_id, lead in batch.items()))
+
+            failed = 0
+            for (chat_id, lead), ok in zip(batch.items(), results):
+                if ok:
+                    self._ack(chat_id, lead.seq)
+                else:
+                    failed += 1
+                    self._requeue(chat_id, lead)
+            for _ in chat_ids:
+                self._queue.task_done()
+
+            if failed == len(batch):
+                # Бекенд лежит целиком — ждём перед следующей пачкой
+                self._failures += 1
+                delay = min(self.retry_max, self.retry_base * 2 ** (self._failures - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            else:
+                self._failures = 0
+            if self._acks_since_compact >= self.compact_every:
+                self._compact()
+            if self._deferred and self._queue.empty():
+                # Очередь разобрана — дочитываем из журнала то, что в неё не поместилось
+                self._deferred.clear()
+                self._enqueue_all(self._replay_journal())
+
+    async def _send(self, chat_id: int, lead: PendingLead) -> bool:
+        """PUT заявки чата. False — повторить позже."""
+        try:
+            response = await http_clients.get("backend").put(
+                f"{self.backend_url}/api/applications/telegram/{chat_id}",
+                json=lead.data,
+                headers={"Idempotency-Key": lead.idempotency_key},
+            )
+            if response.status_code in PERMANENT_STATUSES:
+                logger.error(
+                    "Бекенд отклонил заявку чата %s: %s %s", chat_id, response.status_code, response.text
+                )
+                return True
+            response.raise_for_status()
+            self.sent += 1
+            return True
+        except (httpx.ConnectError, httpx.ReadError, httpx.TimeoutException) as e:
+            logger.warning(f"Бекенд недоступен ({self.backend_url}): {e}. Заявка чата {chat_id} будет отправлена позже.")
+        except Exception as e:
+            logger.exception(f"Ошибка при отправке заявки чата {chat_id} в бекенд: {e}")
+        return False
+
+    def _requeue(self, chat_id: int, lead: PendingLead) -> None:
+        self.retries += 1
+        lead.attempts += 1
+        newer = self._pending.get(chat_id)
+        if newer is not None:
+            # Пока шла отправка, пришли новые сообщения: старые идут первыми
+            lead.merge(newer.data, newer.seq)
+            self._pending[chat_id] = lead
+            return
+        if self._queue.full():
+            self._deferred.add(chat_id)
+            return
+        self._pending[chat_id] = lead
+        self._queue.put_nowait(chat_id)
+
+    # --- журнал -----------------------------------------------------------
+
+    def _write_journal(self, record: dict) -> None:
+        try:
+            if self._journal is None:
+                self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._journal.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._journal.flush()
+        except OSError as e:
+            logger.warning(f"Не удалось записать журнал outbox {self.journal_path}: {e}")
+
+    def _ack(self, chat_id: int, seq: int) -> None:
+        self._write_journal({"op": "ack", "seq": seq, "chat_id": chat_id})
+        self._acks_since_compact += 1
+
+    def _replay_journal(self) -> dict[int, PendingLead]:
+        """Неподтверждённые заявки из журнала, склеенные по чатам."""
+        puts: list[dict] = []
+        acked: dict[int, int] = {}
+        try:
+            with open(self.journal_path, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Оборванная последняя строка после аварийной остановки
+                        continue
+                    if record["op"] == "put":
+                        puts.append(record)
+                    else:
+                        acked[record["chat_id"]] = max(acked.get(record["chat_id"], 0), record["seq"])
+        except FileNotFoundError:
+            return {}
+
+        leads: dict[int, PendingLead] = {}
+        for record in puts:
+            chat_id, seq = record["chat_id"], record["seq"]
+            self._seq = max(self._seq, seq)
+            if seq <= acked.get(chat_id, 0):
+                continue
+            if chat_id in leads:
+                leads[chat_id].merge(record["data"], seq)
+            else:
+                leads[chat_id] = PendingLead(record["data"], seq)
+        return leads
+
+    def _compact(self) -> None:
+        """Переписать журнал, оставив только неподтверждённые заявки (склеенными по чатам)."""
+        leads = self._replay_journal()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        tmp_path = f"{self.journal_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as journal:
+                for chat_id, lead in leads.items():
+                    record = {"op": "put", "seq": lead.seq, "chat_id": chat_id, "data": lead.data}
+                    journal.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            os.replace(tmp_path, self.journal_path)
+        except OSError as e:
+            logger.warning(f"Не удалось сжать журнал outbox {self.journal_path}: {e}")
+        self._acks_since_compact = 0
+
+
+def create_lead_outbox(backend_url: str) -> LeadOutbox:
+    """Outbox по переменным окружения (читаются при вызове, после load_dotenv)."""
+    return LeadOutbox(
+        backend_url=backend_url,
+        journal_path=os.getenv("OUTBOX_JOURNAL_PATH", "lead_outbox.jsonl"),
+        # Сколько разных чатов может ждать отправки одновременно
+        max_pending=int(os.getenv("OUTBOX_MAX_PENDING", "1000")),
+        batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "20")),
+        retry_base=float(os.getenv("OUTBOX_RETRY_BASE", "1")),
+        retry_max=float(os.getenv("OUTBOX_RETRY_MAX", "60")),
+        # Сжатие журнала после стольких подтверждений
+        compact_every=int(os.getenv("OUTBOX_COMPACT_EVERY", "500")),
+    )
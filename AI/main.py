@@ -1,14 +1,15 @@
 import asyncio
 import logging
 import os
+import uuid
 from datetime import datetime
 
-import httpx
 from dotenv import load_dotenv
 from telegram import Update
 from telegram.constants import ChatAction
 from telegram.error import Conflict
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     ContextTypes,
     MessageHandler,
@@ -16,6 +17,13 @@ from telegram.ext import (
     filters,
 )
 
+from conversation_store import create_conversation_store
+from http_clients import http_clients
+from lead_outbox import create_lead_outbox
+from prompt_budget import compact_whitespace, estimate_tokens, fit_history
+from update_processor import ChatOrderedUpdateProcessor
+from webhook import TelegramWebhookApp
+
 
 load_dotenv()
 
@@ -31,6 +39,29 @@ TIMEWEB_API_TOKEN = os.getenv("TIMEWEB_API_TOKEN", "")
 # URL бекенда для отправки заявок
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 
+# Сколько апдейтов (разных чатов) обрабатывать одновременно; сообщения одного чата — всегда по очереди
+UPDATES_MAX_CONCURRENT = int(os.getenv("UPDATES_MAX_CONCURRENT", "16"))
+# Как часто писать в лог метрики очереди апдейтов, секунды
+UPDATES_STATS_INTERVAL = float(os.getenv("UPDATES_STATS_INTERVAL", "60"))
+
+# Режим получения апдейтов: polling (по умолчанию) или webhook (ASGI, несколько реплик)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+# Публичный URL webhook, например https://bot.example.com/webhook; пустой — регистрируется снаружи
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Секрет, который Telegram присылает в X-Telegram-Bot-Api-Secret-Token (A-Z, a-z, 0-9, _ и -)
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Сколько принятых апдейтов может ждать обработки, дальше — 503 и повтор со стороны Telegram
+WEBHOOK_MAX_QUEUE = int(os.getenv("WEBHOOK_MAX_QUEUE", "1000"))
+# Сколько параллельных соединений Telegram открывает к webhook (1–100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Бюджет запроса к Timeweb в токенах: промт Азизы, память, история и вопрос.
+# Не поместившиеся старые сообщения сворачиваются в строку памяти (имя, стадия)
+PROMPT_BUDGET_TOKENS = int(os.getenv("PROMPT_BUDGET_TOKENS", "3500"))
+
 if not TELEGRAM_BOT_TOKEN:
     raise RuntimeError(
         "Пожалуйста, задайте переменную окружения TELEGRAM_BOT_TOKEN "
@@ -255,9 +286,38 @@ Body & Mind — расширенно
 
 """
 
+# Промт уходит в каждом запросе — без пустых строк и хвостовых пробелов
+PROMPT_AZIZA_COMPACT = compact_whitespace(PROMPT_AZIZA)
+
+# Стадия заявки -> как её описать Азизе в строке памяти
+STAGE_MEMORY = {
+    "inquiry": "интересуется форматами и ценами",
+    "trial": "хочет записаться на пробное занятие",
+    "sale": "говорит об оплате",
+}
+
 
-# Простая память диалогов в оперативке (по chat_id)
-chat_history: dict[int, list[dict]] = {}
+# Контекст диалогов по chat_id: память, SQLite или бекенд (см. CONVERSATION_STORE)
+conversations = create_conversation_store()
+
+# Заявки уходят в бекенд фоном, ответ клиенту их не ждёт
+lead_outbox = create_lead_outbox(BACKEND_URL)
+
+
+async def load_history(chat_id: int) -> list[dict]:
+    """История чата; если хранилище недоступно — отвечаем без контекста."""
+    try:
+        return await conversations.get(chat_id)
+    except Exception as e:
+        logger.warning(f"Не удалось загрузить историю диалога {chat_id}: {e}")
+        return []
+
+
+async def reset_history(chat_id: int) -> None:
+    try:
+        await conversations.reset(chat_id)
+    except Exception as e:
+        logger.warning(f"Не удалось сбросить историю диалога {chat_id}: {e}")
 
 
 def get_tashkent_datetime() -> str:
@@ -288,8 +348,8 @@ def get_tashkent_datetime() -> str:
 async def start(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик /start: обнуляем память диалога и начинаем сначала."""
     chat_id = update.effective_chat.id
-    # Полностью очищаем локальную историю для этого чата
-    chat_history.pop(chat_id, None)
+    # Полностью очищаем историю этого чата
+    await reset_history(chat_id)
 
     # Небольшое приветствие, дальше всё ведёт агент Азиза
     text = (
@@ -304,7 +364,7 @@ async def start(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
 async def reset(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик /reset: ручной сброс памяти по запросу пользователя."""
     chat_id = update.effective_chat.id
-    chat_history.pop(chat_id, None)
+    await reset_history(chat_id)
     message = update.message or update.business_message
     if message:
         await message.reply_text(
@@ -384,13 +444,23 @@ def extract_name_from_history(history: list[dict]) -> str | None:
     return None
 
 
-async def send_application_to_backend(
+def summarize_history(dropped: list[dict]) -> str:
+    """Строка памяти вместо ранних сообщений, не поместившихся в бюджет промта."""
+    facts = [f"ранние сообщения ({len(dropped)}) опущены, приветствие уже было"]
+    name = extract_name_from_history(dropped)
+    if name:
+        facts.append(f"клиента зовут {name}")
+    facts.append(f"клиент {STAGE_MEMORY[detect_stage('', dropped)]}")
+    return "🧠 ПАМЯТЬ О ДИАЛОГЕ: " + "; ".join(facts) + "."
+
+
+def send_application_to_backend(
     chat_id: int,
     user_text: str,
     history: list[dict],
     username: str | None = None,
 ) -> bool:
-    """Отправить заявку в бекенд"""
+    """Поставить заявку в очередь на отправку в бекенд (не ждёт ответа бекенда)"""
     try:
         stage = detect_stage(user_text, history)
 
@@ -400,20 +470,18 @@ async def send_application_to_backend(
             # Если имени нет, используем username или "Клиент"
             name = username or "Клиент"
 
-        # Формируем историю чата для отправки - сохраняем ВСЮ историю
-        # Используем всю историю из chat_history (не ограничиваем 10 сообщениями)
-        chat_messages = []
-        for i, msg in enumerate(history, 1):  # ВСЯ история, не только последние 10
-            # Создаем уникальный ID на основе индекса и содержимого
-            msg_id = f"{chat_id}_{i}_{hash(msg.get('content', '')) % 1000000}"
-            chat_messages.append(
-                {
-                    "id": msg_id,
-                    "role": msg.get("role", "user"),
-                    "content": msg.get("content", ""),
-                    "timestamp": datetime.now().strftime("%H:%M"),
-                }
-            )
+        # Отправляем только новые сообщения (вопрос пользователя и ответ ассистента):
+        # бекенд хранит историю в отдельной таблице и дописывает её, а не перезаписывает
+        timestamp = datetime.now().strftime("%H:%M")
+        new_messages = [
+            {
+                "id": f"{chat_id}_{uuid.uuid4().hex}",
+                "role": msg.get("role", "user"),
+                "content": msg.get("content", ""),
+                "timestamp": timestamp,
+            }
+            for msg in history[-2:]
+        ]
 
         # Определяем бюджет (если есть в сообщении)
         budget = None
@@ -430,82 +498,19 @@ async def send_application_to_backend(
             "name": name,
             "username": username or f"@{name.lower().replace(' ', '_')}",
             "phone": None,
-            "platform": "telegram",
             "stage": stage,
             "message": user_text,
             "budget": budget,
             "owner": "CRM-бот",
-            "chat_history": chat_messages,
-            "telegram_chat_id": chat_id,
+            "messages": new_messages,
         }
 
-        async with httpx.AsyncClient(
-            timeout=httpx.Timeout(10.0, connect=5.0)
-        ) as client:
-            # Проверяем, есть ли уже заявка для этого chat_id
-            try:
-                check_response = await client.get(
-                    f"{BACKEND_URL}/api/applications/telegram/{chat_id}"
-                )
-                if check_response.status_code == 200:
-                    # Обновляем существующую заявку
-                    app_data = check_response.json()
-                    update_data = {
-                        "stage": stage,
-                        "message": user_text,
-                        "budget": budget,
-                        "chat_history": chat_messages,
-                    }
-                    response = await client.patch(
-                        f"{BACKEND_URL}/api/applications/{app_data['id']}",
-                        json=update_data,
-                    )
-                else:
-                    # Создаем новую заявку
-                    response = await client.post(
-                        f"{BACKEND_URL}/api/applications",
-                        json=application_data,
-                    )
-            except (
-                httpx.HTTPStatusError,
-                httpx.ConnectError,
-                httpx.ReadError,
-                httpx.TimeoutException,
-            ):
-                # Если заявки нет или ошибка подключения, пробуем создать новую
-                try:
-                    response = await client.post(
-                        f"{BACKEND_URL}/api/applications",
-                        json=application_data,
-                    )
-                    response.raise_for_status()
-                    logger.info(
-                        f"Заявка успешно создана в бекенд: {response.status_code}"
-                    )
-                    return True
-                except (
-                    httpx.ConnectError,
-                    httpx.ReadError,
-                    httpx.TimeoutException,
-                ) as conn_err:
-                    logger.warning(
-                        f"Бекенд недоступен ({BACKEND_URL}): {conn_err}. Заявка не сохранена, но бот продолжает работать."
-                    )
-                    return False
-                except Exception as create_err:
-                    logger.warning(f"Ошибка при создании заявки: {create_err}")
-                    return False
-
-            response.raise_for_status()
-            logger.info(f"Заявка успешно отправлена в бекенд: {response.status_code}")
-            return True
-    except (httpx.ConnectError, httpx.ReadError, httpx.TimeoutException) as e:
-        logger.warning(
-            f"Бекенд недоступен ({BACKEND_URL}): {e}. Заявка не сохранена, но бот продолжает работать."
-        )
-        return False
+        # Один PUT создаёт заявку чата или обновляет существующую; outbox склеивает
+        # обновления чата, ждущие отправки, и повторяет их, пока бекенд недоступен
+        lead_outbox.submit(chat_id, application_data)
+        return True
     except Exception as e:
-        logger.exception(f"Ошибка при отправке заявки в бекенд: {e}")
+        logger.exception(f"Ошибка при подготовке заявки для бекенда: {e}")
         return False
 
 
@@ -590,64 +595,75 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         logger.warning(f"Не удалось отправить chat_action: {e}. Продолжаем обработку.")
 
     # Собираем историю сообщений для более естественного диалога
-    history = chat_history.get(chat_id, [])
-    history.append({"role": "user", "content": user_text})
-
-    # Ограничим историю последними 15 сообщениями, чтобы не раздувать запрос
-    history = history[-15:]
+    # (хранилище уже ограничивает её по числу сообщений и токенам)
+    user_message = {"role": "user", "content": user_text}
+    history = await load_history(chat_id) + [user_message]
 
     # Получаем текущую дату и время в Ташкенте
     current_datetime = get_tashkent_datetime()
 
     # Формируем системный промт с актуальной информацией о дате/времени
     system_prompt_with_datetime = (
-        f"{PROMPT_AZIZA}\n\n"
+        f"{PROMPT_AZIZA_COMPACT}\n"
         f"📅 ТЕКУЩАЯ ДАТА И ВРЕМЯ: {current_datetime}\n"
         f"Используй эту информацию для предложения актуального расписания."
     )
 
-    # Добавляем системный промт перед историей
-    messages = [{"role": "system", "content": system_prompt_with_datetime}] + history
+    # Укладываем запрос в бюджет токенов: ранние сообщения сворачиваются в строку памяти
+    system_prompt, prompt_history = fit_history(
+        system_prompt_with_datetime, history[:-1], user_text, PROMPT_BUDGET_TOKENS, summarize_history
+    )
+    messages = [{"role": "system", "content": system_prompt}] + prompt_history + [user_message]
+    logger.info(
+        "Промт: ~%s токенов, история %s из %s сообщений",
+        sum(estimate_tokens(m["content"]) for m in messages),
+        len(prompt_history),
+        len(history) - 1,
+    )
 
     try:
-        async with httpx.AsyncClient(timeout=40.0) as client:
-            # OpenAI-совместимый endpoint агента: /api/v1/cloud-ai/agents/{agent_access_id}/v1/chat/completions
-            url = (
-                "https://agent.timeweb.cloud"
-                f"/api/v1/cloud-ai/agents/{TIMEWEB_AGENT_ID}/v1/chat/completions"
-            )
-            response = await client.post(
-                url,
-                headers={
-                    "Authorization": f"Bearer {TIMEWEB_API_TOKEN}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    # model здесь по доке игнорируется, но оставляем для совместимости
-                    "model": "gpt-4",
-                    "messages": messages,
-                },
-            )
-            logger.info(
-                "Timeweb status=%s body=%s", response.status_code, response.text
-            )
-            response.raise_for_status()
-            data = response.json()
-            reply_text = (
-                data["choices"][0]["message"]["content"].strip()
-                if data.get("choices")
-                else "Извините, не удалось получить ответ. Попробуйте ещё раз."
-            )
+        client = http_clients.get("timeweb")
+        # OpenAI-совместимый endpoint агента: /api/v1/cloud-ai/agents/{agent_access_id}/v1/chat/completions
+        url = (
+            "https://agent.timeweb.cloud"
+            f"/api/v1/cloud-ai/agents/{TIMEWEB_AGENT_ID}/v1/chat/completions"
+        )
+        response = await client.post(
+            url,
+            headers={
+                "Authorization": f"Bearer {TIMEWEB_API_TOKEN}",
+                "Content-Type": "application/json",
+            },
+            json={
+                # model здесь по доке игнорируется, но оставляем для совместимости
+                "model": "gpt-4",
+                "messages": messages,
+            },
+        )
+        logger.info(
+            "Timeweb status=%s body=%s", response.status_code, response.text
+        )
+        response.raise_for_status()
+        data = response.json()
+        reply_text = (
+            data["choices"][0]["message"]["content"].strip()
+            if data.get("choices")
+            else "Извините, не удалось получить ответ. Попробуйте ещё раз."
+        )
     except Exception as e:
         logger.exception("Ошибка при обращении к Timeweb AI: %s", e)
         reply_text = "Извините, сейчас на стороне сервера есть техническая пауза. Попробуйте, пожалуйста, ещё раз чуть позже."
 
-    # Добавляем ответ ассистента в историю
-    history.append({"role": "assistant", "content": reply_text})
-    chat_history[chat_id] = history
+    # Сохраняем вопрос и ответ в историю
+    assistant_message = {"role": "assistant", "content": reply_text}
+    try:
+        history = await conversations.append(chat_id, [user_message, assistant_message])
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить историю диалога {chat_id}: {e}")
+        history.append(assistant_message)
 
-    # Отправляем заявку в бекенд (асинхронно, не блокируем ответ)
-    await send_application_to_backend(chat_id, user_text, history, username)
+    # Ставим заявку в очередь на отправку в бекенд (не блокирует ответ)
+    send_application_to_backend(chat_id, user_text, history, username)
 
     # Отвечаем на сообщение
     # Для бизнес-сообщений reply_text должен работать автоматически
@@ -673,7 +689,16 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 
 async def post_init(application) -> None:
-    """Инициализация после создания приложения - удаляем webhook если есть"""
+    """Инициализация после создания приложения - HTTP-клиенты и удаление webhook (в режиме polling)"""
+    # Общие HTTP-клиенты (Timeweb, бекенд) с keep-alive на всё время работы бота
+    http_clients.open()
+    # Фоновая отправка заявок; неотправленные до рестарта поднимаются из журнала
+    await lead_outbox.start()
+
+    # В режиме webhook Updater не создаётся, и webhook удалять нельзя
+    if application.updater is None:
+        return
+
     try:
         # Удаляем webhook несколько раз для надежности
         for attempt in range(3):
@@ -710,11 +735,26 @@ async def error_handler(_update: object, context: ContextTypes.DEFAULT_TYPE) ->
     # Не падаем, просто логируем ошибку
 
 
-def main() -> None:
-    """Точка входа: запуск Telegram-бота."""
-    application = (
-        ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).post_init(post_init).build()
+async def post_shutdown(_application) -> None:
+    """Закрываем хранилище диалогов и общие HTTP-клиенты при остановке бота."""
+    await lead_outbox.stop()
+    await conversations.close()
+    await http_clients.aclose()
+
+
+def build_application(webhook: bool = False) -> Application:
+    """Telegram-приложение с обработчиками; для webhook — без Updater (апдейты приносит ASGI)."""
+    builder = (
+        ApplicationBuilder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        # Медленный ответ Timeweb в одном чате не задерживает остальные чаты
+        .concurrent_updates(ChatOrderedUpdateProcessor(UPDATES_MAX_CONCURRENT, UPDATES_STATS_INTERVAL))
     )
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
 
     # Добавляем обработчик ошибок
     application.add_error_handler(error_handler)
@@ -729,7 +769,36 @@ def main() -> None:
     )
 
     logger.info("Бот настроен для обработки обычных и бизнес-сообщений")
+    return application
+
+
+def create_webhook_app() -> TelegramWebhookApp:
+    """ASGI-приложение webhook: отдельно через uvicorn или app.mount(...) в FastAPI."""
+    if not WEBHOOK_SECRET_TOKEN:
+        raise RuntimeError(
+            "Для режима webhook задайте переменную окружения WEBHOOK_SECRET_TOKEN "
+            "(проверяется в заголовке X-Telegram-Bot-Api-Secret-Token)."
+        )
+    return TelegramWebhookApp(
+        build_application(webhook=True),
+        secret_token=WEBHOOK_SECRET_TOKEN,
+        path=WEBHOOK_PATH,
+        webhook_url=WEBHOOK_URL or None,
+        max_queue=WEBHOOK_MAX_QUEUE,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+    )
+
+
+def main() -> None:
+    """Точка входа: запуск Telegram-бота."""
+    if BOT_MODE == "webhook":
+        import uvicorn
+
+        logger.info(f"Бот запущен в режиме webhook на {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        uvicorn.run(create_webhook_app(), host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+        return
 
+    application = build_application()
     logger.info("Бот запущен. Ожидаю сообщения...")
     application.run_polling(drop_pending_updates=True)
 
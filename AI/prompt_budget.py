@@ -0,0 +1,95 @@
+"""Бюджет промта для запросов к Timeweb.
+
+Задержка и цена ответа растут с числом токенов в запросе, а каждый ход
+бота отправляет полный PROMPT_AZIZA и историю диалога. Здесь промт
+оценивается в токенах и укладывается в бюджет: свежие сообщения остаются
+как есть, более старые сворачиваются в строку памяти (имя клиента, стадия),
+а из системного промта убираются пустые строки.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import math
+import re
+from collections.abc import Callable
+from functools import lru_cache
+
+# Точный подсчёт — если установлен tiktoken (pip install tiktoken), иначе оценка по словам
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+
+# Служебные токены роли и разметки одного сообщения в chat-формате
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]|\n+")
+
+
+@lru_cache
+def _encoding():
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Словарь не скачался (нет сети) — работаем на оценке
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Число токенов в тексте: tiktoken или оценка с запасом.
+
+    Оценка: латиница — ~4 символа на токен, кириллица и прочее — ~3,
+    каждый знак препинания, эмодзи и перевод строки — отдельный токен.
+    """
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    tokens = 0
+    for word in _WORD_RE.findall(text):
+        tokens += math.ceil(len(word) / (4 if word.isascii() else 3))
+    return tokens
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+
+def compact_whitespace(text: str) -> str:
+    """Убрать пробелы в концах строк и пустые строки между абзацами."""
+    lines = (line.rstrip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def fit_history(
+    system_prompt: str,
+    history: list[dict],
+    user_message: str,
+    budget: int,
+    summarize: Callable[[list[dict]], str | None],
+) -> tuple[str, list[dict]]:
+    """Уложить системный промт, историю и запрос в `budget` токенов.
+
+    Оставляет самые свежие сообщения истории; не поместившиеся сворачиваются
+    через `summarize` в строку памяти, которая дописывается к системному
+    промту. Возвращает системный промт и оставшуюся историю.
+    """
+    base = estimate_tokens(system_prompt) + estimate_tokens(user_message) + 2 * MESSAGE_OVERHEAD_TOKENS
+    kept = list(history)
+    used = base + sum(message_tokens(message) for message in kept)
+    dropped: list[dict] = []
+    memory = None
+    while kept:
+        memory = summarize(dropped) if dropped else None
+        if used + (estimate_tokens(memory) if memory else 0) <= budget:
+            break
+        message = kept.pop(0)
+        dropped.append(message)
+        used -= message_tokens(message)
+    else:
+        memory = summarize(dropped) if dropped else None
+
+    if memory:
+        system_prompt = f"{system_prompt}\n\n{memory}"
+    return system_prompt, kept
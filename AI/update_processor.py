@@ -0,0 +1,137 @@
+"""Параллельная обработка апдейтов с порядком внутри чата.
+
+По умолчанию python-telegram-bot обрабатывает апдейты строго по одному, и
+один медленный ответ Timeweb (до 40 с) задерживает все остальные чаты.
+ChatOrderedUpdateProcessor обрабатывает апдейты разных чатов параллельно,
+не больше UPDATES_MAX_CONCURRENT одновременно, а сообщения одного чата —
+строго по очереди, в порядке поступления.
+
+Порядок держится на asyncio.Lock чата: задачи апдейтов создаются в порядке
+поступления и встают в очередь замка в том же порядке (Lock честный, FIFO).
+Глобальный лимит берётся уже внутри замка чата, поэтому всплеск сообщений
+в одном чате ждёт своей очереди, не занимая слоты других чатов.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+from typing import Any, Awaitable
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Лимит базового класса: он берёт семафор до замка чата, поэтому его не используем
+UNLIMITED = 2**31 - 1
+
+
+class _ChatChain:
+    __slots__ = ("lock", "waiting")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Апдейты чата, ожидающие или обрабатываемые сейчас
+        self.waiting = 0
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int, stats_interval: float = 60.0):
+        super().__init__(UNLIMITED)
+        self.limit = max_concurrent_updates
+        self.stats_interval = stats_interval
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # chat_id -> очередь апдейтов чата; удаляется, когда чат обработан
+        self._chains: dict[int, _ChatChain] = {}
+
+        # Метрики очереди (backpressure)
+        self.in_flight = 0
+        # Ждут своей очереди в чате или свободного слота
+        self.waiting = 0
+        self.processed = 0
+        self.peak_waiting = 0
+        self.max_wait = 0.0
+        self._total_wait = 0.0
+        self._reported_at = time.monotonic()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._log_stats()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        # Апдейт без чата (например, подключение бизнес-аккаунта) ограничен только общим лимитом
+        chat = getattr(update, "effective_chat", None)
+        chain = None
+        if chat is not None:
+            chain = self._chains.get(chat.id)
+            if chain is None:
+                chain = self._chains[chat.id] = _ChatChain()
+            chain.waiting += 1
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        started = False
+        try:
+            async with (chain.lock if chain is not None else nullcontext()), self._slots:
+                started = True
+                wait = time.monotonic() - queued_at
+                self.waiting -= 1
+                self.max_wait = max(self.max_wait, wait)
+                self._total_wait += wait
+                self.in_flight += 1
+                try:
+                    await coroutine
+                finally:
+                    self.in_flight -= 1
+                    self.processed += 1
+        finally:
+            if not started:
+                self.waiting -= 1
+            if chain is not None:
+                chain.waiting -= 1
+                if chain.waiting == 0:
+                    del self._chains[chat.id]
+            self._maybe_log_stats()
+
+    def snapshot(self) -> dict[str, float]:
+        """Текущее состояние очереди апдейтов (для логов и health-эндпоинта)."""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "active_chats": len(self._chains),
+            "processed": self.processed,
+            "peak_waiting": self.peak_waiting,
+            "max_wait_seconds": round(self.max_wait, 3),
+            "avg_wait_seconds": round(self._total_wait / self.processed, 3) if self.processed else 0.0,
+        }
+
+    def _maybe_log_stats(self) -> None:
+        if time.monotonic() - self._reported_at >= self.stats_interval:
+            self._log_stats()
+
+    def _log_stats(self) -> None:
+        stats = self.snapshot()
+        # Все слоты заняты и есть очередь — апдейты копятся быстрее, чем обрабатываются
+        level = logging.WARNING if stats["in_flight"] >= self.limit and stats["waiting"] else logging.INFO
+        logger.log(
+            level,
+            "Апдейты: в работе %s/%s, ждут %s (пик %s), чатов %s, обработано %s, ожидание макс. %s с / ср. %s с",
+            stats["in_flight"],
+            stats["limit"],
+            stats["waiting"],
+            stats["peak_waiting"],
+            stats["active_chats"],
+            stats["processed"],
+            stats["max_wait_seconds"],
+            stats["avg_wait_seconds"],
+        )
+        # Пики считаются за интервал между отчётами
+        self.peak_waiting = self.waiting
+        self.max_wait = 0.0
+        self._reported_at = time.monotonic()
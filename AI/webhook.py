@@ -0,0 +1,174 @@
+"""Приём апдейтов Telegram через webhook (ASGI).
+
+С long polling апдейты забирает только один процесс (второй получает
+Conflict), поэтому бот не масштабируется. В режиме webhook Telegram сам
+присылает апдейты POST-запросами, и реплик за балансировщиком может быть
+сколько угодно.
+
+TelegramWebhookApp — обычное ASGI-приложение:
+
+* отдельно: ``uvicorn`` (см. main.py, BOT_MODE=webhook) — жизненный цикл
+  бота идёт через lifespan-события;
+* внутри FastAPI: ``app.mount("/telegram", webhook_app)``; смонтированные
+  приложения не получают lifespan, поэтому хост вызывает ``startup()`` и
+  ``shutdown()`` из своего lifespan.
+
+Запрос проверяется по секретному токену (X-Telegram-Bot-Api-Secret-Token),
+апдейт кладётся в update_queue и сразу подтверждается. Дальше его разбирают
+задачи обработки (ChatOrderedUpdateProcessor): разные чаты — параллельно,
+один чат — по порядку. Если очередь переполнена, отвечаем 503, и Telegram
+повторит доставку позже.
+"""
+
+from __future__ import annotations
+
+import hmac
+import json
+import logging
+
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = b"x-telegram-bot-api-secret-token"
+# Апдейт Telegram заметно меньше; больше — не от Telegram
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class TelegramWebhookApp:
+    def __init__(
+        self,
+        application: Application,
+        secret_token: str,
+        path: str = "/webhook",
+        webhook_url: str | None = None,
+        max_queue: int = 1000,
+        max_connections: int = 40,
+    ):
+        self.application = application
+        self.secret_token = secret_token.encode()
+        self.path = path
+        # Пустой — webhook регистрируется снаружи (например, одной репликой или вручную)
+        self.webhook_url = webhook_url
+        self.max_queue = max_queue
+        self.max_connections = max_connections
+        self._running = False
+
+    # --- жизненный цикл ---------------------------------------------------
+
+    async def startup(self) -> None:
+        """Запустить бота и зарегистрировать webhook (как run_polling, но без Updater)."""
+        await self.application.initialize()
+        if self.application.post_init:
+            await self.application.post_init(self.application)
+        await self.application.start()
+        if self.webhook_url:
+            await self.application.bot.set_webhook(
+                url=self.webhook_url,
+                secret_token=self.secret_token.decode(),
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=self.max_connections,
+            )
+            logger.info("Webhook установлен: %s", self.webhook_url)
+        self._running = True
+
+    async def shutdown(self) -> None:
+        """Остановить бота; webhook не удаляем — его используют другие реплики."""
+        self._running = False
+        await self.application.stop()
+        if self.application.post_stop:
+            await self.application.post_stop(self.application)
+        await self.application.shutdown()
+        if self.application.post_shutdown:
+            await self.application.post_shutdown(self.application)
+
+    # --- ASGI -------------------------------------------------------------
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        # Внутри Mount путь может прийти вместе с префиксом монтирования
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):] or "/"
+
+        if path == self.path and scope["method"] == "POST":
+            status, body = await self._handle_update(scope, receive)
+        elif path == "/healthz" and scope["method"] == "GET":
+            status, body = (200 if self._running else 503), self._health()
+        else:
+            status, body = 404, {"detail": "Not Found"}
+        await _send_json(send, status, body)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.exception("Не удалось запустить бота в режиме webhook: %s", e)
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle_update(self, scope, receive) -> tuple[int, dict]:
+        token = dict(scope["headers"]).get(SECRET_HEADER, b"")
+        if not hmac.compare_digest(token, self.secret_token):
+            logger.warning("Webhook: запрос с неверным секретным токеном от %s", scope.get("client"))
+            return 403, {"detail": "Invalid secret token"}
+        if not self._running:
+            return 503, {"detail": "Bot is not running"}
+        # Очередь переполнена — Telegram повторит доставку позже
+        if self.application.update_queue.qsize() >= self.max_queue:
+            logger.warning("Webhook: очередь апдейтов переполнена (%s), отвечаем 503", self.max_queue)
+            return 503, {"detail": "Update queue is full"}
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(body) > MAX_BODY_SIZE:
+                return 413, {"detail": "Request body is too large"}
+
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Webhook: не удалось разобрать апдейт: %s", e)
+            return 400, {"detail": "Invalid update"}
+        if update is None:
+            return 400, {"detail": "Invalid update"}
+
+        await self.application.update_queue.put(update)
+        return 200, {"ok": True}
+
+    def _health(self) -> dict:
+        health = {"running": self._running, "update_queue": self.application.update_queue.qsize()}
+        processor = self.application.update_processor
+        if hasattr(processor, "snapshot"):
+            health["updates"] = processor.snapshot()
+        return health
+
+
+async def _send_json(send, status: int, body: dict) -> None:
+    payload = json.dumps(body, ensure_ascii=False).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": payload})
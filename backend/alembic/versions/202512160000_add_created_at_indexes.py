@@ -0,0 +1,25 @@
+"""add created_at indexes for payments and clients
+
+Revision ID: 202512160000
+Revises: 202512150004
+Create Date: 2025-12-16 00:00:00
+"""
+
+from alembic import op
+
+
+revision = "202512160000"
+down_revision = "202512150004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # KPI дашборда фильтруют по полуоткрытому диапазону created_at
+    op.create_index("ix_payments_created_at", "payments", ["created_at"], unique=False)
+    op.create_index("ix_clients_created_at", "clients", ["created_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_clients_created_at", table_name="clients")
+    op.drop_index("ix_payments_created_at", table_name="payments")
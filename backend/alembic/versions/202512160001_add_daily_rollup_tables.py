@@ -0,0 +1,88 @@
+"""add daily rollup tables for payments, clients and schedule bookings
+
+Revision ID: 202512160001
+Revises: 202512160000
+Create Date: 2025-12-16 00:01:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "202512160001"
+down_revision = "202512160000"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "payment_daily_rollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("service_category", sa.String(length=128), nullable=False, server_default=""),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("payments_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("revenue", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("day", "service_category", "status"),
+    )
+    op.create_table(
+        "client_daily_rollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("direction", sa.String(length=32), nullable=False),
+        sa.Column("new_clients", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("day", "direction"),
+    )
+    op.create_table(
+        "booking_daily_rollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("category", sa.String(length=128), nullable=False),
+        sa.Column("trainer_name", sa.String(length=255), nullable=False, server_default=""),
+        sa.Column("capsule_id", sa.String(length=36), nullable=False, server_default=""),
+        sa.Column("capsule_name", sa.String(length=128), nullable=False, server_default=""),
+        sa.Column("slots", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("booked_slots", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("capacity", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("booked_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("free_seats", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("day", "category", "trainer_name", "capsule_id", "capsule_name"),
+    )
+
+    # Первичное заполнение агрегатов из существующих данных
+    # (то же самое делает `python -m scripts.rebuild_rollups`)
+    op.execute("""
+        INSERT INTO payment_daily_rollups (day, service_category, status, payments_count, revenue)
+        SELECT created_at::date, coalesce(service_category, ''), status, count(*), coalesce(sum(total_amount), 0)
+        FROM payments
+        GROUP BY 1, 2, 3
+    """)
+    op.execute("""
+        INSERT INTO client_daily_rollups (day, direction, new_clients)
+        SELECT created_at::date, direction::text, count(*)
+        FROM clients
+        GROUP BY 1, 2
+    """)
+    op.execute("""
+        INSERT INTO booking_daily_rollups (
+            day, category, trainer_name, capsule_id, capsule_name,
+            slots, booked_slots, capacity, booked_count, free_seats
+        )
+        SELECT
+            booking_date,
+            category,
+            coalesce(trainer_name, ''),
+            coalesce(capsule_id, ''),
+            coalesce(capsule_name, ''),
+            count(*),
+            count(*) FILTER (WHERE status IN ('Бронь', 'Оплачено')),
+            coalesce(sum(max_capacity), 0),
+            coalesce(sum(current_count), 0),
+            coalesce(sum(CASE WHEN status = 'Свободно' THEN max_capacity - current_count ELSE 0 END), 0)
+        FROM schedule_bookings
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("booking_daily_rollups")
+    op.drop_table("client_daily_rollups")
+    op.drop_table("payment_daily_rollups")
@@ -0,0 +1,23 @@
+"""add created_at index for applications
+
+Revision ID: 202512160002
+Revises: 202512160001
+Create Date: 2025-12-16 00:02:00
+"""
+
+from alembic import op
+
+
+revision = "202512160002"
+down_revision = "202512160001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Тренд заявок в маркетинговой аналитике фильтрует по created_at за последние дни
+    op.create_index("ix_applications_created_at", "applications", ["created_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_applications_created_at", table_name="applications")
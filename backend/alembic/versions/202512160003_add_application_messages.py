@@ -0,0 +1,82 @@
+"""move applications.chat_history into application_messages
+
+Revision ID: 202512160003
+Revises: 202512160002
+Create Date: 2025-12-16 00:03:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "202512160003"
+down_revision = "202512160002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "application_messages",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("application_id", sa.Integer(), nullable=False),
+        sa.Column("message_id", sa.String(length=64), nullable=False),
+        sa.Column("role", sa.String(length=16), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("timestamp", sa.String(length=32), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["application_id"], ["applications.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("application_id", "message_id", name="uq_application_messages_message_id"),
+    )
+    op.create_index(
+        "ix_application_messages_application_id_id",
+        "application_messages",
+        ["application_id", "id"],
+        unique=False,
+    )
+
+    # Переносим JSON-истории: порядок сообщений сохраняется через порядок вставки (id).
+    # Старые id сообщений могли повторяться внутри одной истории — дубли пропускаем.
+    op.execute(
+        """
+        INSERT INTO application_messages (application_id, message_id, role, content, timestamp, created_at)
+        SELECT
+            a.id,
+            left(coalesce(m.value->>'id', a.id || '_' || m.ord), 64),
+            coalesce(m.value->>'role', 'user'),
+            coalesce(m.value->>'content', ''),
+            left(coalesce(m.value->>'timestamp', ''), 32),
+            a.updated_at
+        FROM applications a
+        CROSS JOIN LATERAL json_array_elements(a.chat_history) WITH ORDINALITY AS m(value, ord)
+        WHERE a.chat_history IS NOT NULL AND json_typeof(a.chat_history) = 'array'
+        ORDER BY a.id, m.ord
+        ON CONFLICT ON CONSTRAINT uq_application_messages_message_id DO NOTHING
+        """
+    )
+
+    op.drop_column("applications", "chat_history")
+
+
+def downgrade() -> None:
+    op.add_column("applications", sa.Column("chat_history", sa.JSON(), nullable=True))
+    op.execute(
+        """
+        UPDATE applications a
+        SET chat_history = h.history
+        FROM (
+            SELECT
+                application_id,
+                json_agg(
+                    json_build_object('id', message_id, 'role', role, 'content', content, 'timestamp', timestamp)
+                    ORDER BY id
+                ) AS history
+            FROM application_messages
+            GROUP BY application_id
+        ) h
+        WHERE h.application_id = a.id
+        """
+    )
+    op.drop_index("ix_application_messages_application_id_id", table_name="application_messages")
+    op.drop_table("application_messages")
@@ -0,0 +1,65 @@
+"""unique telegram_chat_id and idempotency key for applications
+
+Revision ID: 202512160004
+Revises: 202512160003
+Create Date: 2025-12-16 00:04:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "202512160004"
+down_revision = "202512160003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Сливаем дубли, которые создавала гонка GET -> POST в боте: остаётся самая
+    # ранняя заявка чата, сообщения дублей переносятся в неё
+    op.execute(
+        """
+        CREATE TEMP TABLE application_duplicates ON COMMIT DROP AS
+        SELECT id, min(id) OVER (PARTITION BY telegram_chat_id) AS keep_id
+        FROM applications
+        WHERE telegram_chat_id IS NOT NULL
+        """
+    )
+    op.execute("DELETE FROM application_duplicates WHERE id = keep_id")
+    op.execute(
+        """
+        INSERT INTO application_messages (application_id, message_id, role, content, timestamp, created_at)
+        SELECT d.keep_id, m.message_id, m.role, m.content, m.timestamp, m.created_at
+        FROM application_messages m
+        JOIN application_duplicates d ON d.id = m.application_id
+        ORDER BY m.id
+        ON CONFLICT ON CONSTRAINT uq_application_messages_message_id DO NOTHING
+        """
+    )
+    op.execute("DELETE FROM applications WHERE id IN (SELECT id FROM application_duplicates)")
+
+    # chat_id в Telegram не помещается в int4
+    op.alter_column(
+        "applications",
+        "telegram_chat_id",
+        existing_type=sa.Integer(),
+        type_=sa.BigInteger(),
+        existing_nullable=True,
+    )
+    op.create_unique_constraint(
+        "applications_telegram_chat_id_key", "applications", ["telegram_chat_id"]
+    )
+    op.add_column("applications", sa.Column("idempotency_key", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("applications", "idempotency_key")
+    op.drop_constraint("applications_telegram_chat_id_key", "applications", type_="unique")
+    op.alter_column(
+        "applications",
+        "telegram_chat_id",
+        existing_type=sa.BigInteger(),
+        type_=sa.Integer(),
+        existing_nullable=True,
+    )
@@ -0,0 +1,63 @@
+"""trigram search indexes for clients
+
+Revision ID: 202512160005
+Revises: 202512160004
+Create Date: 2025-12-16 00:05:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "202512160005"
+down_revision = "202512160004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # pg_trgm позволяет индексировать ILIKE '%q%' и считать похожесть для ранжирования
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Нормализованный телефон хранится рядом с исходным и пересчитывается базой
+    op.add_column(
+        "clients",
+        sa.Column(
+            "phone_digits",
+            sa.String(length=32),
+            sa.Computed(r"regexp_replace(phone, '\D', '', 'g')", persisted=True),
+        ),
+    )
+
+    op.create_index(
+        "ix_clients_name_trgm",
+        "clients",
+        ["name"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_clients_instagram_trgm",
+        "clients",
+        ["instagram"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"instagram": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_clients_phone_digits_trgm",
+        "clients",
+        ["phone_digits"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"phone_digits": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_clients_phone_digits_trgm", table_name="clients")
+    op.drop_index("ix_clients_instagram_trgm", table_name="clients")
+    op.drop_index("ix_clients_name_trgm", table_name="clients")
+    op.drop_column("clients", "phone_digits")
+    # Расширение не удаляем: им могут пользоваться другие объекты базы
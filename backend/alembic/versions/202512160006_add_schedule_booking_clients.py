@@ -0,0 +1,98 @@
+"""move schedule_bookings.clients into schedule_booking_clients
+
+Revision ID: 202512160006
+Revises: 202512160005
+Create Date: 2025-12-16 00:06:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "202512160006"
+down_revision = "202512160005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "schedule_booking_clients",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("booking_id", sa.Integer(), nullable=False),
+        sa.Column("client_id", sa.String(length=36), nullable=False),
+        sa.Column("client_name", sa.String(length=255), nullable=False),
+        sa.Column("client_phone", sa.String(length=64), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["booking_id"], ["schedule_bookings.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("booking_id", "client_id", name="uq_schedule_booking_clients_client"),
+    )
+    op.create_index(
+        "ix_schedule_booking_clients_client_id",
+        "schedule_booking_clients",
+        ["client_id", "booking_id"],
+        unique=False,
+    )
+
+    # Переносим JSONB-массивы; порядок клиентов сохраняется через порядок вставки (id).
+    # Повторно записанный в тот же слот клиент переносится один раз; клиенты без
+    # client_id получают свой id по позиции в массиве, чтобы не схлопнуться в одну строку.
+    op.execute(
+        """
+        INSERT INTO schedule_booking_clients (booking_id, client_id, client_name, client_phone, created_at)
+        SELECT
+            b.id,
+            left(coalesce(nullif(c.value->>'client_id', ''), 'legacy-' || b.id || '-' || c.ord), 36),
+            left(coalesce(c.value->>'client_name', ''), 255),
+            left(c.value->>'client_phone', 64),
+            b.updated_at
+        FROM schedule_bookings b
+        CROSS JOIN LATERAL jsonb_array_elements(b.clients) WITH ORDINALITY AS c(value, ord)
+        WHERE jsonb_typeof(b.clients) = 'array'
+        ORDER BY b.id, c.ord
+        ON CONFLICT ON CONSTRAINT uq_schedule_booking_clients_client DO NOTHING
+        """
+    )
+    # current_count теперь всегда равен числу записанных клиентов
+    op.execute(
+        """
+        UPDATE schedule_bookings b
+        SET current_count = coalesce(
+            (SELECT count(*) FROM schedule_booking_clients c WHERE c.booking_id = b.id), 0
+        )
+        -- CASE гарантирует порядок проверок: jsonb_array_length падает на скалярах и объектах
+        WHERE CASE WHEN jsonb_typeof(b.clients) = 'array' THEN jsonb_array_length(b.clients) > 0 ELSE false END
+        """
+    )
+
+    op.drop_column("schedule_bookings", "clients")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "schedule_bookings",
+        sa.Column("clients", postgresql.JSONB, nullable=False, server_default="[]"),
+    )
+    op.execute(
+        """
+        UPDATE schedule_bookings b
+        SET clients = c.clients
+        FROM (
+            SELECT
+                booking_id,
+                jsonb_agg(
+                    jsonb_build_object(
+                        'client_id', client_id, 'client_name', client_name, 'client_phone', client_phone
+                    )
+                    ORDER BY id
+                ) AS clients
+            FROM schedule_booking_clients
+            GROUP BY booking_id
+        ) c
+        WHERE c.booking_id = b.id
+        """
+    )
+    op.drop_index("ix_schedule_booking_clients_client_id", table_name="schedule_booking_clients")
+    op.drop_table("schedule_booking_clients")
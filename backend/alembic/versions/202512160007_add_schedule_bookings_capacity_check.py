@@ -0,0 +1,31 @@
+"""capacity check constraint for schedule_bookings
+
+Revision ID: 202512160007
+Revises: 202512160006
+Create Date: 2025-12-16 00:07:00
+"""
+
+from alembic import op
+
+
+revision = "202512160007"
+down_revision = "202512160006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Уже существующий овербукинг не теряем: вместимость таких слотов поднимаем до числа записанных
+    op.execute("UPDATE schedule_bookings SET current_count = 0 WHERE current_count < 0")
+    op.execute(
+        "UPDATE schedule_bookings SET max_capacity = current_count WHERE current_count > max_capacity"
+    )
+    op.create_check_constraint(
+        "ck_schedule_bookings_capacity",
+        "schedule_bookings",
+        "current_count >= 0 AND current_count <= max_capacity",
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("ck_schedule_bookings_capacity", "schedule_bookings", type_="check")
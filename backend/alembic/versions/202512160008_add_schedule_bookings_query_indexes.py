@@ -0,0 +1,59 @@
+"""composite and partial indexes for schedule_bookings queries
+
+Revision ID: 202512160008
+Revises: 202512160007
+Create Date: 2025-12-16 00:08:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "202512160008"
+down_revision = "202512160007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_schedule_bookings_date_time",
+        "schedule_bookings",
+        ["booking_date", "booking_time", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_schedule_bookings_category_date",
+        "schedule_bookings",
+        ["category", "booking_date", "booking_time"],
+        unique=False,
+        postgresql_include=["status", "trainer_name", "current_count", "max_capacity"],
+    )
+    op.create_index(
+        "ix_schedule_bookings_trainer_date",
+        "schedule_bookings",
+        ["trainer_id", "booking_date", "booking_time"],
+        unique=False,
+        postgresql_where=sa.text("trainer_id IS NOT NULL"),
+    )
+    op.create_index(
+        "ix_schedule_bookings_free_date_time",
+        "schedule_bookings",
+        ["booking_date", "booking_time"],
+        unique=False,
+        postgresql_where=sa.text("status = 'Свободно'"),
+    )
+
+    # Одиночные индексы стали префиксами составных
+    op.drop_index("ix_schedule_bookings_booking_date", table_name="schedule_bookings")
+    op.drop_index("ix_schedule_bookings_trainer_id", table_name="schedule_bookings")
+
+
+def downgrade() -> None:
+    op.create_index("ix_schedule_bookings_trainer_id", "schedule_bookings", ["trainer_id"], unique=False)
+    op.create_index("ix_schedule_bookings_booking_date", "schedule_bookings", ["booking_date"], unique=False)
+
+    op.drop_index("ix_schedule_bookings_free_date_time", table_name="schedule_bookings")
+    op.drop_index("ix_schedule_bookings_trainer_date", table_name="schedule_bookings")
+    op.drop_index("ix_schedule_bookings_category_date", table_name="schedule_bookings")
+    op.drop_index("ix_schedule_bookings_date_time", table_name="schedule_bookings")
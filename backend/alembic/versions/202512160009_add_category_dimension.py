@@ -0,0 +1,125 @@
+"""category dimension: category_id on bookings, payments and services, kind on payment services
+
+Revision ID: 202512160009
+Revises: 202512160008
+Create Date: 2025-12-16 00:09:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "202512160009"
+down_revision = "202512160008"
+branch_labels = None
+depends_on = None
+
+
+# Таблица -> выражение с текстовым названием категории (строка таблицы — t).
+# У платежа без категории направление определяется по названию услуги,
+# как раньше в аналитике (service_category ILIKE ... OR service_name ILIKE ...)
+CATEGORY_SOURCES = {
+    "schedule_bookings": "t.category",
+    "payments": "coalesce(nullif(trim(t.service_category), ''), t.service_name)",
+    "services": "t.category",
+}
+
+# Те же правила, что app.repositories.categories.DIRECTION_KEYWORDS (порядок важен)
+DIRECTION_PATTERNS = [
+    ("Coworking", ["%коворкинг%", "%coworking%"]),
+    ("Kids", ["%kids%", "%детск%"]),
+    ("Body", ["%body%"]),
+    ("Coffee", ["%coffee%", "%кофе%"]),
+]
+
+
+def upgrade() -> None:
+    direction_enum = postgresql.ENUM(
+        "Body", "Coworking", "Coffee", "Kids", name="service_direction_enum", create_type=False
+    )
+    kind_enum = postgresql.ENUM("subscription", "single", name="payment_service_kind_enum")
+    kind_enum.create(op.get_bind(), checkfirst=True)
+    kind_enum = postgresql.ENUM("subscription", "single", name="payment_service_kind_enum", create_type=False)
+
+    op.add_column("categories", sa.Column("direction", direction_enum, nullable=True))
+    op.add_column("payment_services", sa.Column("kind", kind_enum, server_default="single", nullable=False))
+    op.add_column("payments", sa.Column("kind", kind_enum, server_default="single", nullable=False))
+
+    # Все встречающиеся названия категорий попадают в справочник
+    for table, column in CATEGORY_SOURCES.items():
+        op.execute(
+            f"""
+            INSERT INTO categories (public_id, name)
+            SELECT gen_random_uuid()::text, name
+            FROM (SELECT DISTINCT left(trim({column}), 128) AS name FROM {table} t) names
+            WHERE name <> ''
+            ON CONFLICT (name) DO NOTHING
+            """
+        )
+
+    # Классифицируем направления один раз; дальше направление правится через API категорий
+    for direction, patterns in DIRECTION_PATTERNS:
+        condition = " OR ".join(f"name ILIKE '{pattern}'" for pattern in patterns)
+        op.execute(
+            f"UPDATE categories SET direction = '{direction}' WHERE direction IS NULL AND ({condition})"
+        )
+
+    for table, column in CATEGORY_SOURCES.items():
+        op.add_column(table, sa.Column("category_id", sa.Integer(), nullable=True))
+        op.create_foreign_key(
+            f"fk_{table}_category_id", table, "categories", ["category_id"], ["id"], ondelete="SET NULL"
+        )
+        op.execute(
+            f"""
+            UPDATE {table} t
+            SET category_id = c.id
+            FROM categories c
+            WHERE c.name = left(trim({column}), 128)
+            """
+        )
+        op.create_index(f"ix_{table}_category_id", table, ["category_id"], unique=False)
+
+    op.add_column("booking_daily_rollups", sa.Column("category_id", sa.Integer(), nullable=True))
+    op.execute(
+        """
+        UPDATE booking_daily_rollups r
+        SET category_id = c.id
+        FROM categories c
+        WHERE c.name = left(trim(r.category), 128)
+        """
+    )
+
+    # Абонемент — если так названа услуга или в длительности больше одного занятия/визита
+    op.execute(
+        r"""
+        UPDATE payment_services
+        SET kind = 'subscription'
+        WHERE name ILIKE '%абонемент%'
+           OR coalesce(substring(duration FROM '\d+')::int, 1) > 1
+        """
+    )
+    # Платёж — абонемент, если куплено несколько занятий, так назван или продан по абонементу из прайса
+    op.execute(
+        """
+        UPDATE payments p
+        SET kind = 'subscription'
+        WHERE p.quantity > 1
+           OR p.service_name ILIKE '%абонемент%'
+           OR p.service_id IN (SELECT public_id FROM payment_services WHERE kind = 'subscription')
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("booking_daily_rollups", "category_id")
+    for table in CATEGORY_SOURCES:
+        op.drop_index(f"ix_{table}_category_id", table_name=table)
+        op.drop_constraint(f"fk_{table}_category_id", table, type_="foreignkey")
+        op.drop_column(table, "category_id")
+
+    op.drop_column("payments", "kind")
+    op.drop_column("payment_services", "kind")
+    op.drop_column("categories", "direction")
+    op.execute("DROP TYPE payment_service_kind_enum")
+    # Добавленные бэкфиллом категории остаются в справочнике
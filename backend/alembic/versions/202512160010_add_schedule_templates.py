@@ -0,0 +1,70 @@
+"""schedule templates for recurring classes
+
+Revision ID: 202512160010
+Revises: 202512160009
+Create Date: 2025-12-16 00:10:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "202512160010"
+down_revision = "202512160009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "schedule_templates",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("public_id", sa.String(length=36), nullable=False),
+        sa.Column("category", sa.String(length=128), nullable=False),
+        sa.Column("category_id", sa.Integer(), nullable=True),
+        sa.Column("service_name", sa.String(length=255), nullable=True),
+        sa.Column("weekdays", postgresql.ARRAY(sa.SmallInteger()), nullable=False),
+        sa.Column("start_time", sa.Time(), nullable=False),
+        sa.Column("trainer_id", sa.String(length=36), nullable=True),
+        sa.Column("trainer_name", sa.String(length=255), nullable=True),
+        sa.Column("max_capacity", sa.Integer(), nullable=False),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("capsule_id", sa.String(length=36), nullable=True),
+        sa.Column("capsule_name", sa.String(length=128), nullable=True),
+        sa.Column("valid_from", sa.Date(), nullable=False),
+        sa.Column("valid_until", sa.Date(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), server_default=sa.text("true"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.CheckConstraint("max_capacity > 0", name="ck_schedule_templates_capacity"),
+        sa.ForeignKeyConstraint(["category_id"], ["categories.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_schedule_templates_public_id", "schedule_templates", ["public_id"], unique=True)
+
+    op.add_column("schedule_bookings", sa.Column("template_id", sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        "fk_schedule_bookings_template_id",
+        "schedule_bookings",
+        "schedule_templates",
+        ["template_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+    # Один слот шаблона в день: на этом индексе держится ON CONFLICT DO NOTHING при генерации
+    op.create_index(
+        "uq_schedule_bookings_template_date",
+        "schedule_bookings",
+        ["template_id", "booking_date"],
+        unique=True,
+        postgresql_where=sa.text("template_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_schedule_bookings_template_date", table_name="schedule_bookings")
+    op.drop_constraint("fk_schedule_bookings_template_id", "schedule_bookings", type_="foreignkey")
+    op.drop_column("schedule_bookings", "template_id")
+    op.drop_index("ix_schedule_templates_public_id", table_name="schedule_templates")
+    op.drop_table("schedule_templates")
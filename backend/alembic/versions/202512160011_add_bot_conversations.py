@@ -0,0 +1,39 @@
+"""bot_conversations: persistent dialogue context of the Telegram bot
+
+Revision ID: 202512160011
+Revises: 202512160010
+Create Date: 2025-12-16 00:11:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "202512160011"
+down_revision = "202512160010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bot_conversations",
+        sa.Column("chat_id", sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column(
+            "messages",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default=sa.text("'[]'::jsonb"),
+            nullable=False,
+        ),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("chat_id"),
+    )
+    # Очистка давно неактивных диалогов
+    op.create_index("ix_bot_conversations_updated_at", "bot_conversations", ["updated_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bot_conversations_updated_at", table_name="bot_conversations")
+    op.drop_table("bot_conversations")
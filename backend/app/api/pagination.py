@@ -0,0 +1,53 @@
+"""Ответы постраничных списков: курсор следующей страницы и проекция полей.
+
+Тело ответа остаётся массивом (как раньше), курсор следующей страницы
+отдаётся в заголовке `X-Next-Cursor`; его нужно передать в `cursor=`.
+Параметр `fields=a,b,c` оставляет в элементах только перечисленные поля
+(имена — как в JSON ответа), а тяжёлые колонки при этом не читаются из базы.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import HTTPException, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.db.pagination import Page
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def parse_fields(fields: str | None, schema: type[BaseModel], *, by_alias: bool) -> set[str] | None:
+    """Имена полей схемы по списку из `fields=`; None — нужны все поля."""
+    if not fields or not fields.strip():
+        return None
+    known = {
+        (info.alias or name) if by_alias else name: name
+        for name, info in schema.model_fields.items()
+    }
+    requested = {part.strip() for part in fields.split(",") if part.strip()}
+    unknown = sorted(requested - known.keys())
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}",
+        )
+    return {known[name] for name in requested}
+
+
+def page_response(
+    page: Page[BaseModel],
+    response: Response,
+    fields: set[str] | None,
+    *,
+    by_alias: bool,
+) -> Any:
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else {}
+    if fields is None:
+        response.headers.update(headers)
+        return page.items
+    # Неполные элементы не проходят response_model, поэтому сериализуем сами
+    content = [item.model_dump(mode="json", include=fields, by_alias=by_alias) for item in page.items]
+    return JSONResponse(content=content, headers=headers)
@@ -1,7 +1,9 @@
 import json
+from collections.abc import AsyncIterator
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 
@@ -11,7 +13,9 @@ from app.schemas.auth import UserResponse
 from app.db.session import get_session
 from app.repositories.ai_assistant import AIAssistantRepository
 from app.core.config import get_settings
-from app.services.timeweb_ai import TimewebAIService
+from app.core.http import http_clients
+from app.services.prompt_budget import clean_history, compact_json, fit_history
+from app.services.timeweb_ai import TimewebAIService, iter_completion_deltas
 
 router = APIRouter(prefix="/api/ai-assistant", tags=["ai-assistant"])
 
@@ -75,7 +79,7 @@ async def call_openai(
     
     # Добавляем данные CRM в контекст, если они есть
     if crm_data:
-        crm_context = f"\n\nАктуальные данные CRM:\n{json.dumps(crm_data, ensure_ascii=False, indent=2)}"
+        crm_context = f"\n\nАктуальные данные CRM:\n{compact_json(crm_data)}"
         messages.append({
             "role": "system",
             "content": f"Используй эти данные для ответа на вопросы пользователя:{crm_context}"
@@ -85,30 +89,30 @@ async def call_openai(
     messages.append({"role": "user", "content": user_message})
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                OPENAI_API_URL,
-                headers={
-                    "Authorization": f"Bearer {openai_api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "gpt-4o-mini",  # Используем более дешевую модель для экономии
-                    "messages": messages,
-                    "temperature": 0.7,
-                    "max_tokens": 500,
-                },
-            )
-            
-            if response.status_code != 200:
-                error_text = response.text
-                print(f"OpenAI API error: {response.status_code} - {error_text}")
-                return "Извините, произошла ошибка при обработке запроса. Попробуйте позже."
-            
-            data = response.json()
-            assistant_message = data["choices"][0]["message"]["content"]
-            return assistant_message.strip()
-            
+        client = http_clients.get("openai")
+        response = await client.post(
+            OPENAI_API_URL,
+            headers={
+                "Authorization": f"Bearer {openai_api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": "gpt-4o-mini",  # Используем более дешевую модель для экономии
+                "messages": messages,
+                "temperature": 0.7,
+                "max_tokens": 500,
+            },
+        )
+        
+        if response.status_code != 200:
+            error_text = response.text
+            print(f"OpenAI API error: {response.status_code} - {error_text}")
+            return "Извините, произошла ошибка при обработке запроса. Попробуйте позже."
+        
+        data = response.json()
+        assistant_message = data["choices"][0]["message"]["content"]
+        return assistant_message.strip()
+        
     except httpx.TimeoutException:
         return "Извините, запрос занял слишком много времени. Попробуйте позже."
     except Exception as e:
@@ -116,14 +120,43 @@ async def call_openai(
         return "Извините, произошла ошибка при обработке запроса. Попробуйте позже."
 
 
-@router.post("/chat", response_model=AIAssistantResponse)
-async def chat_with_assistant(
-    request: AIAssistantRequest,
-    current_user: Annotated[UserResponse, Depends(get_current_user)],
-    session: AsyncSession = Depends(get_session),
-) -> AIAssistantResponse:
-    """Обработать запрос пользователя к AI ассистенту."""
-    
+async def stream_openai(
+    user_message: str,
+    system_prompt: str,
+    conversation_history: list[dict] | None = None,
+) -> AsyncIterator[str]:
+    """Потоковый вызов OpenAI: фрагменты ответа по мере генерации."""
+    settings = get_settings()
+    messages = [{"role": "system", "content": system_prompt}]
+    if conversation_history:
+        messages.extend(conversation_history)
+    messages.append({"role": "user", "content": user_message})
+
+    client = http_clients.get("openai")
+    async with client.stream(
+        "POST",
+        OPENAI_API_URL,
+        headers={
+            "Authorization": f"Bearer {settings.openai_api_key}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "model": "gpt-4o-mini",
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": 500,
+            "stream": True,
+        },
+    ) as response:
+        if response.is_error:
+            await response.aread()
+            response.raise_for_status()
+        async for delta in iter_completion_deltas(response):
+            yield delta
+
+
+async def build_assistant_context(session: AsyncSession) -> tuple[str, dict]:
+    """Системный промпт с актуальными данными CRM и сами данные (для поля `data`)."""
     # Получаем статистику CRM
     repo = AIAssistantRepository(session)
     crm_stats = await repo.get_crm_stats()
@@ -142,16 +175,58 @@ async def chat_with_assistant(
         "available_slots_today": crm_stats["available_slots_today"],
     }
     
-    # Получаем ответ от AI (приоритет Timeweb, затем OpenAI)
     system_prompt = get_system_prompt()
     
-    # Добавляем данные CRM в системный промпт
+    # Добавляем данные CRM в системный промпт (компактный JSON: отступы — лишние токены)
     if formatted_stats:
-        crm_context = f"\n\nАктуальные данные CRM:\n{json.dumps(formatted_stats, ensure_ascii=False, indent=2)}"
-        system_prompt_with_data = f"{system_prompt}\n\n{crm_context}"
+        system_prompt_with_data = f"{system_prompt}\n\nАктуальные данные CRM:\n{compact_json(formatted_stats)}"
     else:
         system_prompt_with_data = system_prompt
     
+    return system_prompt_with_data, formatted_stats
+
+
+def summarize_history(dropped: list[dict]) -> str:
+    """Строка памяти вместо старых сообщений, не поместившихся в бюджет промпта."""
+    questions = [
+        message["content"].strip()[:80] for message in dropped if message["role"] == "user" and message["content"].strip()
+    ]
+    line = f"Ранее в диалоге ({len(dropped)} сообщ. опущено)"
+    if questions:
+        line += " пользователь спрашивал: " + "; ".join(f"«{question}»" for question in questions[-3:])
+    return line + "."
+
+
+def prepare_history(system_prompt: str, request: AIAssistantRequest) -> tuple[str, list[dict]]:
+    """Системный промпт и история диалога, уложенные в бюджет токенов."""
+    return fit_history(
+        system_prompt,
+        clean_history(request.conversation_history),
+        request.message,
+        get_settings().assistant_prompt_budget_tokens,
+        summarize_history,
+    )
+
+
+def wants_crm_data(message: str) -> bool:
+    """Нужно ли вернуть статистику CRM вместе с ответом."""
+    return any(keyword in message.lower() for keyword in [
+        "статистика", "данные", "информация", "сколько", "выручка", "клиент", "запись"
+    ])
+
+
+@router.post("/chat", response_model=AIAssistantResponse)
+async def chat_with_assistant(
+    request: AIAssistantRequest,
+    current_user: Annotated[UserResponse, Depends(get_current_user)],
+    session: AsyncSession = Depends(get_session),
+) -> AIAssistantResponse:
+    """Обработать запрос пользователя к AI ассистенту."""
+    
+    # Получаем ответ от AI (приоритет Timeweb, затем OpenAI)
+    system_prompt_with_data, formatted_stats = await build_assistant_context(session)
+    system_prompt_with_data, conversation_history = prepare_history(system_prompt_with_data, request)
+    
     assistant_message = ""
     
     # Используем Timeweb AI (основной провайдер)
@@ -160,7 +235,7 @@ async def chat_with_assistant(
         try:
             assistant_message = await timeweb_service.call_agent(
                 message=request.message,
-                conversation_history=request.conversation_history,
+                conversation_history=conversation_history,
                 system_prompt=system_prompt_with_data,
             )
         except Exception as e:
@@ -172,7 +247,7 @@ async def chat_with_assistant(
                     assistant_message = await call_openai(
                         user_message=request.message,
                         system_prompt=system_prompt_with_data,
-                        conversation_history=request.conversation_history,
+                        conversation_history=conversation_history,
                         crm_data=None,  # Уже в system_prompt
                     )
                 except Exception as openai_error:
@@ -187,7 +262,7 @@ async def chat_with_assistant(
             assistant_message = await call_openai(
                 user_message=request.message,
                 system_prompt=system_prompt_with_data,
-                conversation_history=request.conversation_history,
+                conversation_history=conversation_history,
                 crm_data=None,  # Уже в system_prompt
             )
         else:
@@ -195,9 +270,86 @@ async def chat_with_assistant(
     
     return AIAssistantResponse(
         message=assistant_message,
-        data=formatted_stats if any(keyword in request.message.lower() for keyword in [
-            "статистика", "данные", "информация", "сколько", "выручка", "клиент", "запись"
-        ]) else None,
+        data=formatted_stats if wants_crm_data(request.message) else None,
+    )
+
+
+@router.post("/chat/stream")
+async def chat_with_assistant_stream(
+    request: AIAssistantRequest,
+    current_user: Annotated[UserResponse, Depends(get_current_user)],
+    session: AsyncSession = Depends(get_session),
+) -> StreamingResponse:
+    """Потоковый ответ AI ассистента в формате NDJSON.
+    
+    Каждая строка — JSON-объект:
+    - `{"type": "delta", "content": "..."}` — очередной фрагмент ответа;
+    - `{"type": "done", "message": "...", "data": {...}}` — полный ответ (как у /chat);
+    - `{"type": "error", "message": "..."}` — ошибка после начала ответа.
+    
+    Если Timeweb падает до первого фрагмента, ответ берётся у OpenAI (если настроен).
+    При отключении клиента генератор отменяется, и соединение с апстримом закрывается.
+    """
+    system_prompt_with_data, formatted_stats = await build_assistant_context(session)
+    system_prompt_with_data, conversation_history = prepare_history(system_prompt_with_data, request)
+    settings = get_settings()
+    timeweb_service = TimewebAIService()
+
+    providers: list[AsyncIterator[str]] = []
+    if timeweb_service.is_configured():
+        providers.append(timeweb_service.stream_agent(
+            message=request.message,
+            conversation_history=conversation_history,
+            system_prompt=system_prompt_with_data,
+        ))
+    if settings.openai_api_key:
+        providers.append(stream_openai(
+            user_message=request.message,
+            system_prompt=system_prompt_with_data,
+            conversation_history=conversation_history,
+        ))
+
+    def event(payload: dict) -> bytes:
+        return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+
+    async def generate() -> AsyncIterator[bytes]:
+        parts: list[str] = []
+        for provider in providers:
+            try:
+                async for delta in provider:
+                    parts.append(delta)
+                    yield event({"type": "delta", "content": delta})
+            except Exception as e:
+                print(f"AI stream error: {e}")
+                if parts:
+                    # Часть ответа уже отправлена — переключаться на другой провайдер поздно
+                    yield event({"type": "error", "message": "Ответ прерван. Попробуйте ещё раз."})
+                    return
+                continue
+            finally:
+                await provider.aclose()
+            break
+
+        message = "".join(parts).strip()
+        if not message:
+            message = (
+                "Извините, AI-ассистент временно недоступен. Попробуйте позже."
+                if providers
+                else "Извините, AI-ассистент не настроен. Пожалуйста, настройте Timeweb API или OpenAI API."
+            )
+            yield event({"type": "delta", "content": message})
+
+        yield event({
+            "type": "done",
+            "message": message,
+            "data": formatted_stats if wants_crm_data(request.message) else None,
+        })
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        # Отключаем буферизацию в nginx, чтобы фрагменты уходили сразу
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
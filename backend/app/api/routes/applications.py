@@ -1,15 +1,22 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.pagination import page_response, parse_fields
 from app.schemas.application import (
     Application,
     ApplicationCreate,
+    ApplicationTelegramUpsert,
     ApplicationUpdate,
+    ChatMessagesAppend,
+    ChatMessagesAppended,
+    ChatMessagesPage,
     Platform,
     Stage,
 )
+from app.db.pagination import InvalidCursorError
 from app.db.session import get_session
 from app.repositories.application import ApplicationRepository
 
@@ -23,28 +30,61 @@ async def create_application(
 ) -> Application:
     """Создать новую заявку"""
     repo = ApplicationRepository(session)
-    return await repo.create(data)
+    try:
+        return await repo.create(data)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=409,
+            detail="Application for this telegram_chat_id already exists",
+        )
 
 
 @router.get("/applications", response_model=list[Application])
 async def list_applications(
+    response: Response,
     platform: Annotated[Platform | None, Query(description="Filter by platform")] = None,
     stage: Annotated[Stage | None, Query(description="Filter by stage")] = None,
+    include_history: Annotated[
+        bool, Query(description="Include full chat history of every application")
+    ] = False,
+    limit: Annotated[
+        int | None, Query(ge=1, le=500, description="Page size; without it all applications are returned")
+    ] = None,
+    cursor: Annotated[
+        str | None, Query(description="Cursor from the X-Next-Cursor header of the previous page")
+    ] = None,
+    fields: Annotated[
+        str | None, Query(description="Comma-separated fields to return, e.g. id,name,stage")
+    ] = None,
     session: AsyncSession = Depends(get_session),
 ) -> list[Application]:
-    """Получить список заявок с фильтрацией"""
+    """Получить список заявок с фильтрацией (без истории переписки по умолчанию)"""
+    projection = parse_fields(fields, Application, by_alias=True)
+    if projection is not None and "chatHistory" not in projection:
+        include_history = False
     repo = ApplicationRepository(session)
-    return await repo.list_applications(platform=platform, stage=stage)
+    try:
+        page = await repo.list_applications(
+            platform=platform,
+            stage=stage,
+            include_history=include_history,
+            limit=limit,
+            cursor=cursor,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(page, response, projection, by_alias=True)
 
 
 @router.get("/applications/{application_id}", response_model=Application)
 async def get_application(
     application_id: str,
+    include_history: Annotated[bool, Query(description="Include full chat history")] = True,
     session: AsyncSession = Depends(get_session),
 ) -> Application:
     """Получить заявку по ID"""
     repo = ApplicationRepository(session)
-    application = await repo.get_by_public_id(application_id)
+    application = await repo.get_by_public_id(application_id, include_history=include_history)
     
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
@@ -68,17 +108,72 @@ async def update_application(
     return application
 
 
+@router.get(
+    "/applications/{application_id}/messages", response_model=ChatMessagesPage
+)
+async def list_application_messages(
+    application_id: str,
+    before: Annotated[
+        int | None, Query(description="Cursor from next_before of the previous page")
+    ] = None,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+    session: AsyncSession = Depends(get_session),
+) -> ChatMessagesPage:
+    """Получить историю переписки по заявке постранично (от новых к старым)"""
+    repo = ApplicationRepository(session)
+    page = await repo.list_messages(application_id, before=before, limit=limit)
+
+    if page is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+
+    return page
+
+
+@router.post(
+    "/applications/{application_id}/messages",
+    response_model=ChatMessagesAppended,
+    status_code=201,
+)
+async def append_application_messages(
+    application_id: str,
+    data: ChatMessagesAppend,
+    session: AsyncSession = Depends(get_session),
+) -> ChatMessagesAppended:
+    """Добавить в переписку только новые сообщения"""
+    repo = ApplicationRepository(session)
+    appended = await repo.append_messages(application_id, data.messages)
+
+    if appended is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+
+    return ChatMessagesAppended(appended=appended)
+
+
 @router.get("/applications/telegram/{chat_id}", response_model=Application)
 async def get_application_by_telegram(
     chat_id: int,
+    include_history: Annotated[bool, Query(description="Include full chat history")] = False,
     session: AsyncSession = Depends(get_session),
 ) -> Application:
     """Получить заявку по Telegram chat_id"""
     repo = ApplicationRepository(session)
-    application = await repo.get_by_telegram_chat_id(chat_id)
+    application = await repo.get_by_telegram_chat_id(chat_id, include_history=include_history)
     
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
     
     return application
 
+
+@router.put("/applications/telegram/{chat_id}", response_model=Application)
+async def upsert_application_by_telegram(
+    chat_id: int,
+    data: ApplicationTelegramUpsert,
+    idempotency_key: Annotated[
+        str | None, Header(alias="Idempotency-Key", max_length=64)
+    ] = None,
+    session: AsyncSession = Depends(get_session),
+) -> Application:
+    """Создать или обновить заявку Telegram-чата и дописать новые сообщения"""
+    repo = ApplicationRepository(session)
+    return await repo.upsert_by_telegram_chat_id(chat_id, data, idempotency_key=idempotency_key)
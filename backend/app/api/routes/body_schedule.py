@@ -1,11 +1,11 @@
 from datetime import date
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Query
 
+from app.core.cache import CacheTag, get_analytics_cache
 from app.schemas.body_schedule import BodyScheduleAnalytics
-from app.db.session import get_session
+from app.db.session import SessionLocal
 from app.repositories.body_schedule import BodyScheduleRepository
 
 router = APIRouter(prefix="/api/body/schedule", tags=["body-schedule"])
@@ -27,7 +27,6 @@ async def get_body_schedule_analytics(
             example="2025-01-19",
         ),
     ] = None,
-    session: AsyncSession = Depends(get_session),
 ) -> BodyScheduleAnalytics:
     """
     Получить аналитику по расписанию BODY.
@@ -40,10 +39,19 @@ async def get_body_schedule_analytics(
     
     Если даты не указаны, используется текущая неделя (понедельник - воскресенье).
     """
-    repo = BodyScheduleRepository(session)
-    
     start_date_obj = date.fromisoformat(start_date) if start_date else None
     end_date_obj = date.fromisoformat(end_date) if end_date else None
-    
-    return await repo.get_analytics(start_date=start_date_obj, end_date=end_date_obj)
+
+    async def load() -> BodyScheduleAnalytics:
+        async with SessionLocal() as session:
+            repo = BodyScheduleRepository(session)
+            return await repo.get_analytics(start_date=start_date_obj, end_date=end_date_obj)
+
+    # Без дат берётся текущая неделя, поэтому в ключ входит и сегодняшняя дата
+    return await get_analytics_cache().get_or_load(
+        "body.schedule.analytics",
+        load,
+        params={"start_date": start_date_obj, "end_date": end_date_obj, "today": date.today()},
+        tags=(CacheTag.SCHEDULE_BOOKINGS,),
+    )
 
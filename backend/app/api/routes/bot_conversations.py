@@ -0,0 +1,58 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_session
+from app.repositories.bot_conversations import BotConversationRepository
+from app.schemas.bot_conversation import BotConversation, BotConversationSave
+
+router = APIRouter()
+
+
+@router.get("/bot/conversations/{chat_id}", response_model=BotConversation)
+async def get_bot_conversation(
+    chat_id: int,
+    max_idle_seconds: Annotated[
+        int | None, Query(ge=1, description="Older conversations are returned empty (idle expiry)")
+    ] = None,
+    session: AsyncSession = Depends(get_session),
+) -> BotConversation:
+    """Контекст диалога Telegram-бота для чата"""
+    repo = BotConversationRepository(session)
+    return await repo.get(chat_id, max_idle_seconds)
+
+
+@router.put("/bot/conversations/{chat_id}", response_model=BotConversation)
+async def save_bot_conversation(
+    chat_id: int,
+    data: BotConversationSave,
+    session: AsyncSession = Depends(get_session),
+) -> BotConversation:
+    """Перезаписать контекст диалога с проверкой версии (409 — диалог уже изменили)"""
+    repo = BotConversationRepository(session)
+    version = await repo.save(chat_id, data)
+    if version is None:
+        raise HTTPException(status_code=409, detail="Conversation was modified concurrently")
+    return BotConversation(chat_id=chat_id, messages=data.messages, version=version)
+
+
+@router.delete("/bot/conversations/{chat_id}", status_code=204)
+async def delete_bot_conversation(
+    chat_id: int,
+    session: AsyncSession = Depends(get_session),
+) -> Response:
+    """Сбросить контекст диалога (/start, /reset)"""
+    repo = BotConversationRepository(session)
+    await repo.delete(chat_id)
+    return Response(status_code=204)
+
+
+@router.delete("/bot/conversations", status_code=200)
+async def purge_bot_conversations(
+    max_idle_seconds: Annotated[int, Query(ge=60, description="Delete conversations idle longer than this")],
+    session: AsyncSession = Depends(get_session),
+) -> dict[str, int]:
+    """Удалить давно неактивные диалоги"""
+    repo = BotConversationRepository(session)
+    return {"deleted": await repo.purge_idle(max_idle_seconds)}
@@ -1,11 +1,13 @@
 from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from fastapi import status
 
+from app.api.pagination import page_response, parse_fields
 from app.schemas.client import Client, ClientCreate, ClientUpdate
+from app.db.pagination import InvalidCursorError
 from app.db.session import get_session
 from app.repositories.clients import ClientRepository
 
@@ -33,6 +35,7 @@ async def get_client(
 
 @router.get("/clients", response_model=list[Client], response_model_by_alias=False)
 async def list_clients(
+    response: Response,
     query: Annotated[str | None, Query(description="Search by name, phone or instagram handle")] = None,
     direction: Annotated[
         Literal["Body", "Coworking", "Coffee"] | None,
@@ -42,51 +45,68 @@ async def list_clients(
         Literal["Активный", "Новый", "Ушедший"] | None,
         Query(description="Filter by lifecycle status"),
     ] = None,
+    limit: Annotated[int | None, Query(ge=1, le=500, description="Page size; without it all clients are returned")] = None,
+    cursor: Annotated[str | None, Query(description="Cursor from the X-Next-Cursor header of the previous page")] = None,
+    fields: Annotated[str | None, Query(description="Comma-separated fields to return, e.g. id,name,phone")] = None,
     session: AsyncSession = Depends(get_session),
 ) -> list[Client]:
     """
     List clients with optional filtering (Postgres-backed only, no mock fallback).
     
-    **Важно:** Если query не указан, возвращаются клиенты только при наличии фильтров (direction или status).
-    Для получения всех клиентов используйте GET /api/clients/all
+    Без `query` клиенты отсортированы по имени и листаются курсором (`limit` + `cursor`).
+    С `query` возвращаются первые `limit` клиентов по релевантности.
     """
+    projection = parse_fields(fields, Client, by_alias=False)
     repo = ClientRepository(session)
-    result = await repo.list_clients(query=query, direction=direction, status=status)
+    try:
+        page = await repo.list_clients(
+            query=query,
+            direction=direction,
+            status=status,
+            limit=limit,
+            cursor=cursor,
+            fields=projection,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Логируем для отладки
     import logging
     logger = logging.getLogger(__name__)
-    logger.info(f"GET /api/clients - query={query}, direction={direction}, status={status}, found={len(result)} clients")
+    logger.info(f"GET /api/clients - query={query}, direction={direction}, status={status}, found={len(page.items)} clients")
     
-    return result
+    return page_response(page, response, projection, by_alias=False)
 
 
 @router.get("/clients/all", response_model=list[Client], response_model_by_alias=False)
 async def list_all_clients(
+    response: Response,
+    limit: Annotated[int | None, Query(ge=1, le=500, description="Page size; without it all clients are returned")] = None,
+    cursor: Annotated[str | None, Query(description="Cursor from the X-Next-Cursor header of the previous page")] = None,
+    fields: Annotated[str | None, Query(description="Comma-separated fields to return, e.g. id,name,phone")] = None,
     session: AsyncSession = Depends(get_session),
 ) -> list[Client]:
     """
     Получить всех клиентов из базы данных (для проверки наличия данных).
     Используйте этот эндпоинт для проверки, есть ли клиенты в базе.
     """
-    from sqlalchemy import select
-    from app.models.client import Client as ClientModel
-    
-    stmt = select(ClientModel).order_by(ClientModel.name)
-    result = await session.scalars(stmt)
-    rows = result.all()
-    
+    projection = parse_fields(fields, Client, by_alias=False)
     repo = ClientRepository(session)
-    # Используем статический метод для преобразования
-    clients = [ClientRepository._to_schema(obj) for obj in rows]
+    try:
+        page = await repo.list_clients(
+            query=None, direction=None, status=None, limit=limit, cursor=cursor, fields=projection
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    clients = page.items
     
     import logging
     logger = logging.getLogger(__name__)
-    logger.info(f"GET /api/clients/all - found {len(clients)} total clients in database")
+    logger.info(f"GET /api/clients/all - found {len(clients)} clients in database")
     if len(clients) > 0:
         logger.info(f"Sample clients: {[(c.name, c.direction, c.status) for c in clients[:5]]}")
     
-    return clients
+    return page_response(page, response, projection, by_alias=False)
 
 
 @router.post("/clients", response_model=Client, status_code=status.HTTP_201_CREATED, response_model_by_alias=False)
@@ -1,22 +1,33 @@
+from datetime import date
+
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import CacheTag, get_analytics_cache
 from app.schemas.dashboard import DashboardSummary
 from app.schemas.booking import TodayBooking
 from app.data.dashboard import SUMMARY
 from app.data.bookings import TODAY_BOOKINGS
-from app.db.session import get_session
+from app.db.session import SessionLocal, get_session
 from app.repositories.dashboard import DashboardRepository
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 
+async def _load_summary() -> DashboardSummary | None:
+    async with SessionLocal() as session:
+        return await DashboardRepository(session).fetch_summary()
+
+
 @router.get("/summary", response_model=DashboardSummary)
-async def get_dashboard_summary(
-    session: AsyncSession = Depends(get_session),
-) -> DashboardSummary:
-    repo = DashboardRepository(session)
-    summary = await repo.fetch_summary()
+async def get_dashboard_summary() -> DashboardSummary:
+    # KPI считаются за текущий месяц, загрузка — за текущую неделю
+    summary = await get_analytics_cache().get_or_load(
+        "dashboard.summary",
+        _load_summary,
+        params={"today": date.today()},
+        tags=(CacheTag.PAYMENTS, CacheTag.CLIENTS, CacheTag.SCHEDULE_BOOKINGS),
+    )
     if summary:
         return summary
     return SUMMARY
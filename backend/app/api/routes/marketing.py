@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
 
-from app.db.session import get_session
+from fastapi import APIRouter
+
+from app.core.cache import CacheTag, get_analytics_cache
+from app.db.session import SessionLocal
 from app.repositories.marketing import MarketingRepository
 from app.schemas.marketing import MarketingTrafficResponse, MarketingConversionsResponse
 
@@ -9,19 +11,31 @@ from app.schemas.marketing import MarketingTrafficResponse, MarketingConversions
 router = APIRouter(prefix="/api/marketing", tags=["marketing"])
 
 
-@router.get("/traffic", response_model=MarketingTrafficResponse)
-async def get_marketing_traffic(
-    session: AsyncSession = Depends(get_session),
-) -> MarketingTrafficResponse:
-    repo = MarketingRepository(session)
-    return await repo.fetch_traffic()
+async def _load_traffic() -> MarketingTrafficResponse:
+    async with SessionLocal() as session:
+        return await MarketingRepository(session).fetch_traffic()
 
 
-@router.get("/conversions", response_model=MarketingConversionsResponse)
-async def get_marketing_conversions(
-    session: AsyncSession = Depends(get_session),
-) -> MarketingConversionsResponse:
-    repo = MarketingRepository(session)
-    return await repo.fetch_conversions()
+async def _load_conversions() -> MarketingConversionsResponse:
+    async with SessionLocal() as session:
+        return await MarketingRepository(session).fetch_conversions()
 
 
+@router.get("/traffic", response_model=MarketingTrafficResponse)
+async def get_marketing_traffic() -> MarketingTrafficResponse:
+    # Тренд строится за последние дни, поэтому в ключ входит текущая дата
+    return await get_analytics_cache().get_or_load(
+        "marketing.traffic",
+        _load_traffic,
+        params={"today": date.today()},
+        tags=(CacheTag.APPLICATIONS,),
+    )
+
+
+@router.get("/conversions", response_model=MarketingConversionsResponse)
+async def get_marketing_conversions() -> MarketingConversionsResponse:
+    return await get_analytics_cache().get_or_load(
+        "marketing.conversions",
+        _load_conversions,
+        tags=(CacheTag.APPLICATIONS,),
+    )
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.pagination import page_response, parse_fields
+from app.db.pagination import InvalidCursorError
 from app.db.session import get_session
 from app.repositories.payment import PaymentRepository
 from app.schemas.payment import Payment, PaymentCreate, PaymentUpdate
@@ -10,18 +12,29 @@ router = APIRouter(prefix="/api/payments", tags=["payments"])
 
 @router.get("", response_model=list[Payment])
 async def list_payments(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    skip: int = Query(0, ge=0, description="Deprecated: use cursor", deprecated=True),
     limit: int = Query(100, ge=1, le=1000),
     service_name: str | None = Query(None),
     client_id: str | None = Query(None),
+    cursor: str | None = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: str | None = Query(None, description="Comma-separated fields to return"),
     session: AsyncSession = Depends(get_session),
 ) -> list[Payment]:
+    projection = parse_fields(fields, Payment, by_alias=True)
     try:
         repo = PaymentRepository(session)
-        result = await repo.list_payments(
-            skip=skip, limit=limit, service_name=service_name, client_id=client_id
+        page = await repo.list_payments(
+            skip=skip,
+            limit=limit,
+            service_name=service_name,
+            client_id=client_id,
+            cursor=cursor,
+            fields=projection,
         )
-        return result
+        return page_response(page, response, projection, by_alias=True)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error fetching payments: {str(e)}"
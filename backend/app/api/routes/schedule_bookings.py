@@ -1,15 +1,18 @@
 from datetime import date
 from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import status
 
+from app.api.pagination import page_response, parse_fields
 from app.schemas.schedule_booking import (
+    ClientInfo,
     ScheduleBooking,
     ScheduleBookingCreate,
     ScheduleBookingUpdate,
 )
+from app.db.pagination import InvalidCursorError
 from app.db.session import get_session
 from app.repositories.schedule_booking import ScheduleBookingRepository
 
@@ -18,6 +21,7 @@ router = APIRouter()
 
 @router.get("/schedule/bookings", response_model=list[ScheduleBooking])
 async def list_bookings(
+    response: Response,
     start_date: Annotated[
         str | None,
         Query(
@@ -53,6 +57,25 @@ async def list_bookings(
             example="Свободно",
         ),
     ] = None,
+    client_id: Annotated[
+        str | None,
+        Query(description="Only bookings this client is booked into (client history)"),
+    ] = None,
+    limit: Annotated[
+        int | None,
+        Query(ge=1, le=1000, description="Page size; without it all matching bookings are returned"),
+    ] = None,
+    cursor: Annotated[
+        str | None,
+        Query(description="Cursor from the X-Next-Cursor header of the previous page"),
+    ] = None,
+    fields: Annotated[
+        str | None,
+        Query(
+            description="Comma-separated fields to return; omit heavy ones like clients",
+            example="public_id,booking_date,booking_time,category,current_count,max_capacity",
+        ),
+    ] = None,
     session: AsyncSession = Depends(get_session),
 ) -> list[ScheduleBooking]:
     """
@@ -67,19 +90,31 @@ async def list_bookings(
     - Получить записи на сегодня (для обзора): `/api/schedule/bookings?start_date=2025-12-15&end_date=2025-12-15`
     - Получить записи Коворкинг на сегодня: `/api/schedule/bookings?start_date=2025-12-15&end_date=2025-12-15&category=Коворкинг`
     - Получить записи Eywa Kids на сегодня: `/api/schedule/bookings?start_date=2025-12-15&end_date=2025-12-15&category=Eywa Kids`
+    - История записей клиента: `/api/schedule/bookings?client_id=<id клиента>`
+    - Сетка расписания без списков клиентов, по 200 записей: `/api/schedule/bookings?limit=200&fields=public_id,booking_date,booking_time,category,current_count,max_capacity`
+      (следующая страница — `cursor` из заголовка `X-Next-Cursor`)
     """
+    projection = parse_fields(fields, ScheduleBooking, by_alias=True)
     repo = ScheduleBookingRepository(session)
     
     start_date_obj = date.fromisoformat(start_date) if start_date else None
     end_date_obj = date.fromisoformat(end_date) if end_date else None
     
-    return await repo.list_bookings(
-        start_date=start_date_obj,
-        end_date=end_date_obj,
-        category=category,
-        trainer_id=trainer_id,
-        status=booking_status,
-    )
+    try:
+        page = await repo.list_bookings(
+            start_date=start_date_obj,
+            end_date=end_date_obj,
+            category=category,
+            trainer_id=trainer_id,
+            status=booking_status,
+            client_id=client_id,
+            limit=limit,
+            cursor=cursor,
+            fields=projection,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(page, response, projection, by_alias=True)
 
 
 @router.get("/schedule/bookings/{booking_id}", response_model=ScheduleBooking)
@@ -209,6 +244,41 @@ async def update_booking(
     return booking
 
 
+@router.post("/schedule/bookings/{booking_id}/clients", response_model=ScheduleBooking)
+async def add_booking_client(
+    booking_id: str,
+    payload: ClientInfo,
+    session: AsyncSession = Depends(get_session),
+) -> ScheduleBooking:
+    """
+    Записать клиента на занятие/слот.
+    
+    `current_count` увеличивается атомарно в базе; повторная запись того же клиента
+    ничего не меняет. Если мест нет — 409 с `detail.code == "capacity_exceeded"`.
+    """
+    repo = ScheduleBookingRepository(session)
+    booking = await repo.add_client(booking_id, payload)
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return booking
+
+
+@router.delete("/schedule/bookings/{booking_id}/clients/{client_id}", response_model=ScheduleBooking)
+async def remove_booking_client(
+    booking_id: str,
+    client_id: str,
+    session: AsyncSession = Depends(get_session),
+) -> ScheduleBooking:
+    """
+    Отписать клиента от занятия/слота (`current_count` уменьшается атомарно в базе).
+    """
+    repo = ScheduleBookingRepository(session)
+    booking = await repo.remove_client(booking_id, client_id)
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return booking
+
+
 @router.delete("/schedule/bookings/{booking_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_booking(
     booking_id: str,
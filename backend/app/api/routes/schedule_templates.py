@@ -0,0 +1,116 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_session
+from app.repositories.schedule_template import ScheduleTemplateRepository
+from app.schemas.schedule_template import (
+    ScheduleMaterializeRequest,
+    ScheduleMaterializeResult,
+    ScheduleTemplate,
+    ScheduleTemplateCreate,
+    ScheduleTemplateUpdate,
+)
+
+router = APIRouter()
+
+
+@router.get("/schedule/templates", response_model=list[ScheduleTemplate])
+async def list_templates(
+    active_only: Annotated[bool, Query(description="Only active templates")] = False,
+    session: AsyncSession = Depends(get_session),
+) -> list[ScheduleTemplate]:
+    """
+    Получить шаблоны повторяющихся занятий.
+    """
+    repo = ScheduleTemplateRepository(session)
+    return await repo.list_templates(active_only=active_only)
+
+
+@router.post(
+    "/schedule/templates",
+    response_model=ScheduleTemplate,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_template(
+    payload: ScheduleTemplateCreate,
+    session: AsyncSession = Depends(get_session),
+) -> ScheduleTemplate:
+    """
+    Создать шаблон повторяющегося занятия, например «Reformer, Пн/Ср/Пт 09:00, 4 места».
+
+    Слоты по шаблону создаются отдельно — `POST /api/schedule/templates/materialize`.
+    """
+    repo = ScheduleTemplateRepository(session)
+    return await repo.create_template(payload)
+
+
+@router.post("/schedule/templates/materialize", response_model=ScheduleMaterializeResult)
+async def materialize_templates(
+    payload: ScheduleMaterializeRequest,
+    session: AsyncSession = Depends(get_session),
+) -> ScheduleMaterializeResult:
+    """
+    Создать слоты расписания по шаблонам за период одним запросом.
+
+    Все слоты вставляются пакетно в одной транзакции. Повторный вызов за тот же
+    период безопасен: уже созданные слоты шаблона пропускаются. Слоты, для которых
+    тренер или капсула уже заняты в это время, тоже пропускаются; всё пропущенное
+    перечислено в `conflicts`. С `dry_run: true` ничего не создаётся.
+
+    **Пример:** развернуть все активные шаблоны на четыре недели.
+    ```json
+    {
+      "start_date": "2025-12-15",
+      "end_date": "2026-01-11"
+    }
+    ```
+    """
+    repo = ScheduleTemplateRepository(session)
+    return await repo.materialize(payload)
+
+
+@router.get("/schedule/templates/{template_id}", response_model=ScheduleTemplate)
+async def get_template(
+    template_id: str,
+    session: AsyncSession = Depends(get_session),
+) -> ScheduleTemplate:
+    """
+    Получить шаблон по ID.
+    """
+    repo = ScheduleTemplateRepository(session)
+    template = await repo.get_by_public_id(template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
+
+@router.patch("/schedule/templates/{template_id}", response_model=ScheduleTemplate)
+async def update_template(
+    template_id: str,
+    payload: ScheduleTemplateUpdate,
+    session: AsyncSession = Depends(get_session),
+) -> ScheduleTemplate:
+    """
+    Обновить шаблон. Уже созданные по нему слоты не меняются.
+    """
+    repo = ScheduleTemplateRepository(session)
+    template = await repo.update_template(template_id, payload)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
+
+@router.delete("/schedule/templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_template(
+    template_id: str,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Удалить шаблон. Созданные по нему слоты остаются в расписании.
+    """
+    repo = ScheduleTemplateRepository(session)
+    deleted = await repo.delete_template(template_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Template not found")
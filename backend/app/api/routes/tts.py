@@ -1,28 +1,95 @@
 """Text-to-Speech endpoint using ElevenLabs."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import Response
+import asyncio
+import os
+from collections.abc import AsyncIterator
+from typing import BinaryIO
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 from typing import Annotated
 import httpx
 
 from app.api.routes.auth import get_current_user
 from app.schemas.auth import UserResponse
 from app.core.config import get_settings
+from app.core.http import http_clients
+from app.services.audio_cache import AudioCache, get_audio_cache
+from app.services.voice_catalogue import get_voice_catalogue
 
 router = APIRouter(prefix="/api/tts", tags=["tts"])
 
+# Размер куска при отдаче открытого файла (ФС без жёстких ссылок)
+CACHED_FILE_CHUNK_SIZE = 64 * 1024
+
+# Параметры синтеза входят в ключ дискового кэша
+TTS_MODEL_ID = "eleven_multilingual_v2"  # Поддерживает русский
+TTS_OUTPUT_FORMAT = "mp3_44100_128"  # Высокое качество MP3
+TTS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.0,
+    "use_speaker_boost": True,
+}
+
 
 class TTSRequest(BaseModel):
     text: str
 
 
+async def iter_cached_file(file: BinaryIO) -> AsyncIterator[bytes]:
+    """Прочитать открытый файл кэша по кускам, не блокируя event loop."""
+    try:
+        while chunk := await asyncio.to_thread(file.read, CACHED_FILE_CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
+
+
+async def cached_response(cache: AudioCache, key: str, headers: dict[str, str]) -> Response | None:
+    """Ответ из дискового кэша; None — промах (в том числе файл уже вытеснен).
+
+    Файл отдаётся через FileResponse (sendfile) по жёсткой ссылке на время
+    ответа: вытеснение может удалить файл кэша, но не ссылку. Если жёсткие
+    ссылки не поддерживаются, отдаётся заранее открытый файл.
+    """
+    try:
+        pinned = await asyncio.to_thread(cache.pin, key)
+    except OSError:
+        cached_file = await asyncio.to_thread(cache.open, key)
+        if cached_file is None:
+            return None
+        size = os.fstat(cached_file.fileno()).st_size
+        return StreamingResponse(
+            iter_cached_file(cached_file),
+            media_type="audio/mpeg",
+            headers={**headers, "Content-Length": str(size)},
+        )
+    if pinned is None:
+        return None
+    return FileResponse(
+        pinned,
+        media_type="audio/mpeg",
+        headers=headers,
+        background=BackgroundTask(cache.unpin, pinned),
+    )
+
+
 @router.get("/voices")
 async def get_voices(
     current_user: Annotated[UserResponse, Depends(get_current_user)],
-) -> dict:
+    russian: Annotated[bool | None, Query(description="Only Russian (true) or non-Russian (false) voices")] = None,
+    female: Annotated[bool | None, Query(description="Only female (true) or non-female (false) voices")] = None,
+    recommended: Annotated[bool, Query(description="Only the recommended voice")] = False,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """Получить список доступных голосов ElevenLabs.
     
+    Каталог хранится в памяти и обновляется в фоне; фильтры применяются
+    к `all_voices`. Поддерживается If-None-Match (304 без тела).
+    
     Returns:
         Список голосов с информацией
     """
@@ -36,66 +103,50 @@ async def get_voices(
         )
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                "https://api.elevenlabs.io/v1/voices",
-                headers={
-                    "xi-api-key": api_key,
-                },
-            )
-            
-            if response.status_code != 200:
-                error_text = response.text
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail=f"Ошибка ElevenLabs API: {error_text}"
-                )
-            
-            data = response.json()
-            
-            # Фильтруем русские женские голоса
-            russian_female_voices = []
-            for voice in data.get("voices", []):
-                # Проверяем, есть ли русский язык в поддерживаемых языках
-                labels = voice.get("labels", {})
-                gender = labels.get("gender", "").lower()
-                language = labels.get("accent", "").lower()
-                
-                # Ищем русские женские голоса
-                if gender == "female" and ("russian" in language or "ru" in language or voice.get("name", "").lower() in ["calm", "soft", "professional", "friendly"]):
-                    russian_female_voices.append({
-                        "voice_id": voice.get("voice_id"),
-                        "name": voice.get("name"),
-                        "description": voice.get("description"),
-                        "labels": labels,
-                    })
-            
-            return {
-                "all_voices": data.get("voices", []),
-                "russian_female_voices": russian_female_voices,
-                "recommended": russian_female_voices[0] if russian_female_voices else None,
-            }
-            
+        catalogue = await get_voice_catalogue().get()
     except httpx.TimeoutException:
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Превышено время ожидания ответа от ElevenLabs"
         )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Ошибка ElevenLabs API: {e.response.text}"
+        )
     except Exception as e:
         print(f"Error getting voices: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при получении списка голосов: {str(e)}"
         )
+    
+    etag = catalogue.etag(russian, female, recommended)
+    # Каталог может обновиться в фоне, поэтому клиент должен перепроверять ETag
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in if_none_match:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(
+        content=catalogue.render(russian, female, recommended),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router.post("/speak")
 async def text_to_speech(
     request: TTSRequest,
     current_user: Annotated[UserResponse, Depends(get_current_user)],
+    if_none_match: Annotated[str | None, Header()] = None,
 ) -> Response:
     """Преобразовать текст в речь с помощью ElevenLabs.
     
+    Повторные запросы с тем же текстом и параметрами голоса отдаются из
+    дискового кэша (FileResponse/sendfile). Новый текст проксируется потоком:
+    воспроизведение может начаться с первого фрагмента, а полностью
+    полученный файл сохраняется в кэш.
+    
     Args:
         request: Запрос с текстом для озвучивания
         
@@ -125,62 +176,89 @@ async def text_to_speech(
             detail="Текст не может быть пустым"
         )
     
+    cache = get_audio_cache()
+    key = cache.make_key(
+        voice_id=voice_id,
+        model_id=TTS_MODEL_ID,
+        voice_settings=TTS_VOICE_SETTINGS,
+        output_format=TTS_OUTPUT_FORMAT,
+        text=text,
+    )
+    # Содержимое однозначно определяется ключом, поэтому ответ неизменяем
+    headers = {
+        "Content-Disposition": "inline; filename=speech.mp3",
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "ETag": f'"{key}"',
+    }
+    
+    if if_none_match and headers["ETag"] in if_none_match:
+        if await asyncio.to_thread(cache.get, key) is not None:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # Файл, вытесненный между проверкой и отправкой, — промах: текст синтезируется заново
+    cached = await cached_response(cache, key, headers)
+    if cached is not None:
+        return cached
+    
     try:
-        # Используем официальный ElevenLabs API через httpx
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
-                headers={
-                    "xi-api-key": api_key,
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "text": text,
-                    "model_id": "eleven_multilingual_v2",  # Поддерживает русский
-                    "voice_settings": {
-                        "stability": 0.5,
-                        "similarity_boost": 0.75,
-                        "style": 0.0,
-                        "use_speaker_boost": True
-                    },
-                    "output_format": "mp3_44100_128",  # Высокое качество MP3
-                },
-            )
-            
-            if response.status_code != 200:
-                error_text = response.text
-                print(f"ElevenLabs API error: {response.status_code} - {error_text}")
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail=f"Ошибка ElevenLabs API: {error_text}"
-                )
-            
-            # Возвращаем аудио как MP3
-            return Response(
-                content=response.content,
-                media_type="audio/mpeg",
-                headers={
-                    "Content-Disposition": "inline; filename=speech.mp3",
-                    "Cache-Control": "no-cache",
-                }
-            )
-            
+        # Используем официальный ElevenLabs API через httpx (потоковый endpoint)
+        client = http_clients.get("elevenlabs")
+        upstream_request = client.build_request(
+            "POST",
+            f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream",
+            params={"output_format": TTS_OUTPUT_FORMAT},
+            headers={
+                "xi-api-key": api_key,
+                "Content-Type": "application/json",
+            },
+            json={
+                "text": text,
+                "model_id": TTS_MODEL_ID,
+                "voice_settings": TTS_VOICE_SETTINGS,
+            },
+        )
+        response = await client.send(upstream_request, stream=True)
     except httpx.TimeoutException:
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Превышено время ожидания ответа от ElevenLabs"
         )
-    except httpx.HTTPStatusError as e:
-        error_text = e.response.text if e.response else str(e)
-        print(f"ElevenLabs HTTP error: {e.response.status_code if e.response else 'unknown'} - {error_text}")
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Ошибка ElevenLabs API: {error_text}"
-        )
     except Exception as e:
         print(f"Error calling ElevenLabs: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при генерации речи: {str(e)}"
         )
-
+    
+    if response.status_code != 200:
+        error_text = (await response.aread()).decode("utf-8", errors="replace")
+        await response.aclose()
+        print(f"ElevenLabs API error: {response.status_code} - {error_text}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Ошибка ElevenLabs API: {error_text}"
+        )
+    
+    async def stream_and_cache() -> AsyncIterator[bytes]:
+        # Запись на диск — в потоках, чтобы не блокировать другие запросы воркера
+        writer = await asyncio.to_thread(cache.open_writer, key)
+        completed = False
+        try:
+            async for chunk in response.aiter_bytes():
+                await asyncio.to_thread(writer.write, chunk)
+                yield chunk
+            completed = True
+        finally:
+            # Клиент отключился или апстрим оборвался — неполный файл в кэш не попадает
+            await response.aclose()
+            if completed:
+                await asyncio.to_thread(writer.commit)
+            else:
+                await asyncio.to_thread(writer.discard)
+    
+    # Вытеснение сканирует весь каталог кэша — после ответа, в пуле потоков
+    return StreamingResponse(
+        stream_and_cache(),
+        media_type="audio/mpeg",
+        headers=headers,
+        background=BackgroundTask(cache.evict_if_needed),
+    )
@@ -0,0 +1,225 @@
+"""Кэш аналитики (дашборд, маркетинг, расписание BODY).
+
+Значения хранятся по ключу «эндпоинт + параметры + поколения тегов». Запись в
+таблицу (платежи, заявки, клиенты, расписание) увеличивает поколение её тега,
+поэтому все зависящие от неё ключи сразу перестают читаться — без перебора
+ключей и без гонок с параллельным пересчётом.
+
+Свежая запись (моложе `ttl`) отдаётся как есть. Устаревшая, но не старше
+`ttl + stale_ttl`, отдаётся сразу, а пересчёт запускается в фоне
+(stale-while-revalidate). Одновременные промахи по одному ключу ждут один
+общий пересчёт (request coalescing).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import pickle
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Any
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheTag(str, Enum):
+    """Таблицы, от которых зависит закэшированная аналитика."""
+
+    PAYMENTS = "payments"
+    APPLICATIONS = "applications"
+    CLIENTS = "clients"
+    SCHEDULE_BOOKINGS = "schedule_bookings"
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    # time.time(), а не monotonic: запись может читаться другим процессом
+    created_at: float
+
+
+class CacheBackend(ABC):
+    """Хранилище кэша. Для нескольких воркеров нужен общий бэкенд."""
+
+    @abstractmethod
+    async def get(self, key: str) -> CacheEntry | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, entry: CacheEntry, expire: float) -> None: ...
+
+    @abstractmethod
+    async def get_generations(self, tags: list[str]) -> list[int]: ...
+
+    @abstractmethod
+    async def bump_generation(self, tag: str) -> None: ...
+
+    async def close(self) -> None:
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU с ограничением по количеству записей и сроком жизни."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[CacheEntry, float]] = OrderedDict()
+        self._generations: dict[str, int] = {}
+
+    async def get(self, key: str) -> CacheEntry | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        entry, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry, expire: float) -> None:
+        self._entries[key] = (entry, time.monotonic() + expire)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_generations(self, tags: list[str]) -> list[int]:
+        return [self._generations.get(tag, 0) for tag in tags]
+
+    async def bump_generation(self, tag: str) -> None:
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+
+
+class RedisCacheBackend(CacheBackend):
+    """Общий кэш в Redis для нескольких воркеров.
+
+    Ограничение по памяти (LRU) задаётся на стороне Redis через
+    `maxmemory-policy allkeys-lru`. Требует пакет `redis`.
+    """
+
+    def __init__(self, url: str, prefix: str = "eywa:analytics:"):
+        try:
+            from redis import asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("Для ANALYTICS_CACHE_URL нужен пакет redis (pip install redis)") from exc
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> CacheEntry | None:
+        raw = await self._client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, entry: CacheEntry, expire: float) -> None:
+        await self._client.set(self.prefix + key, pickle.dumps(entry), px=int(expire * 1000))
+
+    async def get_generations(self, tags: list[str]) -> list[int]:
+        if not tags:
+            return []
+        values = await self._client.mget([f"{self.prefix}gen:{tag}" for tag in tags])
+        return [int(value or 0) for value in values]
+
+    async def bump_generation(self, tag: str) -> None:
+        await self._client.incr(f"{self.prefix}gen:{tag}")
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class AnalyticsCache:
+    def __init__(self, backend: CacheBackend, ttl: float = 30, stale_ttl: float = 300):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        loader: Callable[[], Awaitable[Any]],
+        *,
+        params: dict[str, Any] | None = None,
+        tags: Iterable[CacheTag] = (),
+    ) -> Any:
+        """Вернуть значение из кэша или посчитать его через `loader`.
+
+        `loader` не должен зависеть от сессии запроса: фоновый пересчёт может
+        завершиться уже после ответа клиенту. Если хранилище кэша недоступно,
+        значение считается напрямую через `loader`.
+        """
+        if self.ttl <= 0:
+            return await loader()
+
+        try:
+            key = await self._make_key(namespace, params or {}, [tag.value for tag in tags])
+            entry = await self.backend.get(key)
+        except Exception as exc:
+            logger.warning("Analytics cache read failed for %s, loading directly: %s", namespace, exc)
+            return await loader()
+        if entry is not None:
+            if time.time() - entry.created_at >= self.ttl:
+                self._refresh(key, loader)
+            return entry.value
+
+        # shield: отключение одного клиента не должно отменять общий пересчёт
+        return await asyncio.shield(self._refresh(key, loader))
+
+    async def invalidate(self, *tags: CacheTag) -> None:
+        """Сбросить кэш по тегам. Вызывается после commit, поэтому никогда не бросает:
+        недоступный кэш не должен превращать уже сохранённую запись в ошибку."""
+        for tag in tags:
+            try:
+                await self.backend.bump_generation(tag.value)
+            except Exception as exc:
+                logger.warning("Analytics cache invalidation failed for %s: %s", tag.value, exc)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        try:
+            await self.backend.set(key, CacheEntry(value=value, created_at=time.time()), self.ttl + self.stale_ttl)
+        except Exception as exc:
+            logger.warning("Analytics cache write failed for %s: %s", key, exc)
+        return value
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Analytics cache refresh failed for %s", key, exc_info=task.exception())
+
+    async def _make_key(self, namespace: str, params: dict[str, Any], tags: list[str]) -> str:
+        generations = await self.backend.get_generations(tags)
+        encoded_params = json.dumps(params, sort_keys=True, default=str)
+        encoded_generations = ",".join(f"{tag}={gen}" for tag, gen in zip(tags, generations))
+        return f"{namespace}:{encoded_params}:{encoded_generations}"
+
+
+@lru_cache
+def get_analytics_cache() -> AnalyticsCache:
+    settings = get_settings()
+    if settings.analytics_cache_url:
+        backend: CacheBackend = RedisCacheBackend(settings.analytics_cache_url)
+    else:
+        backend = MemoryCacheBackend(settings.analytics_cache_max_entries)
+    return AnalyticsCache(
+        backend,
+        ttl=settings.analytics_cache_ttl,
+        stale_ttl=settings.analytics_cache_stale_ttl,
+    )
@@ -13,6 +13,20 @@ class Settings(BaseSettings):
         alias="DATABASE_URL",
     )
     echo_sql: bool = Field(default=False, alias="ECHO_SQL")
+    # Сколько независимых аналитических запросов одного HTTP-запроса выполнять параллельно
+    analytics_max_concurrency: int = Field(default=4, alias="ANALYTICS_MAX_CONCURRENCY")
+    # Кэш аналитики: свежесть (сек), сколько ещё отдавать устаревшее значение при фоновом
+    # пересчёте, размер in-process LRU; ANALYTICS_CACHE_URL (redis://...) включает общий кэш
+    analytics_cache_ttl: float = Field(default=30, alias="ANALYTICS_CACHE_TTL")
+    analytics_cache_stale_ttl: float = Field(default=300, alias="ANALYTICS_CACHE_STALE_TTL")
+    analytics_cache_max_entries: int = Field(default=256, alias="ANALYTICS_CACHE_MAX_ENTRIES")
+    analytics_cache_url: str = Field(default="", alias="ANALYTICS_CACHE_URL")
+    # In-process индекс поиска клиентов (type-ahead) и период его сверки с базой (сек);
+    # при нескольких воркерах изменения из других процессов видны после сверки
+    client_search_index_enabled: bool = Field(default=True, alias="CLIENT_SEARCH_INDEX_ENABLED")
+    client_search_index_reconcile_interval: float = Field(
+        default=300, alias="CLIENT_SEARCH_INDEX_RECONCILE_INTERVAL"
+    )
     secret_key: str = Field(default="eywa-crm-secret-key-change-in-production", alias="SECRET_KEY")
     cors_origins: list[str] = Field(
         default_factory=lambda: [
@@ -37,6 +51,32 @@ class Settings(BaseSettings):
         alias="ELEVENLABS_VOICE_ID"
     )
 
+    # Дисковый кэш озвучки (ElevenLabs) и его максимальный размер в байтах
+    tts_cache_dir: str = Field(default="tts_cache", alias="TTS_CACHE_DIR")
+    tts_cache_max_bytes: int = Field(default=512 * 1024 * 1024, alias="TTS_CACHE_MAX_BYTES")
+    # Каталог голосов ElevenLabs: период фонового обновления и таймаут запроса (сек)
+    voice_catalogue_refresh_interval: float = Field(default=3600, alias="VOICE_CATALOGUE_REFRESH_INTERVAL")
+    voice_catalogue_timeout: float = Field(default=10, alias="VOICE_CATALOGUE_TIMEOUT")
+    # Общие httpx-клиенты внешних API (см. app.core.http)
+    http_connect_timeout: float = Field(default=5.0, alias="HTTP_CONNECT_TIMEOUT")
+    http_max_connections: int = Field(default=20, alias="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(default=10, alias="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    http_keepalive_expiry: float = Field(default=60.0, alias="HTTP_KEEPALIVE_EXPIRY")
+    timeweb_timeout: float = Field(default=40.0, alias="TIMEWEB_TIMEOUT")
+    openai_timeout: float = Field(default=30.0, alias="OPENAI_TIMEOUT")
+    elevenlabs_timeout: float = Field(default=30.0, alias="ELEVENLABS_TIMEOUT")
+    # Лимиты пула соединений по апстримам; не заданы — общие HTTP_MAX_CONNECTIONS / HTTP_MAX_KEEPALIVE_CONNECTIONS
+    timeweb_max_connections: int | None = Field(default=None, alias="TIMEWEB_MAX_CONNECTIONS")
+    timeweb_max_keepalive_connections: int | None = Field(default=None, alias="TIMEWEB_MAX_KEEPALIVE_CONNECTIONS")
+    openai_max_connections: int | None = Field(default=None, alias="OPENAI_MAX_CONNECTIONS")
+    openai_max_keepalive_connections: int | None = Field(default=None, alias="OPENAI_MAX_KEEPALIVE_CONNECTIONS")
+    elevenlabs_max_connections: int | None = Field(default=None, alias="ELEVENLABS_MAX_CONNECTIONS")
+    elevenlabs_max_keepalive_connections: int | None = Field(
+        default=None, alias="ELEVENLABS_MAX_KEEPALIVE_CONNECTIONS"
+    )
+    # Бюджет промпта AI-ассистента в токенах: старые сообщения истории сворачиваются в строку памяти
+    assistant_prompt_budget_tokens: int = Field(default=3000, alias="ASSISTANT_PROMPT_BUDGET_TOKENS")
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
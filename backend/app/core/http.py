@@ -0,0 +1,82 @@
+"""Общие httpx-клиенты для внешних API (Timeweb AI, OpenAI, ElevenLabs).
+
+Один клиент на апстрим живёт всё время работы приложения: соединения
+переиспользуются (keep-alive), поэтому TCP/TLS-рукопожатие не платится на
+каждый запрос. Клиенты создаются в lifespan FastAPI и закрываются при остановке.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+from dataclasses import dataclass
+
+import httpx
+
+from app.core.config import get_settings
+
+# HTTP/2 включаем, только если установлен пакет h2 (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass(frozen=True)
+class Upstream:
+    name: str
+    # Таймаут ожидания ответа (чтение/запись); подключение — общий http_connect_timeout
+    timeout: float
+    max_connections: int
+    max_keepalive_connections: int
+
+
+class HttpClientRegistry:
+    """Реестр клиентов по имени апстрима с собственными лимитами соединений."""
+
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    @staticmethod
+    def upstreams() -> dict[str, Upstream]:
+        settings = get_settings()
+        upstreams = {}
+        for name in ("timeweb", "openai", "elevenlabs"):
+            # Лимит апстрима не задан — берём общий
+            max_connections = getattr(settings, f"{name}_max_connections")
+            max_keepalive = getattr(settings, f"{name}_max_keepalive_connections")
+            upstreams[name] = Upstream(
+                name,
+                getattr(settings, f"{name}_timeout"),
+                max_connections if max_connections is not None else settings.http_max_connections,
+                max_keepalive if max_keepalive is not None else settings.http_max_keepalive_connections,
+            )
+        return upstreams
+
+    def open(self) -> None:
+        for name in self.upstreams():
+            self.get(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(self.upstreams()[name])
+            self._clients[name] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    @staticmethod
+    def _create(upstream: Upstream) -> httpx.AsyncClient:
+        settings = get_settings()
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(upstream.timeout, connect=settings.http_connect_timeout),
+            limits=httpx.Limits(
+                max_connections=upstream.max_connections,
+                max_keepalive_connections=upstream.max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+            http2=HTTP2_AVAILABLE,
+        )
+
+
+http_clients = HttpClientRegistry()
@@ -0,0 +1,130 @@
+"""Keyset-пагинация списков.
+
+Курсор — непрозрачная строка (base64 от JSON) со значениями ключа сортировки
+последней строки страницы, последним из которых всегда идёт id. Следующая
+страница выбирается условием `(sort_key, id) > (значения курсора)`, поэтому её
+стоимость не зависит от того, сколько строк уже пролистано (в отличие от OFFSET).
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import Any, Generic, TypeVar
+
+from sqlalchemy import Select, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute, defer
+from sqlalchemy.orm.attributes import set_committed_value
+
+T = TypeVar("T")
+
+
+class InvalidCursorError(ValueError):
+    """Курсор повреждён или выдан для другого списка."""
+
+
+@dataclass
+class Page(Generic[T]):
+    items: list[T]
+    # None — это последняя страница
+    next_cursor: str | None = None
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [value.isoformat() if isinstance(value, (date, time)) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[InstrumentedAttribute]) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursorError("Malformed cursor") from e
+    if not isinstance(payload, list) or len(payload) != len(keys):
+        raise InvalidCursorError("Cursor does not match this listing")
+
+    values = []
+    for key, value in zip(keys, payload):
+        python_type = key.type.python_type
+        try:
+            if python_type in (date, datetime, time):
+                value = python_type.fromisoformat(value)
+            elif not isinstance(value, python_type) or isinstance(value, bool):
+                raise TypeError(value)
+        except (TypeError, ValueError) as e:
+            raise InvalidCursorError("Cursor does not match this listing") from e
+        values.append(value)
+    return values
+
+
+def deferred_columns(
+    heavy: dict[str, InstrumentedAttribute],
+    fields: set[str] | None,
+) -> list[InstrumentedAttribute]:
+    """Тяжёлые колонки, поля которых не запрошены в проекции `fields` (None — нужны все)."""
+    if fields is None:
+        return []
+    return [column for name, column in heavy.items() if name not in fields]
+
+
+async def load_rows(
+    session: AsyncSession,
+    stmt: Select[tuple[T]],
+    deferred: Sequence[InstrumentedAttribute] = (),
+) -> list[T]:
+    """Выполнить запрос, не читая колонки `deferred`.
+
+    У загруженных объектов такие колонки получают значение None без обращения
+    к базе (ленивая подгрузка в async-сессии недоступна).
+    """
+    if deferred:
+        stmt = stmt.options(*(defer(column) for column in deferred))
+    rows = list((await session.scalars(stmt)).all())
+    for row in rows:
+        for column in deferred:
+            set_committed_value(row, column.key, None)
+    return rows
+
+
+async def paginate(
+    session: AsyncSession,
+    stmt: Select[tuple[T]],
+    keys: Sequence[InstrumentedAttribute],
+    *,
+    limit: int | None,
+    cursor: str | None = None,
+    descending: bool = False,
+    deferred: Sequence[InstrumentedAttribute] = (),
+) -> Page[T]:
+    """Выполнить запрос страницей по ключу `keys` (последний ключ — уникальный id).
+
+    Сортировка запроса заменяется на `keys`. Без `limit` возвращаются все строки
+    (старое поведение списков). Колонки из `deferred` не загружаются (см. `load_rows`).
+
+    Raises:
+        InvalidCursorError: курсор не удалось разобрать
+    """
+    stmt = stmt.order_by(None).order_by(*(key.desc() if descending else key for key in keys))
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        row = tuple_(*keys)
+        bound = tuple_(*(literal(value, key.type) for key, value in zip(keys, values)))
+        stmt = stmt.where(row < bound if descending else row > bound)
+    if limit is not None:
+        # Лишняя строка показывает, есть ли следующая страница
+        stmt = stmt.limit(limit + 1)
+
+    rows = await load_rows(session, stmt, deferred)
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], key.key) for key in keys])
+    return Page(items=rows, next_cursor=next_cursor)
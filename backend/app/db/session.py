@@ -1,4 +1,6 @@
-from collections.abc import AsyncGenerator
+import asyncio
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from typing import Any
 
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
@@ -23,3 +25,29 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as session:
         yield session
 
+
+async def run_concurrently(
+    *queries: Callable[[AsyncSession], Awaitable[Any]],
+    limit: int | None = None,
+) -> list[Any]:
+    """Выполнить независимые read-only запросы параллельно.
+
+    Каждый запрос получает собственную сессию из `SessionLocal` (одна AsyncSession
+    не допускает конкурентных запросов). Не больше `limit` запросов одновременно,
+    чтобы один HTTP-запрос не занял весь пул соединений. Результаты возвращаются
+    в порядке аргументов; при ошибке оставшиеся задачи отменяются.
+    """
+    semaphore = asyncio.Semaphore(limit or settings.analytics_max_concurrency)
+
+    async def run(query: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            async with SessionLocal() as session:
+                return await query(session)
+
+    tasks = [asyncio.ensure_future(run(query)) for query in queries]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
@@ -1,8 +1,33 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.pagination import NEXT_CURSOR_HEADER
 from app.api.routes import api_router
+from app.core.cache import get_analytics_cache
 from app.core.config import get_settings
+from app.core.http import http_clients
+from app.services.client_search import get_client_search_index
+from app.services.voice_catalogue import get_voice_catalogue
+
+
+@asynccontextmanager
+async def lifespan(_application: FastAPI) -> AsyncIterator[None]:
+    http_clients.open()
+    settings = get_settings()
+    # Индекс поиска клиентов строится в фоне; до готовности поиск идёт через SQL
+    if settings.client_search_index_enabled:
+        get_client_search_index().start()
+    # Каталог голосов грузится и обновляется в фоне, не задерживая старт
+    if settings.elevenlabs_api_key:
+        get_voice_catalogue().start()
+    yield
+    await get_voice_catalogue().stop()
+    await get_client_search_index().stop()
+    await http_clients.aclose()
+    await get_analytics_cache().close()
 
 
 def create_app() -> FastAPI:
@@ -12,6 +37,7 @@ def create_app() -> FastAPI:
         title="Eywa Backend",
         description="FastAPI service powering Eywa CRM",
         version="0.1.0",
+        lifespan=lifespan,
     )
     
     # Настройка CORS для разрешения запросов с фронтенда
@@ -23,6 +49,8 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Курсор следующей страницы списков (см. app/api/pagination.py)
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
     
     application.include_router(api_router)
@@ -1,6 +1,6 @@
 from .client import Client
 from .dashboard import DashboardKPI, DashboardLoad, DashboardHighlight
-from .application import Application
+from .application import Application, ApplicationMessage
 from .service import Service
 from .coworking_place import CoworkingPlace
 from .trainer import Trainer
@@ -8,7 +8,10 @@ from .user import User
 from .category import Category
 from .payment_service import PaymentService, PaymentServiceCategory
 from .payment import Payment
-from .schedule_booking import ScheduleBooking
+from .schedule_booking import ScheduleBooking, ScheduleBookingClient
+from .schedule_template import ScheduleTemplate
+from .bot_conversation import BotConversation
+from .rollup import PaymentDailyRollup, ClientDailyRollup, BookingDailyRollup
 from .base import Base
 
 __all__ = [
@@ -17,6 +20,7 @@ __all__ = [
     "DashboardLoad",
     "DashboardHighlight",
     "Application",
+    "ApplicationMessage",
     "Service",
     "CoworkingPlace",
     "Trainer",
@@ -26,6 +30,12 @@ __all__ = [
     "PaymentServiceCategory",
     "Payment",
     "ScheduleBooking",
+    "ScheduleBookingClient",
+    "ScheduleTemplate",
+    "BotConversation",
+    "PaymentDailyRollup",
+    "ClientDailyRollup",
+    "BookingDailyRollup",
     "Base",
 ]
 
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from sqlalchemy import Enum, String, Text, JSON
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Enum, ForeignKey, Index, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base, TimestampMixin
@@ -8,6 +10,7 @@ from app.models.base import Base, TimestampMixin
 
 class Application(Base, TimestampMixin):
     __tablename__ = "applications"
+    __table_args__ = (Index("ix_applications_created_at", "created_at"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     public_id: Mapped[str] = mapped_column(String(36), unique=True, index=True)
@@ -30,9 +33,28 @@ class Application(Base, TimestampMixin):
     # Владелец заявки (кто обрабатывает)
     owner: Mapped[str] = mapped_column(String(128), default="CRM-бот")
     
-    # История чата (JSON)
-    chat_history: Mapped[dict | None] = mapped_column(JSON, nullable=True)
-    
-    # Telegram chat_id для связи с ботом
-    telegram_chat_id: Mapped[int | None] = mapped_column(nullable=True)
+    # Telegram chat_id для связи с ботом: одна заявка на чат (upsert по этому ключу)
+    telegram_chat_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True, unique=True)
+    # Idempotency-Key последнего upsert от бота: повтор того же запроса не применяется второй раз
+    idempotency_key: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
+
+class ApplicationMessage(Base):
+    """Сообщение из переписки по заявке. Только добавляются, не переписываются."""
+
+    __tablename__ = "application_messages"
+    __table_args__ = (
+        # Повторная отправка того же сообщения ботом не создаёт дубль
+        UniqueConstraint("application_id", "message_id", name="uq_application_messages_message_id"),
+        # Постраничное чтение истории заявки по id
+        Index("ix_application_messages_application_id_id", "application_id", "id"),
+    )
 
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    application_id: Mapped[int] = mapped_column(ForeignKey("applications.id", ondelete="CASCADE"))
+    # Идентификатор сообщения со стороны клиента (ChatMessage.id)
+    message_id: Mapped[str] = mapped_column(String(64))
+    role: Mapped[str] = mapped_column(String(16))
+    content: Mapped[str] = mapped_column(Text)
+    timestamp: Mapped[str] = mapped_column(String(32))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
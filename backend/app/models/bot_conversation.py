@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class BotConversation(Base):
+    """Контекст диалога Telegram-бота: последние сообщения чата для промта.
+
+    Одна строка на чат. Бот перезаписывает её целиком с проверкой `version`
+    (оптимистичная блокировка), поэтому несколько реплик бота не затирают
+    ответы друг друга.
+    """
+
+    __tablename__ = "bot_conversations"
+    __table_args__ = (
+        # Очистка давно неактивных диалогов
+        Index("ix_bot_conversations_updated_at", "updated_at"),
+    )
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    # [{"role": "user" | "assistant", "content": "..."}, ...] в хронологическом порядке
+    messages: Mapped[list[dict]] = mapped_column(JSONB, nullable=False, default=list)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from sqlalchemy import String
+from sqlalchemy import Enum, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base, TimestampMixin
 
 
 class Category(Base, TimestampMixin):
+    """Справочник категорий: на него ссылаются записи расписания, платежи и услуги (category_id)."""
+
     __tablename__ = "categories"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -14,4 +16,8 @@ class Category(Base, TimestampMixin):
     name: Mapped[str] = mapped_column(String(128), unique=True)
     icon: Mapped[str | None] = mapped_column(String(64), nullable=True)
     accent: Mapped[str | None] = mapped_column(String(16), nullable=True)
-
+    # Направление для аналитики (коворкинг, детская, Body); NULL — не относится ни к одному
+    direction: Mapped[str | None] = mapped_column(
+        Enum("Body", "Coworking", "Coffee", "Kids", name="service_direction_enum", create_type=False),
+        nullable=True,
+    )
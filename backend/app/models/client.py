@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Enum, String, JSON
+from sqlalchemy import Computed, Enum, Index, String, JSON
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base, TimestampMixin
@@ -8,11 +8,33 @@ from app.models.base import Base, TimestampMixin
 
 class Client(Base, TimestampMixin):
     __tablename__ = "clients"
+    __table_args__ = (
+        Index("ix_clients_created_at", "created_at"),
+        # Триграммные GIN-индексы (pg_trgm) для поиска подстроки через ILIKE/LIKE
+        Index("ix_clients_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index(
+            "ix_clients_instagram_trgm",
+            "instagram",
+            postgresql_using="gin",
+            postgresql_ops={"instagram": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_clients_phone_digits_trgm",
+            "phone_digits",
+            postgresql_using="gin",
+            postgresql_ops={"phone_digits": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     public_id: Mapped[str] = mapped_column(String(36), unique=True, index=True)
     name: Mapped[str] = mapped_column(String(255))
     phone: Mapped[str] = mapped_column(String(32))
+    # Только цифры телефона; вычисляется базой, чтобы поиск по номеру не зависел от форматирования
+    phone_digits: Mapped[str] = mapped_column(
+        String(32),
+        Computed(r"regexp_replace(phone, '\D', '', 'g')", persisted=True),
+    )
     contract_number: Mapped[str | None] = mapped_column(String(64), nullable=True)
     subscription_number: Mapped[str | None] = mapped_column(String(64), nullable=True)
     birth_date: Mapped[str | None] = mapped_column(String(20), nullable=True)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Integer, String, Text
+from sqlalchemy import Enum, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base, TimestampMixin
@@ -8,6 +8,7 @@ from app.models.base import Base, TimestampMixin
 
 class Payment(Base, TimestampMixin):
     __tablename__ = "payments"
+    __table_args__ = (Index("ix_payments_created_at", "created_at"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     public_id: Mapped[str] = mapped_column(String(36), unique=True, index=True)
@@ -21,6 +22,15 @@ class Payment(Base, TimestampMixin):
     service_id: Mapped[str | None] = mapped_column(String(36), nullable=True, index=True)
     service_name: Mapped[str] = mapped_column(String(255))
     service_category: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    # Категория из справочника categories по service_category (заполняется при записи)
+    category_id: Mapped[int | None] = mapped_column(
+        ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    # Вид продажи на момент оплаты: абонемент или разовая услуга
+    kind: Mapped[str] = mapped_column(
+        Enum("subscription", "single", name="payment_service_kind_enum"),
+        server_default="single",
+    )
     
     # Сумма и способ оплаты
     total_amount: Mapped[int] = mapped_column(Integer)
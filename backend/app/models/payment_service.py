@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Integer, String, Text
+from sqlalchemy import Enum, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base, TimestampMixin
@@ -30,4 +30,9 @@ class PaymentService(Base, TimestampMixin):
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
     duration: Mapped[str | None] = mapped_column(String(64), nullable=True)
     trainer: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    # Абонемент (несколько занятий/визитов) или разовая услуга
+    kind: Mapped[str] = mapped_column(
+        Enum("subscription", "single", name="payment_service_kind_enum"),
+        server_default="single",
+    )
 
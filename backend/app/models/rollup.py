@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import BigInteger, Date, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class PaymentDailyRollup(Base):
+    """Дневные агрегаты по платежам: выручка по категории и статусу."""
+
+    __tablename__ = "payment_daily_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    # Пустая строка вместо NULL, чтобы колонка могла входить в первичный ключ
+    service_category: Mapped[str] = mapped_column(String(128), primary_key=True, default="")
+    status: Mapped[str] = mapped_column(String(32), primary_key=True)
+    payments_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class ClientDailyRollup(Base):
+    """Дневные агрегаты по новым клиентам в разрезе направления."""
+
+    __tablename__ = "client_daily_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    direction: Mapped[str] = mapped_column(String(32), primary_key=True)
+    new_clients: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class BookingDailyRollup(Base):
+    """Дневные агрегаты расписания по категории, тренеру и капсуле/залу."""
+
+    __tablename__ = "booking_daily_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    category: Mapped[str] = mapped_column(String(128), primary_key=True)
+    trainer_name: Mapped[str] = mapped_column(String(255), primary_key=True, default="")
+    capsule_id: Mapped[str] = mapped_column(String(36), primary_key=True, default="")
+    capsule_name: Mapped[str] = mapped_column(String(128), primary_key=True, default="")
+    # categories.id для category; аналитика по направлениям фильтрует по нему, а не по тексту
+    category_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Количество слотов и слотов со статусом "Бронь"/"Оплачено"
+    slots: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    booked_slots: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Сумма max_capacity и current_count
+    capacity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    booked_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Свободные места в слотах со статусом "Свободно"
+    free_seats: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -1,8 +1,7 @@
 from __future__ import annotations
 
-from datetime import date, time
-from sqlalchemy import Date, Enum, Integer, String, Text, Time
-from sqlalchemy.dialects.postgresql import JSONB
+from datetime import date, datetime, time
+from sqlalchemy import BigInteger, CheckConstraint, Date, DateTime, Enum, ForeignKey, Index, Integer, String, Text, Time, UniqueConstraint, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base, TimestampMixin
@@ -12,29 +11,73 @@ class ScheduleBooking(Base, TimestampMixin):
     """Модель записи/бронирования в расписании."""
 
     __tablename__ = "schedule_bookings"
+    __table_args__ = (
+        # Последний рубеж против овербукинга: запись сверх вместимости отклоняет сама база
+        CheckConstraint(
+            "current_count >= 0 AND current_count <= max_capacity",
+            name="ck_schedule_bookings_capacity",
+        ),
+        # Индексы под реальные запросы (проверяются scripts/check_query_plans.py).
+        # Сетка расписания: диапазон дат в порядке keyset-пагинации, поиск слота по дате и времени
+        Index("ix_schedule_bookings_date_time", "booking_date", "booking_time", "id"),
+        # Аналитика групп и тренеров: категория + диапазон дат; остальные колонки
+        # этих запросов лежат в индексе, чтобы хватало index-only scan
+        Index(
+            "ix_schedule_bookings_category_date",
+            "category",
+            "booking_date",
+            "booking_time",
+            postgresql_include=["status", "trainer_name", "current_count", "max_capacity"],
+        ),
+        # Расписание тренера
+        Index(
+            "ix_schedule_bookings_trainer_date",
+            "trainer_id",
+            "booking_date",
+            "booking_time",
+            postgresql_where=text("trainer_id IS NOT NULL"),
+        ),
+        # Свободные слоты — небольшая доля таблицы, частичный индекс компактнее полного по status
+        Index(
+            "ix_schedule_bookings_free_date_time",
+            "booking_date",
+            "booking_time",
+            postgresql_where=text("status = 'Свободно'"),
+        ),
+        # Шаблон создаёт не больше одного слота в день: повторная генерация их пропускает
+        Index(
+            "uq_schedule_bookings_template_date",
+            "template_id",
+            "booking_date",
+            unique=True,
+            postgresql_where=text("template_id IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     public_id: Mapped[str] = mapped_column(String(36), unique=True, index=True)
     
     # Дата и время
-    booking_date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    booking_date: Mapped[date] = mapped_column(Date, nullable=False)
     booking_time: Mapped[time] = mapped_column(Time, nullable=False)
     
     # Категория/Тип занятия
     category: Mapped[str] = mapped_column(String(128), nullable=False)  # "Body Mind", "Pilates Reformer", etc.
+    # Категория из справочника categories по category (заполняется при записи)
+    category_id: Mapped[int | None] = mapped_column(
+        ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True
+    )
     
     # Для Body Mind - название занятия
     service_name: Mapped[str | None] = mapped_column(String(255), nullable=True)  # "Йога для начинающих"
     
     # Тренер
-    trainer_id: Mapped[str | None] = mapped_column(String(36), nullable=True, index=True)
+    trainer_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
     trainer_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     
-    # Клиенты (JSON массив с информацией о клиентах)
-    # Формат: [{"client_id": "...", "client_name": "...", "client_phone": "..."}, ...]
-    clients: Mapped[list[dict]] = mapped_column(JSONB, default=list, nullable=False)
+    # Клиенты записи хранятся в schedule_booking_clients (ScheduleBookingClient)
     
-    # Количество мест/человек
+    # Количество мест/человек; current_count — число строк в schedule_booking_clients
     max_capacity: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     current_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     
@@ -52,3 +95,27 @@ class ScheduleBooking(Base, TimestampMixin):
     capsule_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
     capsule_name: Mapped[str | None] = mapped_column(String(128), nullable=True)
 
+    # Шаблон, из которого создан слот (NULL — создан вручную)
+    template_id: Mapped[int | None] = mapped_column(
+        ForeignKey("schedule_templates.id", ondelete="SET NULL"), nullable=True
+    )
+
+
+
+class ScheduleBookingClient(Base):
+    """Клиент, записанный на занятие/слот расписания."""
+
+    __tablename__ = "schedule_booking_clients"
+    __table_args__ = (
+        # Клиент записывается на слот один раз
+        UniqueConstraint("booking_id", "client_id", name="uq_schedule_booking_clients_client"),
+        # История записей клиента
+        Index("ix_schedule_booking_clients_client_id", "client_id", "booking_id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    booking_id: Mapped[int] = mapped_column(ForeignKey("schedule_bookings.id", ondelete="CASCADE"))
+    client_id: Mapped[str] = mapped_column(String(36))
+    client_name: Mapped[str] = mapped_column(String(255))
+    client_phone: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from datetime import date, time
+
+from sqlalchemy import Boolean, CheckConstraint, Date, ForeignKey, Integer, SmallInteger, String, Text, Time
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base, TimestampMixin
+
+
+class ScheduleTemplate(Base, TimestampMixin):
+    """Шаблон повторяющегося занятия: «Reformer, Пн/Ср/Пт 09:00, тренер X, 4 места».
+
+    Слоты в schedule_bookings создаются из шаблонов пакетно
+    (`ScheduleTemplateRepository.materialize`) и ссылаются на шаблон через template_id.
+    """
+
+    __tablename__ = "schedule_templates"
+    __table_args__ = (
+        CheckConstraint("max_capacity > 0", name="ck_schedule_templates_capacity"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    public_id: Mapped[str] = mapped_column(String(36), unique=True, index=True)
+
+    # Что и когда: дни недели (0 — понедельник … 6 — воскресенье) и время начала
+    category: Mapped[str] = mapped_column(String(128), nullable=False)
+    category_id: Mapped[int | None] = mapped_column(
+        ForeignKey("categories.id", ondelete="SET NULL"), nullable=True
+    )
+    service_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    weekdays: Mapped[list[int]] = mapped_column(ARRAY(SmallInteger), nullable=False)
+    start_time: Mapped[time] = mapped_column(Time, nullable=False)
+
+    # Тренер
+    trainer_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    trainer_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
+
+    max_capacity: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    notes: Mapped[str | None] = mapped_column(Text, nullable=True)
+    capsule_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    capsule_name: Mapped[str | None] = mapped_column(String(128), nullable=True)
+
+    # Период действия; слоты вне периода не создаются
+    valid_from: Mapped[date] = mapped_column(Date, nullable=False)
+    valid_until: Mapped[date | None] = mapped_column(Date, nullable=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="true")
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Enum, Integer, String, Text
+from sqlalchemy import Enum, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base, TimestampMixin
@@ -13,6 +13,10 @@ class Service(Base, TimestampMixin):
     public_id: Mapped[str] = mapped_column(String(36), unique=True, index=True)
     name: Mapped[str] = mapped_column(String(255))
     category: Mapped[str] = mapped_column(String(128))
+    # Категория из справочника categories по category (заполняется при записи)
+    category_id: Mapped[int | None] = mapped_column(
+        ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True
+    )
     direction: Mapped[str] = mapped_column(Enum("Body", "Coworking", "Coffee", "Kids", name="service_direction_enum"), server_default="Body")
     duration_minutes: Mapped[str] = mapped_column(String(64))
     price: Mapped[int] = mapped_column(Integer)
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
 from datetime import date, timedelta
-from sqlalchemy import select, func, and_, cast, Date, or_
+from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.client import Client as ClientModel
-from app.models.payment import Payment as PaymentModel
-from app.models.schedule_booking import ScheduleBooking as ScheduleBookingModel
+from app.models.rollup import BookingDailyRollup, ClientDailyRollup, PaymentDailyRollup
 
 
 class AIAssistantRepository:
@@ -46,10 +45,10 @@ class AIAssistantRepository:
             start_date = today
             end_date = today
         
-        stmt = select(func.count(ClientModel.id)).where(
+        stmt = select(func.sum(ClientDailyRollup.new_clients)).where(
             and_(
-                cast(ClientModel.created_at, Date) >= start_date,
-                cast(ClientModel.created_at, Date) <= end_date
+                ClientDailyRollup.day >= start_date,
+                ClientDailyRollup.day <= end_date
             )
         )
         result = await self.session.scalar(stmt)
@@ -66,11 +65,8 @@ class AIAssistantRepository:
     async def get_today_bookings_count(self) -> int:
         """Получить количество записей на сегодня."""
         today = date.today()
-        stmt = select(func.count(ScheduleBookingModel.id)).where(
-            and_(
-                ScheduleBookingModel.booking_date == today,
-                ScheduleBookingModel.status.in_(["Бронь", "Оплачено"])
-            )
+        stmt = select(func.sum(BookingDailyRollup.booked_slots)).where(
+            BookingDailyRollup.day == today
         )
         result = await self.session.scalar(stmt)
         return int(result or 0)
@@ -100,11 +96,11 @@ class AIAssistantRepository:
             start_date = today
             end_date = today
         
-        stmt = select(func.sum(PaymentModel.total_amount)).where(
+        stmt = select(func.sum(PaymentDailyRollup.revenue)).where(
             and_(
-                cast(PaymentModel.created_at, Date) >= start_date,
-                cast(PaymentModel.created_at, Date) <= end_date,
-                PaymentModel.status == 'completed'
+                PaymentDailyRollup.day >= start_date,
+                PaymentDailyRollup.day <= end_date,
+                PaymentDailyRollup.status == 'completed'
             )
         )
         result = await self.session.scalar(stmt)
@@ -114,14 +110,9 @@ class AIAssistantRepository:
         """Получить количество свободных слотов на сегодня."""
         today = date.today()
         
-        # Получаем все записи на сегодня
-        stmt = select(
-            func.sum(ScheduleBookingModel.max_capacity - ScheduleBookingModel.current_count)
-        ).where(
-            and_(
-                ScheduleBookingModel.booking_date == today,
-                ScheduleBookingModel.status == "Свободно"
-            )
+        # Свободные места в слотах со статусом "Свободно" уже посчитаны в дневных агрегатах
+        stmt = select(func.sum(BookingDailyRollup.free_seats)).where(
+            BookingDailyRollup.day == today
         )
         result = await self.session.scalar(stmt)
         return int(result or 0)
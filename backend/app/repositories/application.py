@@ -3,17 +3,22 @@ from __future__ import annotations
 import uuid
 from datetime import datetime, timedelta
 
-from sqlalchemy import Select, select, or_
+from sqlalchemy import Select, func, select, or_, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.application import Application as ApplicationModel
+from app.core.cache import CacheTag, get_analytics_cache
+from app.db.pagination import Page, paginate
+from app.models.application import Application as ApplicationModel, ApplicationMessage
 from app.schemas.application import (
     Application as ApplicationSchema,
     ApplicationCreate,
+    ApplicationTelegramUpsert,
     ApplicationUpdate,
     Platform,
     Stage,
     ChatMessage,
+    ChatMessagesPage,
 )
 
 
@@ -28,11 +33,6 @@ class ApplicationRepository:
         """Создать новую заявку"""
         public_id = str(uuid.uuid4())
         
-        # Преобразуем chat_history в JSON
-        chat_history_json = None
-        if data.chat_history:
-            chat_history_json = [msg.model_dump() for msg in data.chat_history]
-        
         application = ApplicationModel(
             public_id=public_id,
             name=data.name,
@@ -43,14 +43,70 @@ class ApplicationRepository:
             message=data.message,
             budget=data.budget,
             owner=data.owner,
-            chat_history=chat_history_json,
             telegram_chat_id=data.telegram_chat_id,
         )
         
         self.session.add(application)
+        await self.session.flush()
+        if data.chat_history:
+            await self._insert_messages(application.id, data.chat_history)
         await self.session.commit()
+        await get_analytics_cache().invalidate(CacheTag.APPLICATIONS)
         await self.session.refresh(application)
         
+        return self._to_schema(application, data.chat_history)
+
+    async def upsert_by_telegram_chat_id(
+        self,
+        telegram_chat_id: int,
+        data: ApplicationTelegramUpsert,
+        idempotency_key: str | None = None,
+    ) -> ApplicationSchema:
+        """Создать или обновить заявку Telegram-чата одним INSERT ... ON CONFLICT.
+
+        Повтор запроса с тем же `idempotency_key` заявку не меняет, а уже
+        сохранённые сообщения пропускаются по id.
+        """
+        stmt = insert(ApplicationModel).values(
+            public_id=str(uuid.uuid4()),
+            name=data.name,
+            username=data.username,
+            phone=data.phone,
+            platform=Platform.TELEGRAM.value,
+            stage=data.stage.value,
+            message=data.message,
+            budget=data.budget,
+            owner=data.owner,
+            telegram_chat_id=telegram_chat_id,
+            idempotency_key=idempotency_key,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ApplicationModel.telegram_chat_id],
+            set_={
+                "stage": stmt.excluded.stage,
+                "message": stmt.excluded.message,
+                "budget": func.coalesce(stmt.excluded.budget, ApplicationModel.budget),
+                "idempotency_key": stmt.excluded.idempotency_key,
+                "updated_at": func.now(),
+            },
+            where=or_(
+                stmt.excluded.idempotency_key.is_(None),
+                ApplicationModel.idempotency_key.is_distinct_from(stmt.excluded.idempotency_key),
+            ),
+        )
+        await self.session.execute(stmt)
+
+        application = await self.session.scalar(
+            select(ApplicationModel)
+            .where(ApplicationModel.telegram_chat_id == telegram_chat_id)
+            .execution_options(populate_existing=True)
+        )
+        if data.messages:
+            await self._insert_messages(application.id, data.messages)
+        await self.session.commit()
+        await get_analytics_cache().invalidate(CacheTag.APPLICATIONS)
+        await self.session.refresh(application)
+
         return self._to_schema(application)
 
     async def update(
@@ -73,15 +129,16 @@ class ApplicationRepository:
             application.budget = data.budget
         if data.owner is not None:
             application.owner = data.owner
-        if data.chat_history is not None:
-            application.chat_history = [msg.model_dump() for msg in data.chat_history]
         
         await self.session.commit()
+        await get_analytics_cache().invalidate(CacheTag.APPLICATIONS)
         await self.session.refresh(application)
         
         return self._to_schema(application)
 
-    async def get_by_public_id(self, public_id: str) -> ApplicationSchema | None:
+    async def get_by_public_id(
+        self, public_id: str, include_history: bool = True
+    ) -> ApplicationSchema | None:
         """Получить заявку по public_id"""
         stmt = select(ApplicationModel).where(ApplicationModel.public_id == public_id)
         application = await self.session.scalar(stmt)
@@ -89,14 +146,69 @@ class ApplicationRepository:
         if not application:
             return None
         
-        return self._to_schema(application)
+        chat_history = await self._load_history(application.id) if include_history else None
+        return self._to_schema(application, chat_history)
+
+    async def append_messages(self, public_id: str, messages: list[ChatMessage]) -> int | None:
+        """Добавить новые сообщения в переписку заявки.
+
+        Возвращает количество добавленных сообщений (уже сохранённые id пропускаются)
+        или None, если заявки нет.
+        """
+        application_id = await self.session.scalar(
+            select(ApplicationModel.id).where(ApplicationModel.public_id == public_id)
+        )
+        if application_id is None:
+            return None
+
+        appended = await self._insert_messages(application_id, messages)
+        if appended:
+            # Обновляем lastActivity заявки
+            await self.session.execute(
+                update(ApplicationModel)
+                .where(ApplicationModel.id == application_id)
+                .values(updated_at=func.now())
+            )
+        await self.session.commit()
+        return appended
+
+    async def list_messages(
+        self,
+        public_id: str,
+        before: int | None = None,
+        limit: int = 50,
+    ) -> ChatMessagesPage | None:
+        """Страница истории: последние `limit` сообщений до курсора `before`."""
+        application_id = await self.session.scalar(
+            select(ApplicationModel.id).where(ApplicationModel.public_id == public_id)
+        )
+        if application_id is None:
+            return None
+
+        stmt = select(ApplicationMessage).where(ApplicationMessage.application_id == application_id)
+        if before is not None:
+            stmt = stmt.where(ApplicationMessage.id < before)
+        # Берём на одно сообщение больше, чтобы понять, есть ли более ранние
+        stmt = stmt.order_by(ApplicationMessage.id.desc()).limit(limit + 1)
+        rows = list(await self.session.scalars(stmt))
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return ChatMessagesPage(
+            items=[self._message_to_schema(row) for row in rows],
+            next_before=rows[0].id if has_more else None,
+        )
 
     async def list_applications(
         self,
         platform: Platform | None = None,
         stage: Stage | None = None,
-    ) -> list[ApplicationSchema]:
-        """Получить список заявок с фильтрацией"""
+        include_history: bool = False,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> Page[ApplicationSchema]:
+        """Получить список заявок с фильтрацией (keyset по (created_at, id), новые сначала)"""
         stmt = self._base_query()
         
         if platform:
@@ -105,16 +217,27 @@ class ApplicationRepository:
             stmt = stmt.where(ApplicationModel.stage == stage.value)
         
         # Сортируем по дате создания (новые сначала)
-        stmt = stmt.order_by(ApplicationModel.created_at.desc())
-        
-        result = await self.session.scalars(stmt)
-        applications = result.all()
+        page = await paginate(
+            self.session,
+            stmt,
+            [ApplicationModel.created_at, ApplicationModel.id],
+            limit=limit,
+            cursor=cursor,
+            descending=True,
+        )
+        applications = page.items
         
-        return [self._to_schema(app) for app in applications]
+        if not include_history:
+            items = [self._to_schema(app) for app in applications]
+        else:
+            histories = await self._load_histories([app.id for app in applications])
+            items = [self._to_schema(app, histories.get(app.id, [])) for app in applications]
+        return Page(items=items, next_cursor=page.next_cursor)
 
     async def get_by_telegram_chat_id(
         self, 
-        telegram_chat_id: int
+        telegram_chat_id: int,
+        include_history: bool = False,
     ) -> ApplicationSchema | None:
         """Получить заявку по telegram_chat_id"""
         stmt = select(ApplicationModel).where(
@@ -125,10 +248,62 @@ class ApplicationRepository:
         if not application:
             return None
         
-        return self._to_schema(application)
+        chat_history = await self._load_history(application.id) if include_history else None
+        return self._to_schema(application, chat_history)
+
+    async def _insert_messages(self, application_id: int, messages: list[ChatMessage]) -> int:
+        """Вставить сообщения одним INSERT, пропуская уже сохранённые id. Не коммитит."""
+        stmt = (
+            insert(ApplicationMessage)
+            .values(
+                [
+                    {
+                        "application_id": application_id,
+                        "message_id": message.id,
+                        "role": message.role,
+                        "content": message.content,
+                        "timestamp": message.timestamp,
+                    }
+                    for message in messages
+                ]
+            )
+            .on_conflict_do_nothing(constraint="uq_application_messages_message_id")
+            .returning(ApplicationMessage.id)
+        )
+        result = await self.session.execute(stmt)
+        return len(result.all())
+
+    async def _load_history(self, application_id: int) -> list[ChatMessage]:
+        histories = await self._load_histories([application_id])
+        return histories.get(application_id, [])
+
+    async def _load_histories(self, application_ids: list[int]) -> dict[int, list[ChatMessage]]:
+        """Полные истории нескольких заявок одним запросом."""
+        if not application_ids:
+            return {}
+        stmt = (
+            select(ApplicationMessage)
+            .where(ApplicationMessage.application_id.in_(application_ids))
+            .order_by(ApplicationMessage.application_id, ApplicationMessage.id)
+        )
+        histories: dict[int, list[ChatMessage]] = {}
+        for row in await self.session.scalars(stmt):
+            histories.setdefault(row.application_id, []).append(self._message_to_schema(row))
+        return histories
+
+    @staticmethod
+    def _message_to_schema(model: ApplicationMessage) -> ChatMessage:
+        return ChatMessage(
+            id=model.message_id,
+            role=model.role,
+            content=model.content,
+            timestamp=model.timestamp,
+        )
 
     @staticmethod
-    def _to_schema(model: ApplicationModel) -> ApplicationSchema:
+    def _to_schema(
+        model: ApplicationModel, chat_history: list[ChatMessage] | None = None
+    ) -> ApplicationSchema:
         """Преобразовать модель в схему"""
         # Определяем platformName и platformAccent
         platform_name = "Instagram" if model.platform == "instagram" else "Telegram"
@@ -162,11 +337,6 @@ class ApplicationRepository:
         else:
             last_activity = "недавно"
         
-        # Преобразуем chat_history
-        chat_history = None
-        if model.chat_history:
-            chat_history = [ChatMessage(**msg) for msg in model.chat_history]
-        
         return ApplicationSchema(
             id=model.public_id,
             name=model.name,
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 from datetime import date, timedelta
-from sqlalchemy import func, and_, case, distinct, cast, Float, String
+from sqlalchemy import func, and_, case, distinct, cast, tuple_, Float
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.session import run_concurrently
+from app.models.rollup import BookingDailyRollup
 from app.models.schedule_booking import ScheduleBooking as ScheduleBookingModel
 from app.schemas.body_schedule import (
     BodyScheduleAnalytics,
@@ -40,17 +42,14 @@ class BodyScheduleRepository:
         if start_date is None or end_date is None:
             start_date, end_date = self._get_week_range(start_date)
 
-        # Общая статистика
-        overview = await self._get_overview_stats(start_date, end_date)
-        
-        # Аналитика по группам
-        groups = await self._get_groups_analytics(start_date, end_date)
-        
-        # Загрузка тренеров
-        coaches = await self._get_coaches_load(start_date, end_date)
-        
-        # Загрузка залов
-        rooms = await self._get_rooms_load(start_date, end_date)
+        # Общая статистика, группы, тренеры и залы независимы друг от друга,
+        # поэтому выполняем их параллельно, каждый в своей сессии из пула
+        overview, groups, coaches, rooms = await run_concurrently(
+            lambda session: BodyScheduleRepository(session)._get_overview_stats(start_date, end_date),
+            lambda session: BodyScheduleRepository(session)._get_groups_analytics(start_date, end_date),
+            lambda session: BodyScheduleRepository(session)._get_coaches_load(start_date, end_date),
+            lambda session: BodyScheduleRepository(session)._get_rooms_load(start_date, end_date),
+        )
 
         return BodyScheduleAnalytics(
             overview=overview,
@@ -65,30 +64,23 @@ class BodyScheduleRepository:
         """Получить общую статистику."""
         from sqlalchemy import select
 
+        # Читаем из дневных агрегатов расписания (см. RollupRepository)
         stmt = select(
-            func.count(ScheduleBookingModel.id).label("total_slots"),
-            func.count(
-                case(
-                    (
-                        ScheduleBookingModel.status.in_(["Бронь", "Оплачено"]),
-                        1,
-                    ),
-                    else_=None,
-                )
-            ).label("booked_slots"),
+            func.sum(BookingDailyRollup.slots).label("total_slots"),
+            func.sum(BookingDailyRollup.booked_slots).label("booked_slots"),
         ).where(
             and_(
-                ScheduleBookingModel.booking_date >= start_date,
-                ScheduleBookingModel.booking_date <= end_date,
-                ScheduleBookingModel.category.in_(["Body Mind", "Pilates Reformer"]),
+                BookingDailyRollup.day >= start_date,
+                BookingDailyRollup.day <= end_date,
+                BookingDailyRollup.category.in_(["Body Mind", "Pilates Reformer"]),
             )
         )
 
         result = await self.session.execute(stmt)
         row = result.first()
 
-        total_slots = row.total_slots or 0
-        booked_slots = row.booked_slots or 0
+        total_slots = int(row.total_slots or 0)
+        booked_slots = int(row.booked_slots or 0)
         load_percentage = (
             int((booked_slots / total_slots * 100)) if total_slots > 0 else 0
         )
@@ -99,10 +91,16 @@ class BodyScheduleRepository:
             load_percentage=load_percentage,
         )
 
+    async def get_groups(
+        self, start_date: date, end_date: date
+    ) -> list[GroupAnalytics]:
+        """Получить только аналитику по группам (используется дашбордом)."""
+        return await self._get_groups_analytics(start_date, end_date)
+
     async def _get_groups_analytics(
         self, start_date: date, end_date: date
     ) -> list[GroupAnalytics]:
-        """Получить аналитику по группам (BODY и REFORM)."""
+        """Получить аналитику по группам (BODY и REFORM) одним запросом."""
         from sqlalchemy import select
 
         # Маппинг категорий
@@ -119,123 +117,65 @@ class BodyScheduleRepository:
             },
         }
 
-        groups = []
-
-        for category, meta in category_mapping.items():
-            # Общее количество уникальных занятий (дата + время)
-            classes_stmt = select(
+        stmt = (
+            select(
+                ScheduleBookingModel.category.label("category"),
+                # Уникальные занятия считаем по паре (дата, время)
                 func.count(
                     distinct(
-                        func.concat(
-                            cast(ScheduleBookingModel.booking_date, String),
-                            "-",
-                            cast(ScheduleBookingModel.booking_time, String),
+                        tuple_(
+                            ScheduleBookingModel.booking_date,
+                            ScheduleBookingModel.booking_time,
                         )
                     )
+                ).label("total_classes"),
+                func.sum(ScheduleBookingModel.current_count).label("total_bookings"),
+                func.count(ScheduleBookingModel.id).label("total_slots"),
+                func.count(ScheduleBookingModel.id)
+                .filter(ScheduleBookingModel.status.in_(["Бронь", "Оплачено"]))
+                .label("booked_slots"),
+                func.avg(
+                    cast(ScheduleBookingModel.current_count, Float)
+                    / cast(ScheduleBookingModel.max_capacity, Float)
+                    * 100
                 )
-            ).where(
-                and_(
-                    ScheduleBookingModel.booking_date >= start_date,
-                    ScheduleBookingModel.booking_date <= end_date,
-                    ScheduleBookingModel.category == category,
-                )
+                .filter(ScheduleBookingModel.max_capacity > 0)
+                .label("avg_occupancy"),
+                func.array_agg(distinct(ScheduleBookingModel.trainer_name))
+                .filter(ScheduleBookingModel.trainer_name.isnot(None))
+                .label("coaches"),
             )
-
-            classes_result = await self.session.execute(classes_stmt)
-            total_classes = classes_result.scalar() or 0
-
-            # Общее количество записей (сумма current_count)
-            bookings_stmt = select(
-                func.sum(ScheduleBookingModel.current_count)
-            ).where(
+            .where(
                 and_(
                     ScheduleBookingModel.booking_date >= start_date,
                     ScheduleBookingModel.booking_date <= end_date,
-                    ScheduleBookingModel.category == category,
+                    ScheduleBookingModel.category.in_(list(category_mapping)),
                 )
             )
+            .group_by(ScheduleBookingModel.category)
+        )
 
-            bookings_result = await self.session.execute(bookings_stmt)
-            total_bookings = int(bookings_result.scalar() or 0)
+        result = await self.session.execute(stmt)
+        rows = {row.category: row for row in result.all()}
 
-            # Загрузка (занятые слоты / всего слотов)
-            load_stmt = select(
-                func.count(ScheduleBookingModel.id).label("total"),
-                func.count(
-                    case(
-                        (
-                            ScheduleBookingModel.status.in_(["Бронь", "Оплачено"]),
-                            1,
-                        ),
-                        else_=None,
-                    )
-                ).label("booked"),
-            ).where(
-                and_(
-                    ScheduleBookingModel.booking_date >= start_date,
-                    ScheduleBookingModel.booking_date <= end_date,
-                    ScheduleBookingModel.category == category,
-                )
-            )
+        groups = []
 
-            load_result = await self.session.execute(load_stmt)
-            load_row = load_result.first()
-            total_slots = load_row.total or 0
-            booked_slots = load_row.booked or 0
+        for category, meta in category_mapping.items():
+            row = rows.get(category)
+            total_slots = row.total_slots if row else 0
+            booked_slots = row.booked_slots if row else 0
             load = int((booked_slots / total_slots * 100)) if total_slots > 0 else 0
 
-            # Средняя заполненность
-            occupancy_stmt = select(
-                func.avg(
-                    case(
-                        (
-                            ScheduleBookingModel.max_capacity > 0,
-                            cast(ScheduleBookingModel.current_count, Float)
-                            / cast(ScheduleBookingModel.max_capacity, Float)
-                            * 100,
-                        ),
-                        else_=None,
-                    )
-                )
-            ).where(
-                and_(
-                    ScheduleBookingModel.booking_date >= start_date,
-                    ScheduleBookingModel.booking_date <= end_date,
-                    ScheduleBookingModel.category == category,
-                    ScheduleBookingModel.max_capacity > 0,
-                )
-            )
-
-            occupancy_result = await self.session.execute(occupancy_stmt)
-            avg_occupancy = int(occupancy_result.scalar() or 0)
-
-            # Список тренеров
-            coaches_stmt = select(
-                distinct(ScheduleBookingModel.trainer_name)
-            ).where(
-                and_(
-                    ScheduleBookingModel.booking_date >= start_date,
-                    ScheduleBookingModel.booking_date <= end_date,
-                    ScheduleBookingModel.category == category,
-                    ScheduleBookingModel.trainer_name.isnot(None),
-                )
-            )
-
-            coaches_result = await self.session.execute(coaches_stmt)
-            coaches_list = [
-                name for name in coaches_result.scalars().all() if name is not None
-            ]
-
             groups.append(
                 GroupAnalytics(
                     id=meta["id"],
                     name=meta["name"],
                     label=meta["label"],
-                    total_classes=total_classes,
-                    total_bookings=total_bookings,
+                    total_classes=row.total_classes if row else 0,
+                    total_bookings=int(row.total_bookings or 0) if row else 0,
                     load=load,
-                    coaches=coaches_list,
-                    avg_occupancy=avg_occupancy,
+                    coaches=list(row.coaches or []) if row else [],
+                    avg_occupancy=int(row.avg_occupancy or 0) if row else 0,
                 )
             )
 
@@ -263,10 +203,9 @@ class BodyScheduleRepository:
                 ).label("booked"),
                 func.count(
                     distinct(
-                        func.concat(
-                            cast(ScheduleBookingModel.booking_date, String),
-                            "-",
-                            cast(ScheduleBookingModel.booking_time, String),
+                        tuple_(
+                            ScheduleBookingModel.booking_date,
+                            ScheduleBookingModel.booking_time,
                         )
                     )
                 ).label("classes"),
@@ -311,30 +250,22 @@ class BodyScheduleRepository:
         """Получить загрузку залов."""
         from sqlalchemy import select
 
-        # Загрузка по залам (capsule_name)
+        # Загрузка по залам (capsule_name) из дневных агрегатов расписания
         stmt = (
             select(
-                ScheduleBookingModel.capsule_name.label("room"),
-                func.count(ScheduleBookingModel.id).label("total"),
-                func.count(
-                    case(
-                        (
-                            ScheduleBookingModel.status.in_(["Бронь", "Оплачено"]),
-                            1,
-                        ),
-                        else_=None,
-                    )
-                ).label("booked"),
+                BookingDailyRollup.capsule_name.label("room"),
+                func.sum(BookingDailyRollup.slots).label("total"),
+                func.sum(BookingDailyRollup.booked_slots).label("booked"),
             )
             .where(
                 and_(
-                    ScheduleBookingModel.booking_date >= start_date,
-                    ScheduleBookingModel.booking_date <= end_date,
-                    ScheduleBookingModel.category.in_(["Body Mind", "Pilates Reformer"]),
-                    ScheduleBookingModel.capsule_name.isnot(None),
+                    BookingDailyRollup.day >= start_date,
+                    BookingDailyRollup.day <= end_date,
+                    BookingDailyRollup.category.in_(["Body Mind", "Pilates Reformer"]),
+                    BookingDailyRollup.capsule_name != "",
                 )
             )
-            .group_by(ScheduleBookingModel.capsule_name)
+            .group_by(BookingDailyRollup.capsule_name)
         )
 
         result = await self.session.execute(stmt)
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.bot_conversation import BotConversation as BotConversationModel
+from app.schemas.bot_conversation import BotConversation as BotConversationSchema, BotConversationSave
+
+
+class BotConversationRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, chat_id: int, max_idle_seconds: int | None = None) -> BotConversationSchema:
+        """Диалог чата; отсутствующий или неактивный дольше `max_idle_seconds` — пустой.
+
+        У истёкшего диалога возвращается настоящая версия, чтобы следующая
+        запись перезаписала строку, а не упёрлась в конфликт.
+        """
+        row = (
+            await self.session.execute(
+                select(
+                    BotConversationModel.messages,
+                    BotConversationModel.version,
+                    BotConversationModel.updated_at,
+                ).where(BotConversationModel.chat_id == chat_id)
+            )
+        ).one_or_none()
+        if row is None:
+            return BotConversationSchema(chat_id=chat_id)
+        messages, version, updated_at = row
+        if max_idle_seconds and updated_at < datetime.now(timezone.utc) - timedelta(seconds=max_idle_seconds):
+            messages = []
+        return BotConversationSchema(chat_id=chat_id, messages=messages, version=version)
+
+    async def save(self, chat_id: int, data: BotConversationSave) -> int | None:
+        """Перезаписать диалог, если его версия не изменилась с момента чтения.
+
+        Возвращает новую версию или None при конфликте версий.
+        """
+        messages = [message.model_dump() for message in data.messages]
+        if data.expected_version == 0:
+            stmt = (
+                insert(BotConversationModel)
+                .values(chat_id=chat_id, messages=messages, version=1)
+                .on_conflict_do_nothing(index_elements=[BotConversationModel.chat_id])
+                .returning(BotConversationModel.version)
+            )
+        else:
+            stmt = (
+                update(BotConversationModel)
+                .where(
+                    BotConversationModel.chat_id == chat_id,
+                    BotConversationModel.version == data.expected_version,
+                )
+                .values(messages=messages, version=BotConversationModel.version + 1)
+                .returning(BotConversationModel.version)
+            )
+        version = await self.session.scalar(stmt)
+        await self.session.commit()
+        return version
+
+    async def delete(self, chat_id: int) -> None:
+        await self.session.execute(delete(BotConversationModel).where(BotConversationModel.chat_id == chat_id))
+        await self.session.commit()
+
+    async def purge_idle(self, max_idle_seconds: int) -> int:
+        """Удалить диалоги, неактивные дольше `max_idle_seconds`. Возвращает их число."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_idle_seconds)
+        result = await self.session.execute(
+            delete(BotConversationModel).where(BotConversationModel.updated_at < cutoff)
+        )
+        await self.session.commit()
+        return result.rowcount or 0
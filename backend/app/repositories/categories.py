@@ -3,11 +3,35 @@ from __future__ import annotations
 from uuid import uuid4
 
 from sqlalchemy import Select, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.category import Category as CategoryModel
 from app.schemas.category import Category as CategorySchema, CategoryCreate, CategoryUpdate
 
+# Подстроки названия категории -> направление. Те же правила, что в бэкфилле
+# миграции 202512160009; раньше аналитика проверяла их через ILIKE в каждом запросе.
+DIRECTION_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "Coworking": ("коворкинг", "coworking"),
+    "Kids": ("kids", "детск"),
+    "Body": ("body",),
+    "Coffee": ("coffee", "кофе"),
+}
+
+
+def classify_direction(name: str) -> str | None:
+    """Направление категории по её названию (None — не распознано)."""
+    lowered = name.casefold()
+    for direction, keywords in DIRECTION_KEYWORDS.items():
+        if any(keyword in lowered for keyword in keywords):
+            return direction
+    return None
+
+
+def direction_category_ids(direction: str) -> Select[tuple[int]]:
+    """Подзапрос id категорий направления — для фильтра `category_id IN (...)`."""
+    return select(CategoryModel.id).where(CategoryModel.direction == direction)
+
 
 class CategoryRepository:
     def __init__(self, session: AsyncSession):
@@ -35,12 +59,37 @@ class CategoryRepository:
             return self._to_schema(model)
         return None
 
+    async def resolve_id(self, name: str | None) -> int | None:
+        """id категории по названию; неизвестное название добавляется в справочник.
+
+        Не коммитит — вызывается репозиториями расписания, платежей и услуг
+        в той же транзакции, что и сама запись.
+        """
+        name = (name or "").strip()
+        if not name:
+            return None
+        category_id = await self.session.scalar(select(CategoryModel.id).where(CategoryModel.name == name))
+        if category_id is not None:
+            return category_id
+        stmt = (
+            insert(CategoryModel)
+            .values(public_id=str(uuid4()), name=name, direction=classify_direction(name))
+            .on_conflict_do_nothing(index_elements=[CategoryModel.name])
+            .returning(CategoryModel.id)
+        )
+        category_id = await self.session.scalar(stmt)
+        if category_id is None:
+            # Ту же категорию только что добавила параллельная транзакция
+            category_id = await self.session.scalar(select(CategoryModel.id).where(CategoryModel.name == name))
+        return category_id
+
     async def create_category(self, data: CategoryCreate) -> CategorySchema:
         model = CategoryModel(
             public_id=str(uuid4()),
             name=data.name,
             icon=data.icon,
             accent=data.accent,
+            direction=data.direction or classify_direction(data.name),
         )
         self.session.add(model)
         await self.session.commit()
@@ -79,5 +128,6 @@ class CategoryRepository:
             name=model.name,
             icon=model.icon,
             accent=model.accent,
+            direction=model.direction,
         )
 
@@ -2,23 +2,41 @@ from __future__ import annotations
 
 from typing import Literal
 
-from sqlalchemy import Select, func, or_, select
+from sqlalchemy import Select, case, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from uuid import uuid4
 
 from app.data.clients import CLIENTS as MOCK_CLIENTS, get_mock_client
+from app.core.cache import CacheTag, get_analytics_cache
+from app.db.pagination import Page, deferred_columns, load_rows, paginate
 from app.models.client import Client as ClientModel
+from app.repositories.rollups import RollupRepository
+from app.services.client_search import ClientSearchEntry, get_client_search_index
 from app.schemas.client import Client as ClientSchema, ClientCreate, ClientUpdate
 
 
 class ClientRepository:
+    # Поля схемы -> тяжёлые колонки, которые не читаются, если поле не запрошено в fields=
+    HEAVY_FIELDS = {
+        "visits": ClientModel.visits,
+        "contraindications": ClientModel.contraindications,
+        "coachNotes": ClientModel.coach_notes,
+    }
+
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.rollups = RollupRepository(session)
 
     def _base_query(self) -> Select[tuple[ClientModel]]:
         return select(ClientModel)
 
+    @staticmethod
+    def _like_pattern(value: str) -> str:
+        # Экранируем спецсимволы LIKE, чтобы «%» и «_» из поисковой строки искались буквально
+        escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
     def _apply_filters(
         self,
         stmt: Select[tuple[ClientModel]],
@@ -29,18 +47,18 @@ class ClientRepository:
         # Применяем фильтр по query только если он не пустой и не None
         if query and query.strip():
             query_trimmed = query.strip()
-            # Используем ILIKE для case-insensitive поиска (работает лучше с кириллицей)
-            like_pattern = f"%{query_trimmed}%"
             digits = "".join(filter(str.isdigit, query_trimmed))
+            handle = query_trimmed.lstrip("@")
             
             conditions = []
-            # Поиск по имени (case-insensitive через ILIKE)
-            conditions.append(ClientModel.name.ilike(like_pattern))
-            # Поиск по телефону (только если есть цифры)
+            # Поиск по имени (ILIKE, использует триграммный индекс ix_clients_name_trgm)
+            conditions.append(ClientModel.name.ilike(self._like_pattern(query_trimmed), escape="\\"))
+            # Поиск по телефону (только если есть цифры) по нормализованной колонке phone_digits
             if digits:
-                conditions.append(func.replace(ClientModel.phone, " ", "").like(f"%{digits}%"))
-            # Поиск по инстаграму (case-insensitive через ILIKE)
-            conditions.append(func.coalesce(ClientModel.instagram, "").ilike(like_pattern))
+                conditions.append(ClientModel.phone_digits.like(self._like_pattern(digits), escape="\\"))
+            # Поиск по инстаграму без учёта «@» (NULL просто не совпадает, coalesce не нужен)
+            if handle:
+                conditions.append(ClientModel.instagram.ilike(self._like_pattern(handle), escape="\\"))
             
             # Применяем OR условие - клиент должен соответствовать хотя бы одному из условий
             stmt = stmt.where(or_(*conditions))
@@ -55,28 +73,89 @@ class ClientRepository:
         
         return stmt
 
+    def _apply_ranking(self, stmt: Select[tuple[ClientModel]], query: str) -> Select[tuple[ClientModel]]:
+        """Сортирует найденных клиентов по релевантности.
+
+        Точное совпадение и префикс номера телефона идут первыми, затем
+        клиенты, у которых имя или инстаграм начинаются с запроса, затем —
+        по триграммной похожести (word_similarity из pg_trgm).
+        """
+        query_trimmed = query.strip()
+        digits = "".join(filter(str.isdigit, query_trimmed))
+        handle = query_trimmed.lstrip("@")
+        lowered = func.lower(query_trimmed)
+        instagram = func.lower(func.coalesce(ClientModel.instagram, ""))
+
+        scores = [
+            func.word_similarity(lowered, func.lower(ClientModel.name)),
+            func.word_similarity(func.lower(handle), instagram),
+            case((func.starts_with(func.lower(ClientModel.name), lowered), 1.0), else_=0.0),
+            case((func.starts_with(func.ltrim(instagram, "@"), func.lower(handle)), 0.9), else_=0.0),
+        ]
+        # Телефонные совпадения учитываем только для запросов из достаточного числа цифр
+        if len(digits) >= 3:
+            scores.append(
+                case(
+                    (ClientModel.phone_digits == digits, 2.0),
+                    (func.starts_with(ClientModel.phone_digits, digits), 1.5),
+                    (func.strpos(ClientModel.phone_digits, digits) > 0, 1.2),
+                    else_=0.0,
+                )
+            )
+        rank = func.greatest(*scores)
+        return stmt.order_by(rank.desc(), ClientModel.name, ClientModel.id)
+
     async def list_clients(
         self,
         query: str | None,
         direction: Literal["Body", "Coworking", "Coffee"] | None,
         status: Literal["Активный", "Новый", "Ушедший"] | None,
-    ) -> list[ClientSchema]:
+        limit: int | None = None,
+        cursor: str | None = None,
+        fields: set[str] | None = None,
+    ) -> Page[ClientSchema]:
+        """Список клиентов по имени (keyset по (name, id)) или поиск по релевантности.
+
+        Поиск с `query` отдаёт первые `limit` клиентов по релевантности без курсора:
+        оценка похожести не подходит в ключ keyset-пагинации. Если in-process индекс
+        (app.services.client_search) построен, поиск идёт по нему, иначе — через SQL.
+        """
+        deferred = deferred_columns(self.HEAVY_FIELDS, fields)
+
         # Если query пустой или None:
         # - Если есть фильтры (direction или status) - возвращаем всех клиентов с этими фильтрами
         # - Если нет фильтров - возвращаем всех клиентов (для страницы списка клиентов)
         if not query or not query.strip():
             # Нет поискового запроса - возвращаем всех клиентов (с фильтрами, если есть)
             stmt = self._apply_filters(self._base_query(), None, direction, status)
-            result = await self.session.scalars(stmt)
-            rows = result.all()
-            return [self._to_schema(obj) for obj in rows]
+            page = await paginate(
+                self.session,
+                stmt,
+                [ClientModel.name, ClientModel.id],
+                limit=limit,
+                cursor=cursor,
+                deferred=deferred,
+            )
+            return Page(items=[self._to_schema(obj) for obj in page.items], next_cursor=page.next_cursor)
+        
+        index = get_client_search_index()
+        if index.ready:
+            # Поиск по in-process индексу, из базы читаются только найденные строки
+            public_ids = index.search(query, direction=direction, status=status, limit=limit)
+            stmt = self._base_query().where(ClientModel.public_id.in_(public_ids))
+            rows_by_id = {obj.public_id: obj for obj in await load_rows(self.session, stmt, deferred)}
+            return Page(
+                items=[self._to_schema(rows_by_id[public_id]) for public_id in public_ids if public_id in rows_by_id]
+            )
         
         stmt = self._apply_filters(self._base_query(), query, direction, status)
-        result = await self.session.scalars(stmt)
-        rows = result.all()
+        stmt = self._apply_ranking(stmt, query)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        rows = await load_rows(self.session, stmt, deferred)
         
         # Возвращаем только данные из базы, без fallback на мок-данные
-        return [self._to_schema(obj) for obj in rows]
+        return Page(items=[self._to_schema(obj) for obj in rows])
 
     async def get_by_public_id(self, public_id: str) -> ClientSchema | None:
         import logging
@@ -140,8 +219,12 @@ class ClientRepository:
                 coach_notes=data.coachNotes,
             )
             self.session.add(model)
+            await self.session.flush()
+            await self.rollups.apply_clients(ClientModel.id == model.id)
             await self.session.commit()
+            await get_analytics_cache().invalidate(CacheTag.CLIENTS)
             await self.session.refresh(model)
+            get_client_search_index().upsert(self._search_entry(model))
             
             logger.info(f"Client created in DB: public_id={model.public_id}, contract_number={model.contract_number}, subscription_number={model.subscription_number}, birth_date={model.birth_date}")
             
@@ -177,8 +260,12 @@ class ClientRepository:
                 model.instagram = data.instagram
             if data.source is not None:
                 model.source = data.source
-            if data.direction is not None:
+            if data.direction is not None and data.direction.value != model.direction:
+                # Направление входит в ключ дневного агрегата новых клиентов
+                await self.rollups.apply_clients(ClientModel.id == model.id, sign=-1)
                 model.direction = data.direction.value
+                await self.session.flush()
+                await self.rollups.apply_clients(ClientModel.id == model.id)
             if data.status is not None:
                 model.status = data.status.value
             if data.contraindications is not None:
@@ -187,7 +274,9 @@ class ClientRepository:
                 model.coach_notes = data.coachNotes
 
             await self.session.commit()
+            await get_analytics_cache().invalidate(CacheTag.CLIENTS)
             await self.session.refresh(model)
+            get_client_search_index().upsert(self._search_entry(model))
             return self._to_schema(model)
         except Exception:
             await self.session.rollback()
@@ -243,6 +332,12 @@ class ClientRepository:
         await self.session.refresh(model)
         return self._to_schema(model)
 
+    @staticmethod
+    def _search_entry(model: ClientModel) -> ClientSearchEntry:
+        return ClientSearchEntry.build(
+            model.public_id, model.name, model.phone, model.instagram, model.direction, model.status
+        )
+
     @staticmethod
     def _to_schema(model: ClientModel) -> ClientSchema:
         import logging
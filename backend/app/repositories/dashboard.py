@@ -1,16 +1,17 @@
 from __future__ import annotations
 
 from datetime import date, timedelta
-from sqlalchemy import select, func, and_, case, distinct, cast, String, or_
+from sqlalchemy import select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.session import run_concurrently
 from app.models.dashboard import DashboardLoad, DashboardHighlight
-from app.models.payment import Payment as PaymentModel
-from app.models.client import Client as ClientModel
-from app.models.schedule_booking import ScheduleBooking as ScheduleBookingModel
-from app.schemas.dashboard import DashboardSummary, KpiCard, LoadSnapshotItem, AiHighlight, Trend
+from app.models.rollup import BookingDailyRollup
+from app.schemas.dashboard import DashboardSummary, KpiCard, LoadSnapshotItem, AiHighlight
 from app.schemas.booking import TodayBooking
 from app.repositories.body_schedule import BodyScheduleRepository
+from app.repositories.categories import direction_category_ids
+from app.repositories.kpi import KpiEngine
 
 
 class DashboardRepository:
@@ -18,333 +19,62 @@ class DashboardRepository:
         self.session = session
 
     async def fetch_summary(self) -> DashboardSummary | None:
-        # Рассчитываем реальные KPI
-        kpis = await self._calculate_kpis()
-        
-        # Рассчитываем реальную загрузку по направлениям
-        loads = await self._calculate_load()
-        
-        # Highlights из таблиц
-        highlight_rows = await self.session.scalars(
-            select(DashboardHighlight).order_by(DashboardHighlight.sort_order, DashboardHighlight.id)
-        )
+        # Получаем текущую неделю для расчета загрузки
+        today = date.today()
+        days_since_monday = today.weekday()
+        monday = today - timedelta(days=days_since_monday)
+        sunday = monday + timedelta(days=6)
 
-        highlights = [self._map_highlight(row) for row in highlight_rows]
+        # KPI, загрузка по направлениям и highlights независимы друг от друга,
+        # поэтому выполняем их параллельно, каждый в своей сессии из пула
+        kpis, coworking_load, kids_load, body_loads, highlights = await run_concurrently(
+            lambda session: DashboardRepository(session)._calculate_kpis(),
+            lambda session: DashboardRepository(session)._calculate_coworking_load(monday, sunday),
+            lambda session: DashboardRepository(session)._calculate_kids_load(monday, sunday),
+            lambda session: DashboardRepository(session)._calculate_body_loads(monday, sunday),
+            lambda session: DashboardRepository(session)._fetch_highlights(),
+        )
 
         # Если нет KPI, возвращаем None (будет использован fallback)
         if not kpis:
             return None
 
-        # Если нет loads или highlights, используем пустые списки
-        if not loads:
-            loads = []
-        if not highlights:
-            highlights = []
+        # Загрузка: коворкинг, детская, Body Mind и Pilates Reformer
+        loads = [load for load in (coworking_load, kids_load) if load] + body_loads
 
         return DashboardSummary(kpi=kpis, load=loads, highlights=highlights)
 
     async def _calculate_kpis(self) -> list[KpiCard]:
-        """Рассчитать реальные KPI из данных."""
-        kpis = []
-        
-        # 1. Выручка
-        revenue_kpi = await self._calculate_revenue()
-        if revenue_kpi:
-            kpis.append(revenue_kpi)
-        
-        # 2. Проданные абонементы
-        subscriptions_kpi = await self._calculate_subscriptions()
-        if subscriptions_kpi:
-            kpis.append(subscriptions_kpi)
-        
-        # 3. Новые клиенты
-        clients_kpi = await self._calculate_new_clients()
-        if clients_kpi:
-            kpis.append(clients_kpi)
-        
-        # 4. Записи на сегодня (пока оставляем как есть, потом сделаем)
-        # Можно добавить позже
-        
-        return kpis
+        """Рассчитать реальные KPI из данных.
 
-    async def _calculate_revenue(self) -> KpiCard | None:
-        """Рассчитать выручку за текущий месяц и сравнить с прошлым."""
-        from sqlalchemy import cast, Date
-        
-        today = date.today()
-        # Начало текущего месяца
-        current_month_start = date(today.year, today.month, 1)
-        # Конец текущего месяца
-        if today.month == 12:
-            current_month_end = date(today.year + 1, 1, 1) - timedelta(days=1)
-        else:
-            current_month_end = date(today.year, today.month + 1, 1) - timedelta(days=1)
-        
-        # Начало прошлого месяца
-        if today.month == 1:
-            previous_month_start = date(today.year - 1, 12, 1)
-            previous_month_end = date(today.year, 1, 1) - timedelta(days=1)
-        else:
-            previous_month_start = date(today.year, today.month - 1, 1)
-            previous_month_end = date(today.year, today.month, 1) - timedelta(days=1)
-        
-        # Текущий месяц
-        current_stmt = select(func.sum(PaymentModel.total_amount)).where(
-            and_(
-                cast(PaymentModel.created_at, Date) >= current_month_start,
-                cast(PaymentModel.created_at, Date) <= current_month_end,
-                PaymentModel.status == 'completed'
-            )
-        )
-        current_result = await self.session.scalar(current_stmt)
-        current_revenue = int(current_result or 0)
-        
-        # Прошлый месяц
-        previous_stmt = select(func.sum(PaymentModel.total_amount)).where(
-            and_(
-                cast(PaymentModel.created_at, Date) >= previous_month_start,
-                cast(PaymentModel.created_at, Date) <= previous_month_end,
-                PaymentModel.status == 'completed'
-            )
-        )
-        previous_result = await self.session.scalar(previous_stmt)
-        previous_revenue = int(previous_result or 0)
-        
-        # Расчет изменения
-        if previous_revenue > 0:
-            change_percent = ((current_revenue - previous_revenue) / previous_revenue) * 100
-            change_str = f"{'+' if change_percent >= 0 else ''}{change_percent:.1f}%"
-            trend = Trend.UP if change_percent >= 0 else Trend.DOWN
-        else:
-            change_str = "0%"
-            trend = Trend.UP if current_revenue > 0 else Trend.DOWN
-        
-        # Форматирование суммы с пробелами
-        revenue_str = f"{current_revenue:,}".replace(",", " ")
-        
-        return KpiCard(
-            label="Выручка",
-            value=revenue_str,
-            unit="сум",
-            change=change_str,
-            trend=trend,
-            icon="DollarSign",
-            color="#10B981",
-        )
+        Все карточки берутся из реестра KPI и считаются одним запросом
+        на таблицу-источник (текущий и прошлый месяц сразу).
+        """
+        return await KpiEngine(self.session).compute()
 
-    async def _calculate_subscriptions(self) -> KpiCard | None:
-        """Рассчитать количество проданных абонементов за текущий месяц."""
-        from sqlalchemy import cast, Date, or_
-        
-        today = date.today()
-        # Начало текущего месяца
-        current_month_start = date(today.year, today.month, 1)
-        # Конец текущего месяца
-        if today.month == 12:
-            current_month_end = date(today.year + 1, 1, 1) - timedelta(days=1)
-        else:
-            current_month_end = date(today.year, today.month + 1, 1) - timedelta(days=1)
-        
-        # Начало прошлого месяца
-        if today.month == 1:
-            previous_month_start = date(today.year - 1, 12, 1)
-            previous_month_end = date(today.year, 1, 1) - timedelta(days=1)
-        else:
-            previous_month_start = date(today.year, today.month - 1, 1)
-            previous_month_end = date(today.year, today.month, 1) - timedelta(days=1)
-        
-        # Текущий месяц - считаем количество уникальных абонементов
-        # Группируем по client_id + service_name (как на странице subscriptions)
-        # Фильтруем только Body абонементы (категория Body или название содержит body)
-        # Исключаем разовые (quantity = 1 и нет слова "абонемент")
-        
-        # Используем подзапрос с GROUP BY для правильной группировки
-        # Создаем подзапрос для группировки
-        subquery_current = select(
-            func.coalesce(PaymentModel.client_id, PaymentModel.client_name).label('client_key'),
-            PaymentModel.service_name.label('service_name')
-        ).where(
-            and_(
-                cast(PaymentModel.created_at, Date) >= current_month_start,
-                cast(PaymentModel.created_at, Date) <= current_month_end,
-                PaymentModel.status == 'completed',
-                PaymentModel.quantity > 0,
-                or_(
-                    PaymentModel.service_category.ilike('%body%'),
-                    PaymentModel.service_name.ilike('%body%')
-                ),
-                # Исключаем разовые: quantity > 1 или название содержит "абонемент"
-                or_(
-                    PaymentModel.quantity > 1,
-                    PaymentModel.service_name.ilike('%абонемент%')
-                )
-            )
-        ).group_by(
-            func.coalesce(PaymentModel.client_id, PaymentModel.client_name),
-            PaymentModel.service_name
-        ).subquery()
-        
-        current_stmt = select(func.count()).select_from(subquery_current)
-        current_result = await self.session.scalar(current_stmt)
-        current_subscriptions = int(current_result or 0)
-        
-        # Прошлый месяц
-        subquery_previous = select(
-            func.coalesce(PaymentModel.client_id, PaymentModel.client_name).label('client_key'),
-            PaymentModel.service_name.label('service_name')
-        ).where(
-            and_(
-                cast(PaymentModel.created_at, Date) >= previous_month_start,
-                cast(PaymentModel.created_at, Date) <= previous_month_end,
-                PaymentModel.status == 'completed',
-                PaymentModel.quantity > 0,
-                or_(
-                    PaymentModel.service_category.ilike('%body%'),
-                    PaymentModel.service_name.ilike('%body%')
-                ),
-                or_(
-                    PaymentModel.quantity > 1,
-                    PaymentModel.service_name.ilike('%абонемент%')
-                )
-            )
-        ).group_by(
-            func.coalesce(PaymentModel.client_id, PaymentModel.client_name),
-            PaymentModel.service_name
-        ).subquery()
-        
-        previous_stmt = select(func.count()).select_from(subquery_previous)
-        previous_result = await self.session.scalar(previous_stmt)
-        previous_subscriptions = int(previous_result or 0)
-        
-        # Расчет изменения
-        if previous_subscriptions > 0:
-            change_percent = ((current_subscriptions - previous_subscriptions) / previous_subscriptions) * 100
-            change_str = f"{'+' if change_percent >= 0 else ''}{change_percent:.1f}%"
-            trend = Trend.UP if change_percent >= 0 else Trend.DOWN
-        else:
-            change_str = "0%"
-            trend = Trend.UP if current_subscriptions > 0 else Trend.DOWN
-        
-        return KpiCard(
-            label="Проданных абонементов",
-            value=str(current_subscriptions),
-            unit="",
-            change=change_str,
-            trend=trend,
-            icon="CreditCard",
-            color="#8B5CF6",
-        )
-
-    async def _calculate_new_clients(self) -> KpiCard | None:
-        """Рассчитать количество новых клиентов за текущий месяц."""
-        from sqlalchemy import cast, Date
-        
-        today = date.today()
-        # Начало текущего месяца
-        current_month_start = date(today.year, today.month, 1)
-        # Конец текущего месяца
-        if today.month == 12:
-            current_month_end = date(today.year + 1, 1, 1) - timedelta(days=1)
-        else:
-            current_month_end = date(today.year, today.month + 1, 1) - timedelta(days=1)
-        
-        # Начало прошлого месяца
-        if today.month == 1:
-            previous_month_start = date(today.year - 1, 12, 1)
-            previous_month_end = date(today.year, 1, 1) - timedelta(days=1)
-        else:
-            previous_month_start = date(today.year, today.month - 1, 1)
-            previous_month_end = date(today.year, today.month, 1) - timedelta(days=1)
-        
-        # Текущий месяц
-        current_stmt = select(func.count(ClientModel.id)).where(
-            and_(
-                cast(ClientModel.created_at, Date) >= current_month_start,
-                cast(ClientModel.created_at, Date) <= current_month_end
-            )
-        )
-        current_result = await self.session.scalar(current_stmt)
-        current_clients = int(current_result or 0)
-        
-        # Прошлый месяц
-        previous_stmt = select(func.count(ClientModel.id)).where(
-            and_(
-                cast(ClientModel.created_at, Date) >= previous_month_start,
-                cast(ClientModel.created_at, Date) <= previous_month_end
-            )
-        )
-        previous_result = await self.session.scalar(previous_stmt)
-        previous_clients = int(previous_result or 0)
-        
-        # Расчет изменения
-        if previous_clients > 0:
-            change_percent = ((current_clients - previous_clients) / previous_clients) * 100
-            change_str = f"{'+' if change_percent >= 0 else ''}{change_percent:.1f}%"
-            trend = Trend.UP if change_percent >= 0 else Trend.DOWN
-        else:
-            change_str = "0%"
-            trend = Trend.UP if current_clients > 0 else Trend.DOWN
-        
-        return KpiCard(
-            label="Кол-во новых клиентов",
-            value=str(current_clients),
-            unit="",
-            change=change_str,
-            trend=trend,
-            icon="Users",
-            color="#6366F1",
+    async def _fetch_highlights(self) -> list[AiHighlight]:
+        """Highlights из таблиц."""
+        highlight_rows = await self.session.scalars(
+            select(DashboardHighlight).order_by(DashboardHighlight.sort_order, DashboardHighlight.id)
         )
-
-    async def _calculate_load(self) -> list[LoadSnapshotItem]:
-        """Рассчитать загрузку по направлениям: коворкинг, детская, Body Mind, Pilates Reformer."""
-        loads = []
-        
-        # Получаем текущую неделю
-        today = date.today()
-        days_since_monday = today.weekday()
-        monday = today - timedelta(days=days_since_monday)
-        sunday = monday + timedelta(days=6)
-        
-        # 1. Коворкинг капсулы
-        coworking_load = await self._calculate_coworking_load(monday, sunday)
-        if coworking_load:
-            loads.append(coworking_load)
-        
-        # 2. Детская
-        kids_load = await self._calculate_kids_load(monday, sunday)
-        if kids_load:
-            loads.append(kids_load)
-        
-        # 3. Body Mind и Pilates Reformer (используем BodyScheduleRepository)
-        body_loads = await self._calculate_body_loads(monday, sunday)
-        loads.extend(body_loads)
-        
-        return loads
+        return [self._map_highlight(row) for row in highlight_rows]
 
     async def _calculate_coworking_load(self, start_date: date, end_date: date) -> LoadSnapshotItem | None:
         """Рассчитать загрузку коворкинга (капсулы)."""
-        # Считаем все записи с категорией "Коворкинг" или где есть capsule_id
+        # Считаем все записи категорий направления Coworking или где есть capsule_id
+        # (по дневным агрегатам расписания, см. RollupRepository)
         stmt = select(
-            func.count(ScheduleBookingModel.id).label("total_slots"),
-            func.count(
-                case(
-                    (
-                        ScheduleBookingModel.status.in_(["Бронь", "Оплачено"]),
-                        1,
-                    ),
-                    else_=None,
-                )
-            ).label("booked_slots"),
-            func.sum(ScheduleBookingModel.max_capacity).label("total_capacity"),
-            func.sum(ScheduleBookingModel.current_count).label("total_booked"),
+            func.sum(BookingDailyRollup.slots).label("total_slots"),
+            func.sum(BookingDailyRollup.booked_slots).label("booked_slots"),
+            func.sum(BookingDailyRollup.capacity).label("total_capacity"),
+            func.sum(BookingDailyRollup.booked_count).label("total_booked"),
         ).where(
             and_(
-                ScheduleBookingModel.booking_date >= start_date,
-                ScheduleBookingModel.booking_date <= end_date,
+                BookingDailyRollup.day >= start_date,
+                BookingDailyRollup.day <= end_date,
                 or_(
-                    ScheduleBookingModel.category.ilike('%коворкинг%'),
-                    ScheduleBookingModel.category.ilike('%coworking%'),
-                    ScheduleBookingModel.capsule_id.isnot(None),
+                    BookingDailyRollup.category_id.in_(direction_category_ids("Coworking")),
+                    BookingDailyRollup.capsule_id != "",
                 ),
             )
         )
@@ -378,27 +108,15 @@ class DashboardRepository:
     async def _calculate_kids_load(self, start_date: date, end_date: date) -> LoadSnapshotItem | None:
         """Рассчитать загрузку детской."""
         stmt = select(
-            func.count(ScheduleBookingModel.id).label("total_slots"),
-            func.count(
-                case(
-                    (
-                        ScheduleBookingModel.status.in_(["Бронь", "Оплачено"]),
-                        1,
-                    ),
-                    else_=None,
-                )
-            ).label("booked_slots"),
-            func.sum(ScheduleBookingModel.max_capacity).label("total_capacity"),
-            func.sum(ScheduleBookingModel.current_count).label("total_booked"),
+            func.sum(BookingDailyRollup.slots).label("total_slots"),
+            func.sum(BookingDailyRollup.booked_slots).label("booked_slots"),
+            func.sum(BookingDailyRollup.capacity).label("total_capacity"),
+            func.sum(BookingDailyRollup.booked_count).label("total_booked"),
         ).where(
             and_(
-                ScheduleBookingModel.booking_date >= start_date,
-                ScheduleBookingModel.booking_date <= end_date,
-                or_(
-                    ScheduleBookingModel.category.ilike('%kids%'),
-                    ScheduleBookingModel.category.ilike('%детск%'),
-                    ScheduleBookingModel.category.ilike('%eywa kids%'),
-                ),
+                BookingDailyRollup.day >= start_date,
+                BookingDailyRollup.day <= end_date,
+                BookingDailyRollup.category_id.in_(direction_category_ids("Kids")),
             )
         )
         
@@ -432,11 +150,12 @@ class DashboardRepository:
         loads = []
         
         # Используем BodyScheduleRepository для получения данных
+        # (нужны только группы, поэтому остальные разделы аналитики не считаем)
         body_repo = BodyScheduleRepository(self.session)
-        analytics = await body_repo.get_analytics(start_date, end_date)
+        groups = await body_repo.get_groups(start_date, end_date)
         
         # Body Mind
-        body_group = next((g for g in analytics.groups if g.id == "body"), None)
+        body_group = next((g for g in groups if g.id == "body"), None)
         if body_group:
             loads.append(LoadSnapshotItem(
                 label="Body Mind",
@@ -446,7 +165,7 @@ class DashboardRepository:
             ))
         
         # Pilates Reformer
-        reform_group = next((g for g in analytics.groups if g.id == "reform"), None)
+        reform_group = next((g for g in groups if g.id == "reform"), None)
         if reform_group:
             loads.append(LoadSnapshotItem(
                 label="Pilates Reformer",
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+
+from sqlalchemy import ColumnElement, Date, and_, distinct, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.payment import Payment as PaymentModel
+from app.models.rollup import ClientDailyRollup, PaymentDailyRollup
+from app.repositories.categories import direction_category_ids
+from app.schemas.dashboard import KpiCard, Trend
+
+
+@dataclass(frozen=True)
+class KpiSource:
+    """Таблица-источник для KPI: одна таблица = один запрос к БД."""
+
+    name: str
+    table: type
+    time_column: ColumnElement
+    where: tuple[ColumnElement[bool], ...] = ()
+
+
+@dataclass(frozen=True)
+class KpiDefinition:
+    """Описание KPI-карточки.
+
+    `measure` получает условие попадания строки в период и возвращает агрегат
+    с этим условием (обычно через `FILTER (WHERE ...)`).
+    """
+
+    key: str
+    label: str
+    icon: str
+    color: str
+    source: KpiSource
+    measure: Callable[[ColumnElement[bool]], ColumnElement]
+    unit: str = ""
+    sort_order: int = 0
+    format_value: Callable[[int], str] = str
+
+
+@dataclass
+class KpiRegistry:
+    """Реестр KPI. Новые карточки добавляются сюда и не порождают новых запросов."""
+
+    definitions: dict[str, KpiDefinition] = field(default_factory=dict)
+
+    def register(self, definition: KpiDefinition) -> KpiDefinition:
+        if definition.key in self.definitions:
+            raise ValueError(f"KPI '{definition.key}' уже зарегистрирован")
+        self.definitions[definition.key] = definition
+        return definition
+
+    def ordered(self) -> list[KpiDefinition]:
+        return sorted(self.definitions.values(), key=lambda d: d.sort_order)
+
+
+def month_bounds(today: date) -> tuple[date, date, date]:
+    """Вернуть (начало прошлого месяца, начало текущего, начало следующего)."""
+    current_start = date(today.year, today.month, 1)
+    if today.month == 12:
+        next_start = date(today.year + 1, 1, 1)
+    else:
+        next_start = date(today.year, today.month + 1, 1)
+    if today.month == 1:
+        previous_start = date(today.year - 1, 12, 1)
+    else:
+        previous_start = date(today.year, today.month - 1, 1)
+    return previous_start, current_start, next_start
+
+
+def format_change(current: int, previous: int) -> tuple[str, Trend]:
+    """Процент изменения к прошлому периоду и направление тренда."""
+    if previous > 0:
+        change_percent = ((current - previous) / previous) * 100
+        change_str = f"{'+' if change_percent >= 0 else ''}{change_percent:.1f}%"
+        trend = Trend.UP if change_percent >= 0 else Trend.DOWN
+    else:
+        change_str = "0%"
+        trend = Trend.UP if current > 0 else Trend.DOWN
+    return change_str, trend
+
+
+def format_amount(value: int) -> str:
+    """Форматирование суммы с пробелами между разрядами."""
+    return f"{value:,}".replace(",", " ")
+
+
+class KpiEngine:
+    """Считает все KPI «месяц к месяцу» одним запросом на таблицу-источник.
+
+    Границы периодов полуоткрытые (`>= start AND < end`) и сравниваются с самой
+    колонкой времени без `cast(..., Date)`, поэтому Postgres может использовать индекс.
+    """
+
+    def __init__(self, session: AsyncSession, registry: KpiRegistry | None = None):
+        self.session = session
+        self.registry = registry or KPI_REGISTRY
+
+    async def compute(self, today: date | None = None) -> list[KpiCard]:
+        previous_start, current_start, next_start = month_bounds(today or date.today())
+
+        by_source: dict[str, list[KpiDefinition]] = {}
+        sources: dict[str, KpiSource] = {}
+        for definition in self.registry.ordered():
+            by_source.setdefault(definition.source.name, []).append(definition)
+            sources[definition.source.name] = definition.source
+
+        values: dict[str, tuple[int, int]] = {}
+        for name, definitions in by_source.items():
+            values.update(
+                await self._compute_source(
+                    sources[name], definitions, previous_start, current_start, next_start
+                )
+            )
+
+        cards = []
+        for definition in self.registry.ordered():
+            current, previous = values[definition.key]
+            change, trend = format_change(current, previous)
+            cards.append(
+                KpiCard(
+                    label=definition.label,
+                    value=definition.format_value(current),
+                    unit=definition.unit,
+                    change=change,
+                    trend=trend,
+                    icon=definition.icon,
+                    color=definition.color,
+                )
+            )
+        return cards
+
+    async def _compute_source(
+        self,
+        source: KpiSource,
+        definitions: list[KpiDefinition],
+        previous_start: date,
+        current_start: date,
+        next_start: date,
+    ) -> dict[str, tuple[int, int]]:
+        column = source.time_column
+        lower = self._bound(column, previous_start)
+        middle = self._bound(column, current_start)
+        upper = self._bound(column, next_start)
+
+        in_previous = and_(column >= lower, column < middle)
+        in_current = and_(column >= middle, column < upper)
+
+        columns = []
+        for definition in definitions:
+            columns.append(definition.measure(in_current).label(f"{definition.key}__current"))
+            columns.append(definition.measure(in_previous).label(f"{definition.key}__previous"))
+
+        stmt = select(*columns).select_from(source.table).where(
+            column >= lower,
+            column < upper,
+            *source.where,
+        )
+        row = (await self.session.execute(stmt)).mappings().one()
+
+        return {
+            definition.key: (
+                int(row[f"{definition.key}__current"] or 0),
+                int(row[f"{definition.key}__previous"] or 0),
+            )
+            for definition in definitions
+        }
+
+    @staticmethod
+    def _bound(column: ColumnElement, day: date) -> date | datetime:
+        if isinstance(column.type, Date):
+            return day
+        return datetime.combine(day, time.min)
+
+
+PAYMENTS_SOURCE = KpiSource(
+    name="payments",
+    table=PaymentModel,
+    time_column=PaymentModel.created_at,
+    where=(PaymentModel.status == "completed",),
+)
+
+# Выручка и новые клиенты читаются из дневных агрегатов: O(дней) вместо O(строк)
+PAYMENT_ROLLUP_SOURCE = KpiSource(
+    name="payment_daily_rollups",
+    table=PaymentDailyRollup,
+    time_column=PaymentDailyRollup.day,
+    where=(PaymentDailyRollup.status == "completed",),
+)
+
+CLIENT_ROLLUP_SOURCE = KpiSource(
+    name="client_daily_rollups",
+    table=ClientDailyRollup,
+    time_column=ClientDailyRollup.day,
+)
+
+# Абонементы Body: группируем по client_id/client_name + service_name (как на странице subscriptions).
+# Вид продажи и категория определяются один раз при записи платежа (kind, category_id).
+# Платёж без категории классифицируется по названию услуги; платёж с категорией
+# другого направления и «Body» в названии услуги больше не считается абонементом Body.
+_IS_BODY_SUBSCRIPTION = and_(
+    PaymentModel.quantity > 0,
+    PaymentModel.kind == "subscription",
+    PaymentModel.category_id.in_(direction_category_ids("Body")),
+)
+
+KPI_REGISTRY = KpiRegistry()
+
+KPI_REGISTRY.register(
+    KpiDefinition(
+        key="revenue",
+        label="Выручка",
+        unit="сум",
+        icon="DollarSign",
+        color="#10B981",
+        source=PAYMENT_ROLLUP_SOURCE,
+        measure=lambda in_period: func.sum(PaymentDailyRollup.revenue).filter(in_period),
+        format_value=format_amount,
+        sort_order=1,
+    )
+)
+
+KPI_REGISTRY.register(
+    KpiDefinition(
+        key="subscriptions",
+        label="Проданных абонементов",
+        icon="CreditCard",
+        color="#8B5CF6",
+        source=PAYMENTS_SOURCE,
+        measure=lambda in_period: func.count(
+            distinct(
+                tuple_(
+                    func.coalesce(PaymentModel.client_id, PaymentModel.client_name),
+                    PaymentModel.service_name,
+                )
+            )
+        ).filter(and_(in_period, _IS_BODY_SUBSCRIPTION)),
+        sort_order=2,
+    )
+)
+
+KPI_REGISTRY.register(
+    KpiDefinition(
+        key="new_clients",
+        label="Кол-во новых клиентов",
+        icon="Users",
+        color="#6366F1",
+        source=CLIENT_ROLLUP_SOURCE,
+        measure=lambda in_period: func.sum(ClientDailyRollup.new_clients).filter(in_period),
+        sort_order=3,
+    )
+)
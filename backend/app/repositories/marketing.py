@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from datetime import datetime, timedelta, timezone
-from typing import Iterable
+from datetime import datetime, time, timedelta, timezone
 
-from sqlalchemy import select
+from sqlalchemy import String, cast, func, literal, literal_column, null, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.application import Application as ApplicationModel
@@ -29,19 +28,59 @@ class MarketingRepository:
         self.session = session
 
     async def fetch_traffic(self, days: int = 14) -> MarketingTrafficResponse:
-        """Aggregate marketing traffic based on Applications table."""
-        stmt = select(ApplicationModel)
-        result = await self.session.scalars(stmt)
-        applications = result.all()
+        """Aggregate marketing traffic based on Applications table.
+
+        One query: counts by platform/stage plus a gap-filled daily trend,
+        combined with UNION ALL. Application rows (and chat_history) are never loaded.
+        """
+        today = datetime.now(tz=timezone.utc).date()
+        first_day = datetime.combine(today - timedelta(days=days - 1), time.min)
+        last_day = datetime.combine(today, time.min)
+
+        stage_counts = select(
+            literal("stage").label("kind"),
+            cast(ApplicationModel.platform, String).label("platform"),
+            cast(ApplicationModel.stage, String).label("stage"),
+            null().label("day"),
+            func.count(ApplicationModel.id).label("total"),
+        ).group_by(ApplicationModel.platform, ApplicationModel.stage)
+
+        # Дни считаем в UTC; фильтр по самой колонке created_at, чтобы работал индекс
+        day = func.date_trunc("day", func.timezone("UTC", ApplicationModel.created_at))
+        daily_counts = (
+            select(day.label("day"), func.count(ApplicationModel.id).label("total"))
+            .where(ApplicationModel.created_at >= first_day.replace(tzinfo=timezone.utc))
+            .group_by(day)
+            .subquery("daily_counts")
+        )
+        series = select(
+            func.generate_series(first_day, last_day, literal_column("interval '1 day'")).label("day")
+        ).subquery("days")
+        trend_counts = select(
+            literal("trend").label("kind"),
+            null().label("platform"),
+            null().label("stage"),
+            series.c.day,
+            func.coalesce(daily_counts.c.total, 0).label("total"),
+        ).select_from(series.outerjoin(daily_counts, daily_counts.c.day == series.c.day))
+
+        result = await self.session.execute(union_all(stage_counts, trend_counts))
+        rows = result.all()
 
         channels: dict[str, dict[str, int]] = defaultdict(
             lambda: {"leads": 0, "inquiry": 0, "trial": 0, "sale": 0}
         )
+        trend: list[TrafficTrendPoint] = []
+
+        for row in rows:
+            if row.kind == "trend":
+                trend.append(TrafficTrendPoint(date=row.day.date(), leads=row.total))
+                continue
+            channel = channels[row.platform]
+            channel["leads"] += row.total
+            channel[row.stage] += row.total
 
-        for app in applications:
-            channel = channels[app.platform]
-            channel["leads"] += 1
-            channel[app.stage] += 1
+        trend.sort(key=lambda point: point.date)
 
         channel_models = [
             TrafficChannel(
@@ -67,8 +106,6 @@ class MarketingRepository:
             ),
         )
 
-        trend = self._build_trend(applications, days=days)
-
         return MarketingTrafficResponse(
             summary=summary,
             channels=sorted(
@@ -80,24 +117,25 @@ class MarketingRepository:
         )
 
     async def fetch_conversions(self) -> MarketingConversionsResponse:
-        """Build conversion funnel per platform from applications."""
-        stmt = select(ApplicationModel)
-        result = await self.session.scalars(stmt)
-        applications = result.all()
-
-        rows: dict[str, dict[str, int]] = defaultdict(
-            lambda: {"leads": 0, "bookings": 0, "visits": 0, "sales": 0}
-        )
-
-        for app in applications:
-            bucket = rows[app.platform]
-            bucket["leads"] += 1
+        """Build conversion funnel per platform from applications (one grouped query)."""
+        stmt = select(
+            cast(ApplicationModel.platform, String).label("platform"),
+            func.count(ApplicationModel.id).label("leads"),
             # Используем существующие стадии: inquiry -> leads, trial -> bookings/visits, sale -> sales
-            if app.stage == "trial":
-                bucket["bookings"] += 1
-                bucket["visits"] += 1
-            if app.stage == "sale":
-                bucket["sales"] += 1
+            func.count(ApplicationModel.id).filter(ApplicationModel.stage == "trial").label("trials"),
+            func.count(ApplicationModel.id).filter(ApplicationModel.stage == "sale").label("sales"),
+        ).group_by(ApplicationModel.platform)
+        result = await self.session.execute(stmt)
+
+        rows = {
+            row.platform: {
+                "leads": row.leads,
+                "bookings": row.trials,
+                "visits": row.trials,
+                "sales": row.sales,
+            }
+            for row in result
+        }
 
         rows_models = [
             MarketingConversionRow(
@@ -122,30 +160,3 @@ class MarketingRepository:
         if leads == 0:
             return 0.0
         return round(sales / leads, 4)
-
-    def _build_trend(
-        self,
-        applications: Iterable[ApplicationModel],
-        days: int = 14,
-    ) -> list[TrafficTrendPoint]:
-        cutoff = datetime.now(tz=timezone.utc) - timedelta(days=days - 1)
-        buckets: dict[datetime.date, int] = defaultdict(int)
-
-        for app in applications:
-            created_at = app.created_at
-            if created_at is None:
-                continue
-            if created_at.tzinfo is None:
-                created_at = created_at.replace(tzinfo=timezone.utc)
-            if created_at < cutoff:
-                continue
-            buckets[created_at.date()] += 1
-
-        # Ensure missing dates appear with zero
-        trend: list[TrafficTrendPoint] = []
-        for i in range(days):
-            day = (cutoff + timedelta(days=i)).date()
-            trend.append(TrafficTrendPoint(date=day, leads=buckets.get(day, 0)))
-        return trend
-
-
@@ -5,7 +5,12 @@ from uuid import uuid4
 from sqlalchemy import Select, select, delete, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import CacheTag, get_analytics_cache
+from app.db.pagination import Page, deferred_columns, paginate
 from app.models.payment import Payment as PaymentModel
+from app.models.payment_service import PaymentService as PaymentServiceModel
+from app.repositories.categories import CategoryRepository
+from app.repositories.rollups import RollupRepository
 from app.schemas.payment import (
     Payment as PaymentSchema,
     PaymentCreate,
@@ -14,8 +19,12 @@ from app.schemas.payment import (
 
 
 class PaymentRepository:
+    # Поля схемы -> тяжёлые колонки, которые не читаются, если поле не запрошено в fields=
+    HEAVY_FIELDS = {"comment": PaymentModel.comment}
+
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.rollups = RollupRepository(session)
 
     def _base_query(self) -> Select[tuple[PaymentModel]]:
         return select(PaymentModel).order_by(desc(PaymentModel.created_at))
@@ -29,7 +38,13 @@ class PaymentRepository:
         limit: int = 100,
         service_name: str | None = None,
         client_id: str | None = None,
-    ) -> list[PaymentSchema]:
+        cursor: str | None = None,
+        fields: set[str] | None = None,
+    ) -> Page[PaymentSchema]:
+        """Платежи от новых к старым, keyset по (created_at, id).
+
+        `skip` (OFFSET) оставлен для старых клиентов API и игнорируется при `cursor`.
+        """
         stmt = self._base_query()
         
         if service_name:
@@ -37,10 +52,18 @@ class PaymentRepository:
         if client_id:
             stmt = stmt.where(PaymentModel.client_id == client_id)
         
-        stmt = stmt.offset(skip).limit(limit)
-        result = await self.session.scalars(stmt)
-        rows = result.all()
-        return [self._to_schema(obj) for obj in rows]
+        if skip and not cursor:
+            stmt = stmt.offset(skip)
+        page = await paginate(
+            self.session,
+            stmt,
+            [PaymentModel.created_at, PaymentModel.id],
+            limit=limit,
+            cursor=cursor,
+            descending=True,
+            deferred=deferred_columns(self.HEAVY_FIELDS, fields),
+        )
+        return Page(items=[self._to_schema(obj) for obj in page.items], next_cursor=page.next_cursor)
 
     async def get_by_public_id(self, public_id: str) -> PaymentSchema | None:
         stmt = select(PaymentModel).where(PaymentModel.public_id == public_id)
@@ -49,6 +72,26 @@ class PaymentRepository:
             return self._to_schema(model)
         return None
 
+    async def _resolve_kind(self, data: PaymentCreate) -> str:
+        """Вид продажи: явно указанный, иначе по услуге из прайса, иначе по количеству и названию."""
+        if data.kind:
+            return data.kind
+        if data.service_id:
+            service_kind = await self.session.scalar(
+                select(PaymentServiceModel.kind).where(PaymentServiceModel.public_id == data.service_id)
+            )
+            if service_kind == "subscription":
+                return service_kind
+        if data.quantity > 1 or "абонемент" in data.service_name.casefold():
+            return "subscription"
+        return "single"
+
+    @staticmethod
+    def _category_name(service_category: str | None, service_name: str | None) -> str | None:
+        """Категория платежа; без неё направление определяется по названию услуги
+        (та же логика, что в бэкфилле миграции 202512160009)."""
+        return (service_category or "").strip() or service_name
+
     async def create_payment(self, data: PaymentCreate) -> PaymentSchema:
         model = PaymentModel(
             public_id=str(uuid4()),
@@ -58,6 +101,10 @@ class PaymentRepository:
             service_id=data.service_id,
             service_name=data.service_name,
             service_category=data.service_category,
+            category_id=await CategoryRepository(self.session).resolve_id(
+                self._category_name(data.service_category, data.service_name)
+            ),
+            kind=await self._resolve_kind(data),
             total_amount=data.total_amount,
             cash_amount=data.cash_amount,
             transfer_amount=data.transfer_amount,
@@ -67,7 +114,10 @@ class PaymentRepository:
             status=data.status,
         )
         self.session.add(model)
+        await self.session.flush()
+        await self.rollups.apply_payments(PaymentModel.id == model.id)
         await self.session.commit()
+        await get_analytics_cache().invalidate(CacheTag.PAYMENTS)
         await self.session.refresh(model)
         return self._to_schema(model)
 
@@ -77,15 +127,28 @@ class PaymentRepository:
         stmt = select(PaymentModel).where(PaymentModel.public_id == public_id)
         model = await self.session.scalar(stmt)
         if model:
+            # Вычитаем старый вклад платежа из дневных агрегатов до изменения полей
+            await self.rollups.apply_payments(PaymentModel.id == model.id, sign=-1)
             for field, value in data.model_dump(exclude_unset=True).items():
+                if field == "kind" and value is None:
+                    continue
                 setattr(model, field, value)
+            if data.model_fields_set & {"service_category", "service_name"}:
+                model.category_id = await CategoryRepository(self.session).resolve_id(
+                    self._category_name(model.service_category, model.service_name)
+                )
+            await self.session.flush()
+            await self.rollups.apply_payments(PaymentModel.id == model.id)
             await self.session.commit()
+            await get_analytics_cache().invalidate(CacheTag.PAYMENTS)
             await self.session.refresh(model)
             return self._to_schema(model)
         return None
 
     async def delete_payment(self, public_id: str) -> None:
+        await self.rollups.apply_payments(PaymentModel.public_id == public_id, sign=-1)
         stmt = delete(PaymentModel).where(PaymentModel.public_id == public_id)
         await self.session.execute(stmt)
         await self.session.commit()
+        await get_analytics_cache().invalidate(CacheTag.PAYMENTS)
 
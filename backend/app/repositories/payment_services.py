@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import re
 from uuid import uuid4
 
 from sqlalchemy import Select, select
@@ -16,6 +17,20 @@ from app.schemas.payment_service import (
 )
 
 
+def classify_service_kind(name: str, duration: str | None) -> str:
+    """Вид услуги по названию и длительности (те же правила, что в миграции 202512160009).
+
+    Абонемент — если так названа услуга или в длительности больше одного занятия/визита
+    ("12 занятий", "8 визитов").
+    """
+    if "абонемент" in name.casefold():
+        return "subscription"
+    visits = re.search(r"\d+", duration or "")
+    if visits and int(visits.group()) > 1:
+        return "subscription"
+    return "single"
+
+
 class PaymentServiceCategoryRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -128,6 +143,7 @@ class PaymentServiceRepository:
             description=data.description,
             duration=data.duration,
             trainer=data.trainer,
+            kind=data.kind or classify_service_kind(data.name, data.duration),
         )
         self.session.add(model)
         await self.session.commit()
@@ -158,6 +174,8 @@ class PaymentServiceRepository:
             model.duration = data.duration
         if data.trainer is not None:
             model.trainer = data.trainer
+        if data.kind is not None:
+            model.kind = data.kind
 
         await self.session.commit()
         await self.session.refresh(model)
@@ -186,5 +204,6 @@ class PaymentServiceRepository:
             description=model.description,
             duration=model.duration,
             trainer=model.trainer,
+            kind=model.kind,
         )
 
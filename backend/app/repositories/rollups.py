@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import ColumnElement, Date, Select, String, and_, case, cast, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.client import Client as ClientModel
+from app.models.payment import Payment as PaymentModel
+from app.models.rollup import BookingDailyRollup, ClientDailyRollup, PaymentDailyRollup
+from app.models.schedule_booking import ScheduleBooking as ScheduleBookingModel
+
+
+class RollupRepository:
+    """Поддержка дневных агрегатов (rollup-таблиц).
+
+    Методы `apply_*` прибавляют (sign=1) или вычитают (sign=-1) вклад строк,
+    подходящих под условие, в дневные агрегаты. Вызываются из репозиториев
+    в той же транзакции, что и сама запись, до `commit`.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def apply_payments(self, criterion: ColumnElement[bool], sign: int = 1) -> None:
+        day = cast(PaymentModel.created_at, Date)
+        category = func.coalesce(PaymentModel.service_category, "")
+        stmt = (
+            select(
+                day,
+                category,
+                PaymentModel.status,
+                func.count(PaymentModel.id) * sign,
+                func.coalesce(func.sum(PaymentModel.total_amount), 0) * sign,
+            )
+            .where(criterion)
+            .group_by(day, category, PaymentModel.status)
+        )
+        await self._upsert(
+            PaymentDailyRollup,
+            ["day", "service_category", "status"],
+            ["payments_count", "revenue"],
+            stmt,
+        )
+
+    async def apply_clients(self, criterion: ColumnElement[bool], sign: int = 1) -> None:
+        day = cast(ClientModel.created_at, Date)
+        direction = cast(ClientModel.direction, String)
+        stmt = (
+            select(day, direction, func.count(ClientModel.id) * sign)
+            .where(criterion)
+            .group_by(day, direction)
+        )
+        await self._upsert(ClientDailyRollup, ["day", "direction"], ["new_clients"], stmt)
+
+    async def apply_bookings(self, criterion: ColumnElement[bool], sign: int = 1) -> None:
+        trainer = func.coalesce(ScheduleBookingModel.trainer_name, "")
+        capsule_id = func.coalesce(ScheduleBookingModel.capsule_id, "")
+        capsule_name = func.coalesce(ScheduleBookingModel.capsule_name, "")
+        stmt = (
+            select(
+                ScheduleBookingModel.booking_date,
+                ScheduleBookingModel.category,
+                trainer,
+                capsule_id,
+                capsule_name,
+                func.max(ScheduleBookingModel.category_id),
+                func.count(ScheduleBookingModel.id) * sign,
+                func.count(ScheduleBookingModel.id).filter(
+                    ScheduleBookingModel.status.in_(["Бронь", "Оплачено"])
+                ) * sign,
+                func.coalesce(func.sum(ScheduleBookingModel.max_capacity), 0) * sign,
+                func.coalesce(func.sum(ScheduleBookingModel.current_count), 0) * sign,
+                func.coalesce(
+                    func.sum(
+                        case(
+                            (
+                                ScheduleBookingModel.status == "Свободно",
+                                ScheduleBookingModel.max_capacity - ScheduleBookingModel.current_count,
+                            ),
+                            else_=literal(0),
+                        )
+                    ),
+                    0,
+                ) * sign,
+            )
+            .where(criterion)
+            .group_by(
+                ScheduleBookingModel.booking_date,
+                ScheduleBookingModel.category,
+                trainer,
+                capsule_id,
+                capsule_name,
+            )
+        )
+        await self._upsert(
+            BookingDailyRollup,
+            ["day", "category", "trainer_name", "capsule_id", "capsule_name"],
+            ["slots", "booked_slots", "capacity", "booked_count", "free_seats"],
+            stmt,
+            attribute_columns=["category_id"],
+        )
+
+    async def rebuild(self, start_date: date | None = None, end_date: date | None = None) -> None:
+        """Пересчитать агрегаты с нуля за период (включительно) или целиком.
+
+        Не коммитит — это делает вызывающий код.
+        """
+        payment_filter = self._timestamp_range(PaymentModel.created_at, start_date, end_date)
+        client_filter = self._timestamp_range(ClientModel.created_at, start_date, end_date)
+        booking_filter = and_(
+            ScheduleBookingModel.booking_date >= start_date if start_date else True,
+            ScheduleBookingModel.booking_date <= end_date if end_date else True,
+        )
+
+        for rollup in (PaymentDailyRollup, ClientDailyRollup, BookingDailyRollup):
+            stmt = delete(rollup)
+            if start_date:
+                stmt = stmt.where(rollup.day >= start_date)
+            if end_date:
+                stmt = stmt.where(rollup.day <= end_date)
+            await self.session.execute(stmt)
+
+        await self.apply_payments(payment_filter)
+        await self.apply_clients(client_filter)
+        await self.apply_bookings(booking_filter)
+
+    @staticmethod
+    def _timestamp_range(
+        column: ColumnElement, start_date: date | None, end_date: date | None
+    ) -> ColumnElement[bool]:
+        return and_(
+            column >= datetime.combine(start_date, time.min) if start_date else True,
+            column < datetime.combine(end_date + timedelta(days=1), time.min) if end_date else True,
+        )
+
+    async def _upsert(
+        self,
+        rollup: type,
+        key_columns: list[str],
+        value_columns: list[str],
+        source: Select,
+        attribute_columns: Sequence[str] = (),
+    ) -> None:
+        """Прибавить `value_columns` к строкам агрегата по ключу `key_columns`.
+
+        `source` выбирает колонки в порядке key, attribute, value. Атрибуты не
+        суммируются, а перезаписываются последним значением, если оно не NULL.
+        """
+        stmt = insert(rollup).from_select([*key_columns, *attribute_columns, *value_columns], source)
+        set_ = {
+            name: func.coalesce(getattr(stmt.excluded, name), getattr(rollup, name))
+            for name in attribute_columns
+        }
+        set_.update(
+            {
+                name: getattr(rollup, name) + getattr(stmt.excluded, name)
+                for name in value_columns
+            }
+        )
+        stmt = stmt.on_conflict_do_update(index_elements=key_columns, set_=set_)
+        await self.session.execute(stmt)
@@ -3,11 +3,18 @@ from __future__ import annotations
 from datetime import date, time
 from typing import Literal
 
-from sqlalchemy import Select, and_, select
+from fastapi import HTTPException
+from sqlalchemy import Select, and_, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import uuid4
 
-from app.models.schedule_booking import ScheduleBooking as ScheduleBookingModel
+from app.core.cache import CacheTag, get_analytics_cache
+from app.db.pagination import Page, deferred_columns, paginate
+from app.models.schedule_booking import ScheduleBooking as ScheduleBookingModel, ScheduleBookingClient
+from app.repositories.categories import CategoryRepository
+from app.repositories.rollups import RollupRepository
 from app.schemas.schedule_booking import (
     ScheduleBooking as ScheduleBookingSchema,
     ScheduleBookingCreate,
@@ -16,9 +23,39 @@ from app.schemas.schedule_booking import (
 )
 
 
+CAPACITY_CONSTRAINT = "ck_schedule_bookings_capacity"
+
+
+def capacity_conflict(
+    message: str,
+    *,
+    booking_id: str | None,
+    max_capacity: int | None,
+    current_count: int | None,
+    requested: int | None,
+) -> HTTPException:
+    """409 с машиночитаемым описанием конфликта вместимости."""
+    return HTTPException(
+        status_code=409,
+        detail={
+            "code": "capacity_exceeded",
+            "message": message,
+            "booking_id": booking_id,
+            "max_capacity": max_capacity,
+            "current_count": current_count,
+            "requested": requested,
+        },
+    )
+
+
 class ScheduleBookingRepository:
+    # Поля схемы -> тяжёлые колонки, которые не читаются, если поле не запрошено в fields=
+    # (клиенты записи грузятся отдельным запросом и пропускаются, если "clients" не запрошено)
+    HEAVY_FIELDS = {"notes": ScheduleBookingModel.notes}
+
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.rollups = RollupRepository(session)
 
     def _base_query(self) -> Select[tuple[ScheduleBookingModel]]:
         return select(ScheduleBookingModel)
@@ -30,8 +67,15 @@ class ScheduleBookingRepository:
         category: str | None = None,
         trainer_id: str | None = None,
         status: Literal["Бронь", "Оплачено", "Свободно"] | None = None,
-    ) -> list[ScheduleBookingSchema]:
-        """Получить список записей с фильтрацией."""
+        limit: int | None = None,
+        cursor: str | None = None,
+        fields: set[str] | None = None,
+        client_id: str | None = None,
+    ) -> Page[ScheduleBookingSchema]:
+        """Получить список записей с фильтрацией (keyset по (дата, время, id)).
+
+        `client_id` оставляет только записи, на которые записан этот клиент.
+        """
         stmt = self._base_query()
         
         if start_date:
@@ -44,15 +88,27 @@ class ScheduleBookingRepository:
             stmt = stmt.where(ScheduleBookingModel.trainer_id == trainer_id)
         if status:
             stmt = stmt.where(ScheduleBookingModel.status == status)
+        if client_id:
+            stmt = stmt.where(
+                select(ScheduleBookingClient.id)
+                .where(
+                    ScheduleBookingClient.booking_id == ScheduleBookingModel.id,
+                    ScheduleBookingClient.client_id == client_id,
+                )
+                .exists()
+            )
         
-        stmt = stmt.order_by(
-            ScheduleBookingModel.booking_date,
-            ScheduleBookingModel.booking_time
+        page = await paginate(
+            self.session,
+            stmt,
+            [ScheduleBookingModel.booking_date, ScheduleBookingModel.booking_time, ScheduleBookingModel.id],
+            limit=limit,
+            cursor=cursor,
+            deferred=deferred_columns(self.HEAVY_FIELDS, fields),
         )
-        
-        result = await self.session.scalars(stmt)
-        rows = result.all()
-        return [self._to_schema(obj) for obj in rows]
+        if fields is not None and "clients" not in fields:
+            return Page(items=[self._to_schema(obj) for obj in page.items], next_cursor=page.next_cursor)
+        return Page(items=await self._to_schemas(page.items), next_cursor=page.next_cursor)
 
     async def get_by_public_id(self, public_id: str) -> ScheduleBookingSchema | None:
         """Получить запись по public_id."""
@@ -61,7 +117,7 @@ class ScheduleBookingRepository:
         )
         result = await self.session.scalar(stmt)
         if result:
-            return self._to_schema(result)
+            return (await self._to_schemas([result]))[0]
         return None
 
     async def get_by_date_and_time(
@@ -82,7 +138,7 @@ class ScheduleBookingRepository:
         
         result = await self.session.scalars(stmt)
         rows = result.all()
-        return [self._to_schema(obj) for obj in rows]
+        return await self._to_schemas(rows)
 
     async def create_booking(self, data: ScheduleBookingCreate) -> ScheduleBookingSchema:
         """Создать новую запись."""
@@ -92,22 +148,16 @@ class ScheduleBookingRepository:
             time_parts = data.booking_time.split(":")
             booking_time_obj = time(int(time_parts[0]), int(time_parts[1]))
             
-            # Преобразуем клиентов в формат для БД
-            clients_data = [
-                {
-                    "client_id": client.client_id,
-                    "client_name": client.client_name,
-                    "client_phone": client.client_phone,
-                }
-                for client in data.clients
-            ]
+            clients_data = self._unique_clients(data.clients)
             
             # Проверка вместимости: нельзя добавить больше клиентов, чем max_capacity
             if len(clients_data) > data.max_capacity:
-                from fastapi import HTTPException
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Превышена вместимость: добавлено {len(clients_data)} клиентов, максимум {data.max_capacity}"
+                raise capacity_conflict(
+                    f"Превышена вместимость: добавлено {len(clients_data)} клиентов, максимум {data.max_capacity}",
+                    booking_id=None,
+                    max_capacity=data.max_capacity,
+                    current_count=0,
+                    requested=len(clients_data),
                 )
             
             model = ScheduleBookingModel(
@@ -115,10 +165,10 @@ class ScheduleBookingRepository:
                 booking_date=booking_date_obj,
                 booking_time=booking_time_obj,
                 category=data.category,
+                category_id=await CategoryRepository(self.session).resolve_id(data.category),
                 service_name=data.service_name,
                 trainer_id=data.trainer_id,
                 trainer_name=data.trainer_name,
-                clients=clients_data,
                 max_capacity=data.max_capacity,
                 current_count=len(clients_data),
                 status=data.status.value,
@@ -127,9 +177,16 @@ class ScheduleBookingRepository:
                 capsule_name=data.capsule_name,
             )
             self.session.add(model)
+            await self.session.flush()
+            await self._insert_clients(model.id, clients_data)
+            await self.rollups.apply_bookings(ScheduleBookingModel.id == model.id)
             await self.session.commit()
+            await get_analytics_cache().invalidate(CacheTag.SCHEDULE_BOOKINGS)
             await self.session.refresh(model)
-            return self._to_schema(model)
+            return self._to_schema(model, clients_data)
+        except IntegrityError as e:
+            await self.session.rollback()
+            raise self._integrity_conflict(e, None) from e
         except Exception:
             await self.session.rollback()
             raise
@@ -137,15 +194,24 @@ class ScheduleBookingRepository:
     async def update_booking(
         self, public_id: str, data: ScheduleBookingUpdate
     ) -> ScheduleBookingSchema | None:
-        """Обновить запись."""
+        """Обновить запись.
+
+        Строка записи блокируется (SELECT ... FOR UPDATE) до commit, поэтому
+        проверки вместимости не гонятся с параллельными add_client/remove_client.
+        """
         try:
-            stmt = select(ScheduleBookingModel).where(
-                ScheduleBookingModel.public_id == public_id
+            stmt = (
+                select(ScheduleBookingModel)
+                .where(ScheduleBookingModel.public_id == public_id)
+                .with_for_update()
             )
             model = await self.session.scalar(stmt)
             if not model:
                 return None
 
+            # Вычитаем старый вклад записи из дневных агрегатов до изменения полей
+            await self.rollups.apply_bookings(ScheduleBookingModel.id == model.id, sign=-1)
+
             if data.booking_date is not None:
                 model.booking_date = date.fromisoformat(data.booking_date)
             if data.booking_time is not None:
@@ -153,6 +219,7 @@ class ScheduleBookingRepository:
                 model.booking_time = time(int(time_parts[0]), int(time_parts[1]))
             if data.category is not None:
                 model.category = data.category
+                model.category_id = await CategoryRepository(self.session).resolve_id(data.category)
             if data.service_name is not None:
                 model.service_name = data.service_name
             if data.trainer_id is not None:
@@ -160,33 +227,30 @@ class ScheduleBookingRepository:
             if data.trainer_name is not None:
                 model.trainer_name = data.trainer_name
             if data.clients is not None:
-                clients_data = [
-                    {
-                        "client_id": client.client_id,
-                        "client_name": client.client_name,
-                        "client_phone": client.client_phone,
-                    }
-                    for client in data.clients
-                ]
+                clients_data = self._unique_clients(data.clients)
                 
                 # Проверка вместимости: нельзя добавить больше клиентов, чем max_capacity
                 max_cap = data.max_capacity if data.max_capacity is not None else model.max_capacity
                 if len(clients_data) > max_cap:
-                    from fastapi import HTTPException
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Превышена вместимость: добавлено {len(clients_data)} клиентов, максимум {max_cap}"
+                    raise capacity_conflict(
+                        f"Превышена вместимость: добавлено {len(clients_data)} клиентов, максимум {max_cap}",
+                        booking_id=public_id,
+                        max_capacity=max_cap,
+                        current_count=model.current_count,
+                        requested=len(clients_data),
                     )
                 
-                model.clients = clients_data
+                await self._replace_clients(model.id, clients_data)
                 model.current_count = len(clients_data)
             if data.max_capacity is not None:
                 # Если уменьшается вместимость, проверяем что текущее количество клиентов не превышает новую вместимость
                 if model.current_count > data.max_capacity:
-                    from fastapi import HTTPException
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Нельзя уменьшить вместимость до {data.max_capacity}: уже записано {model.current_count} клиентов"
+                    raise capacity_conflict(
+                        f"Нельзя уменьшить вместимость до {data.max_capacity}: уже записано {model.current_count} клиентов",
+                        booking_id=public_id,
+                        max_capacity=data.max_capacity,
+                        current_count=model.current_count,
+                        requested=model.current_count,
                     )
                 model.max_capacity = data.max_capacity
             if data.status is not None:
@@ -198,9 +262,106 @@ class ScheduleBookingRepository:
             if data.capsule_name is not None:
                 model.capsule_name = data.capsule_name
 
+            await self.session.flush()
+            await self.rollups.apply_bookings(ScheduleBookingModel.id == model.id)
             await self.session.commit()
+            await get_analytics_cache().invalidate(CacheTag.SCHEDULE_BOOKINGS)
             await self.session.refresh(model)
-            return self._to_schema(model)
+            return (await self._to_schemas([model]))[0]
+        except IntegrityError as e:
+            await self.session.rollback()
+            raise self._integrity_conflict(e, public_id) from e
+        except Exception:
+            await self.session.rollback()
+            raise
+
+    async def add_client(self, public_id: str, client: ClientInfo) -> ScheduleBookingSchema | None:
+        """Записать клиента на слот.
+
+        Место резервируется условным `UPDATE ... SET current_count = current_count + 1
+        WHERE current_count < max_capacity RETURNING`: если мест нет, строка не
+        обновляется и возвращается 409. Строка записи блокируется до commit, так что
+        параллельные записи на один слот выполняются по очереди и дневные агрегаты
+        не расходятся. Повторная запись того же клиента ничего не меняет.
+
+        Raises:
+            HTTPException(409): мест нет (detail.code == "capacity_exceeded")
+        """
+        try:
+            booking_id = await self.session.scalar(
+                select(ScheduleBookingModel.id)
+                .where(ScheduleBookingModel.public_id == public_id)
+                .with_for_update()
+            )
+            if booking_id is None:
+                return None
+
+            await self.rollups.apply_bookings(ScheduleBookingModel.id == booking_id, sign=-1)
+            if await self._insert_clients(booking_id, [client]):
+                reserved = await self.session.scalar(
+                    update(ScheduleBookingModel)
+                    .where(
+                        ScheduleBookingModel.id == booking_id,
+                        ScheduleBookingModel.current_count < ScheduleBookingModel.max_capacity,
+                    )
+                    .values(current_count=ScheduleBookingModel.current_count + 1)
+                    .returning(ScheduleBookingModel.current_count)
+                )
+                if reserved is None:
+                    max_capacity, current_count = (
+                        await self.session.execute(
+                            select(ScheduleBookingModel.max_capacity, ScheduleBookingModel.current_count)
+                            .where(ScheduleBookingModel.id == booking_id)
+                        )
+                    ).one()
+                    raise capacity_conflict(
+                        f"Нет свободных мест: записано {current_count} из {max_capacity}",
+                        booking_id=public_id,
+                        max_capacity=max_capacity,
+                        current_count=current_count,
+                        requested=current_count + 1,
+                    )
+            await self.rollups.apply_bookings(ScheduleBookingModel.id == booking_id)
+            await self.session.commit()
+            await get_analytics_cache().invalidate(CacheTag.SCHEDULE_BOOKINGS)
+            return await self.get_by_public_id(public_id)
+        except IntegrityError as e:
+            await self.session.rollback()
+            raise self._integrity_conflict(e, public_id) from e
+        except Exception:
+            await self.session.rollback()
+            raise
+
+    async def remove_client(self, public_id: str, client_id: str) -> ScheduleBookingSchema | None:
+        """Отписать клиента от слота (`current_count - 1` в SQL)."""
+        try:
+            booking_id = await self.session.scalar(
+                select(ScheduleBookingModel.id)
+                .where(ScheduleBookingModel.public_id == public_id)
+                .with_for_update()
+            )
+            if booking_id is None:
+                return None
+
+            await self.rollups.apply_bookings(ScheduleBookingModel.id == booking_id, sign=-1)
+            removed = await self.session.scalar(
+                delete(ScheduleBookingClient)
+                .where(
+                    ScheduleBookingClient.booking_id == booking_id,
+                    ScheduleBookingClient.client_id == client_id,
+                )
+                .returning(ScheduleBookingClient.id)
+            )
+            if removed is not None:
+                await self.session.execute(
+                    update(ScheduleBookingModel)
+                    .where(ScheduleBookingModel.id == booking_id)
+                    .values(current_count=func.greatest(ScheduleBookingModel.current_count - 1, 0))
+                )
+            await self.rollups.apply_bookings(ScheduleBookingModel.id == booking_id)
+            await self.session.commit()
+            await get_analytics_cache().invalidate(CacheTag.SCHEDULE_BOOKINGS)
+            return await self.get_by_public_id(public_id)
         except Exception:
             await self.session.rollback()
             raise
@@ -215,26 +376,116 @@ class ScheduleBookingRepository:
             if not model:
                 return False
             
+            await self.rollups.apply_bookings(ScheduleBookingModel.id == model.id, sign=-1)
             await self.session.delete(model)
             await self.session.commit()
+            await get_analytics_cache().invalidate(CacheTag.SCHEDULE_BOOKINGS)
             return True
         except Exception:
             await self.session.rollback()
             raise
 
     @staticmethod
-    def _to_schema(model: ScheduleBookingModel) -> ScheduleBookingSchema:
-        """Преобразовать модель в схему."""
-        # Преобразуем клиентов из JSONB
-        clients_list = [
-            ClientInfo(
-                client_id=client.get("client_id", ""),
-                client_name=client.get("client_name", ""),
-                client_phone=client.get("client_phone"),
+    def _integrity_conflict(error: IntegrityError, public_id: str | None) -> Exception:
+        """409 для нарушения ck_schedule_bookings_capacity, остальные ошибки — как есть."""
+        diag = getattr(error.orig, "diag", None)
+        if getattr(diag, "constraint_name", None) != CAPACITY_CONSTRAINT:
+            return error
+        return capacity_conflict(
+            "Превышена вместимость",
+            booking_id=public_id,
+            max_capacity=None,
+            current_count=None,
+            requested=None,
+        )
+
+    @staticmethod
+    def _unique_clients(clients: list[ClientInfo]) -> list[ClientInfo]:
+        """Клиенты без повторов по client_id (клиент записывается на слот один раз)."""
+        return list({client.client_id: client for client in clients}.values())
+
+    async def _insert_clients(self, booking_id: int, clients: list[ClientInfo]) -> int:
+        """Вставить клиентов записи одним INSERT, пропуская уже записанных. Не коммитит."""
+        if not clients:
+            return 0
+        stmt = (
+            insert(ScheduleBookingClient)
+            .values(
+                [
+                    {
+                        "booking_id": booking_id,
+                        "client_id": client.client_id,
+                        "client_name": client.client_name,
+                        "client_phone": client.client_phone,
+                    }
+                    for client in clients
+                ]
             )
-            for client in (model.clients or [])
-        ]
-        
+            .on_conflict_do_nothing(constraint="uq_schedule_booking_clients_client")
+            .returning(ScheduleBookingClient.id)
+        )
+        result = await self.session.scalars(stmt)
+        return len(result.all())
+
+    async def _replace_clients(self, booking_id: int, clients: list[ClientInfo]) -> None:
+        """Привести список клиентов записи к `clients`, не трогая неизменившиеся строки. Не коммитит."""
+        await self.session.execute(
+            delete(ScheduleBookingClient).where(
+                ScheduleBookingClient.booking_id == booking_id,
+                ScheduleBookingClient.client_id.not_in([client.client_id for client in clients]),
+            )
+        )
+        if not clients:
+            return
+        stmt = insert(ScheduleBookingClient).values(
+            [
+                {
+                    "booking_id": booking_id,
+                    "client_id": client.client_id,
+                    "client_name": client.client_name,
+                    "client_phone": client.client_phone,
+                }
+                for client in clients
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_schedule_booking_clients_client",
+            set_={
+                "client_name": stmt.excluded.client_name,
+                "client_phone": stmt.excluded.client_phone,
+            },
+            where=(
+                ScheduleBookingClient.client_name.is_distinct_from(stmt.excluded.client_name)
+                | ScheduleBookingClient.client_phone.is_distinct_from(stmt.excluded.client_phone)
+            ),
+        )
+        await self.session.execute(stmt)
+
+    async def _load_clients(self, booking_ids: list[int]) -> dict[int, list[ClientInfo]]:
+        """Клиенты нескольких записей одним запросом, в порядке записи."""
+        if not booking_ids:
+            return {}
+        rows = await self.session.scalars(
+            select(ScheduleBookingClient)
+            .where(ScheduleBookingClient.booking_id.in_(booking_ids))
+            .order_by(ScheduleBookingClient.booking_id, ScheduleBookingClient.id)
+        )
+        clients: dict[int, list[ClientInfo]] = {}
+        for row in rows:
+            clients.setdefault(row.booking_id, []).append(
+                ClientInfo(client_id=row.client_id, client_name=row.client_name, client_phone=row.client_phone)
+            )
+        return clients
+
+    async def _to_schemas(self, models: list[ScheduleBookingModel]) -> list[ScheduleBookingSchema]:
+        clients = await self._load_clients([model.id for model in models])
+        return [self._to_schema(model, clients.get(model.id, [])) for model in models]
+
+    @staticmethod
+    def _to_schema(
+        model: ScheduleBookingModel, clients: list[ClientInfo] | None = None
+    ) -> ScheduleBookingSchema:
+        """Преобразовать модель в схему (клиенты передаются отдельно, см. `_load_clients`)."""
         return ScheduleBookingSchema(
             id=model.public_id,
             booking_date=model.booking_date.isoformat(),
@@ -243,7 +494,7 @@ class ScheduleBookingRepository:
             service_name=model.service_name,
             trainer_id=model.trainer_id,
             trainer_name=model.trainer_name,
-            clients=clients_list,
+            clients=clients or [],
             max_capacity=model.max_capacity,
             current_count=model.current_count,
             status=model.status,  # type: ignore[arg-type]
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import date, time, timedelta
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import Select, or_, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import CacheTag, get_analytics_cache
+from app.models.schedule_booking import ScheduleBooking as ScheduleBookingModel
+from app.models.schedule_template import ScheduleTemplate as ScheduleTemplateModel
+from app.repositories.categories import CategoryRepository
+from app.repositories.rollups import RollupRepository
+from app.repositories.schedule_booking import ScheduleBookingRepository
+from app.schemas.schedule_template import (
+    ScheduleMaterializeConflict,
+    ScheduleMaterializeRequest,
+    ScheduleMaterializeResult,
+    ScheduleTemplate as ScheduleTemplateSchema,
+    ScheduleTemplateCreate,
+    ScheduleTemplateUpdate,
+)
+
+# Больше чем на квартал вперёд расписание за раз не генерируем
+MAX_MATERIALIZE_DAYS = 93
+# Строк в одном INSERT ... VALUES: ~15 параметров на строку, лимит протокола — 65535
+INSERT_BATCH_SIZE = 1000
+
+
+def _parse_time(value: str) -> time:
+    hours, minutes = value.split(":")
+    return time(int(hours), int(minutes))
+
+
+def _occurrences(template: ScheduleTemplateModel, start_date: date, end_date: date) -> Iterator[date]:
+    """Даты занятий шаблона в периоде (включительно) с учётом срока действия шаблона."""
+    first = max(start_date, template.valid_from)
+    last = min(end_date, template.valid_until) if template.valid_until else end_date
+    weekdays = set(template.weekdays)
+    day = first
+    while day <= last:
+        if day.weekday() in weekdays:
+            yield day
+        day += timedelta(days=1)
+
+
+class ScheduleTemplateRepository:
+    """Шаблоны повторяющихся занятий и пакетная генерация слотов по ним."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.rollups = RollupRepository(session)
+
+    def _base_query(self) -> Select[tuple[ScheduleTemplateModel]]:
+        return select(ScheduleTemplateModel).order_by(
+            ScheduleTemplateModel.start_time, ScheduleTemplateModel.category, ScheduleTemplateModel.id
+        )
+
+    async def list_templates(self, active_only: bool = False) -> list[ScheduleTemplateSchema]:
+        stmt = self._base_query()
+        if active_only:
+            stmt = stmt.where(ScheduleTemplateModel.is_active.is_(True))
+        result = await self.session.scalars(stmt)
+        return [self._to_schema(obj) for obj in result.all()]
+
+    async def get_by_public_id(self, public_id: str) -> ScheduleTemplateSchema | None:
+        model = await self._get_model(public_id)
+        return self._to_schema(model) if model else None
+
+    async def create_template(self, data: ScheduleTemplateCreate) -> ScheduleTemplateSchema:
+        self._check_period(data.valid_from, data.valid_until)
+        model = ScheduleTemplateModel(
+            public_id=str(uuid4()),
+            category=data.category,
+            category_id=await CategoryRepository(self.session).resolve_id(data.category),
+            service_name=data.service_name,
+            weekdays=data.weekdays,
+            start_time=_parse_time(data.start_time),
+            trainer_id=data.trainer_id,
+            trainer_name=data.trainer_name,
+            max_capacity=data.max_capacity,
+            notes=data.notes,
+            capsule_id=data.capsule_id,
+            capsule_name=data.capsule_name,
+            valid_from=data.valid_from,
+            valid_until=data.valid_until,
+            is_active=data.is_active,
+        )
+        self.session.add(model)
+        await self.session.commit()
+        await self.session.refresh(model)
+        return self._to_schema(model)
+
+    async def update_template(
+        self, public_id: str, data: ScheduleTemplateUpdate
+    ) -> ScheduleTemplateSchema | None:
+        """Обновить шаблон. Уже созданные по нему слоты не меняются."""
+        model = await self._get_model(public_id)
+        if not model:
+            return None
+
+        for field, value in data.model_dump(exclude_unset=True).items():
+            if field == "start_time":
+                value = _parse_time(value) if value is not None else model.start_time
+            elif field != "valid_until" and value is None:
+                # null сбрасывает только valid_until (шаблон становится бессрочным)
+                continue
+            setattr(model, field, value)
+        if data.category is not None:
+            model.category_id = await CategoryRepository(self.session).resolve_id(data.category)
+        self._check_period(model.valid_from, model.valid_until)
+
+        await self.session.commit()
+        await self.session.refresh(model)
+        return self._to_schema(model)
+
+    async def delete_template(self, public_id: str) -> bool:
+        """Удалить шаблон. Созданные по нему слоты остаются (template_id становится NULL)."""
+        model = await self._get_model(public_id)
+        if not model:
+            return False
+        await self.session.delete(model)
+        await self.session.commit()
+        return True
+
+    async def materialize(self, request: ScheduleMaterializeRequest) -> ScheduleMaterializeResult:
+        """Создать слоты по шаблонам за период одним пакетом.
+
+        Слоты вставляются через `INSERT ... VALUES (...), (...) ON CONFLICT DO NOTHING`
+        пачками по INSERT_BATCH_SIZE в одной транзакции, дневные агрегаты обновляются
+        одним запросом. Слот пропускается и попадает в `conflicts`, если:
+        - слот этого шаблона на эту дату уже есть (повторная генерация безопасна);
+        - тренер или капсула уже заняты в это время другим слотом, в том числе
+          созданным в этом же пакете по другому шаблону.
+
+        Raises:
+            HTTPException(400): неверный период
+            HTTPException(404): шаблон из `template_ids` не найден
+        """
+        start_date, end_date = request.start_date, request.end_date
+        if end_date < start_date:
+            raise HTTPException(status_code=400, detail="end_date must not be earlier than start_date")
+        if (end_date - start_date).days + 1 > MAX_MATERIALIZE_DAYS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Period is too long: at most {MAX_MATERIALIZE_DAYS} days per request",
+            )
+
+        templates = await self._templates_for(request.template_ids)
+        candidates = [
+            (template, day) for template in templates for day in _occurrences(template, start_date, end_date)
+        ]
+        if not candidates:
+            return ScheduleMaterializeResult()
+
+        busy = await self._existing_slots(templates, start_date, end_date)
+        conflicts: list[ScheduleMaterializeConflict] = []
+        rows: list[dict] = []
+        for template, day in sorted(candidates, key=lambda item: (item[1], item[0].start_time, item[0].id)):
+            keys = [("exists", ("template", template.id, day))]
+            if template.trainer_id:
+                keys.append(("trainer_busy", ("trainer", template.trainer_id, day, template.start_time)))
+            if template.capsule_id:
+                keys.append(("capsule_busy", ("capsule", template.capsule_id, day, template.start_time)))
+            conflict = next(((reason, busy[key]) for reason, key in keys if key in busy), None)
+            if conflict:
+                reason, booking_id = conflict
+                conflicts.append(
+                    ScheduleMaterializeConflict(
+                        template_id=template.public_id,
+                        booking_date=day.isoformat(),
+                        booking_time=template.start_time.strftime("%H:%M"),
+                        reason=reason,
+                        booking_id=booking_id,
+                    )
+                )
+                continue
+            public_id = str(uuid4())
+            for _, key in keys:
+                busy[key] = public_id
+            rows.append(self._slot_row(template, day, public_id))
+
+        if request.dry_run:
+            return ScheduleMaterializeResult(created_count=len(rows), conflicts=conflicts)
+
+        created: list[ScheduleBookingModel] = []
+        try:
+            for offset in range(0, len(rows), INSERT_BATCH_SIZE):
+                stmt = (
+                    insert(ScheduleBookingModel)
+                    .values(rows[offset : offset + INSERT_BATCH_SIZE])
+                    .on_conflict_do_nothing(
+                        index_elements=["template_id", "booking_date"],
+                        index_where=text("template_id IS NOT NULL"),
+                    )
+                    .returning(ScheduleBookingModel)
+                )
+                created.extend((await self.session.scalars(stmt)).all())
+            if created:
+                await self.rollups.apply_bookings(
+                    ScheduleBookingModel.id.in_([model.id for model in created])
+                )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        if created:
+            await get_analytics_cache().invalidate(CacheTag.SCHEDULE_BOOKINGS)
+
+        # Слоты, которые параллельная генерация успела вставить раньше нас
+        created_ids = {model.public_id for model in created}
+        by_id = {template.id: template for template in templates}
+        for row in rows:
+            if row["public_id"] not in created_ids:
+                conflicts.append(
+                    ScheduleMaterializeConflict(
+                        template_id=by_id[row["template_id"]].public_id,
+                        booking_date=row["booking_date"].isoformat(),
+                        booking_time=row["booking_time"].strftime("%H:%M"),
+                        reason="exists",
+                    )
+                )
+
+        created.sort(key=lambda model: (model.booking_date, model.booking_time, model.id))
+        return ScheduleMaterializeResult(
+            created_count=len(created),
+            created=[ScheduleBookingRepository._to_schema(model) for model in created],
+            conflicts=conflicts,
+        )
+
+    async def _templates_for(self, public_ids: list[str] | None) -> list[ScheduleTemplateModel]:
+        """Шаблоны по списку public_id или все активные."""
+        stmt = select(ScheduleTemplateModel)
+        if public_ids is None:
+            stmt = stmt.where(ScheduleTemplateModel.is_active.is_(True))
+        else:
+            stmt = stmt.where(ScheduleTemplateModel.public_id.in_(public_ids))
+        templates = list((await self.session.scalars(stmt)).all())
+        if public_ids is not None:
+            missing = set(public_ids) - {template.public_id for template in templates}
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Template not found: {', '.join(sorted(missing))}")
+        return templates
+
+    async def _existing_slots(
+        self, templates: list[ScheduleTemplateModel], start_date: date, end_date: date
+    ) -> dict[tuple, str]:
+        """Уже занятые ключи за период: (шаблон, дата), (тренер, дата, время), (капсула, дата, время).
+
+        Один запрос по диапазону дат (индекс ix_schedule_bookings_date_time).
+        """
+        trainer_ids = {template.trainer_id for template in templates if template.trainer_id}
+        capsule_ids = {template.capsule_id for template in templates if template.capsule_id}
+        conditions = [ScheduleBookingModel.template_id.in_([template.id for template in templates])]
+        if trainer_ids:
+            conditions.append(ScheduleBookingModel.trainer_id.in_(trainer_ids))
+        if capsule_ids:
+            conditions.append(ScheduleBookingModel.capsule_id.in_(capsule_ids))
+        rows = await self.session.execute(
+            select(
+                ScheduleBookingModel.public_id,
+                ScheduleBookingModel.template_id,
+                ScheduleBookingModel.trainer_id,
+                ScheduleBookingModel.capsule_id,
+                ScheduleBookingModel.booking_date,
+                ScheduleBookingModel.booking_time,
+            ).where(
+                ScheduleBookingModel.booking_date >= start_date,
+                ScheduleBookingModel.booking_date <= end_date,
+                ScheduleBookingModel.booking_time.in_({template.start_time for template in templates}),
+                or_(*conditions),
+            )
+        )
+        busy: dict[tuple, str] = {}
+        for row in rows:
+            if row.template_id is not None:
+                busy[("template", row.template_id, row.booking_date)] = row.public_id
+            if row.trainer_id:
+                busy.setdefault(("trainer", row.trainer_id, row.booking_date, row.booking_time), row.public_id)
+            if row.capsule_id:
+                busy.setdefault(("capsule", row.capsule_id, row.booking_date, row.booking_time), row.public_id)
+        return busy
+
+    @staticmethod
+    def _slot_row(template: ScheduleTemplateModel, day: date, public_id: str) -> dict:
+        return {
+            "public_id": public_id,
+            "booking_date": day,
+            "booking_time": template.start_time,
+            "category": template.category,
+            "category_id": template.category_id,
+            "service_name": template.service_name,
+            "trainer_id": template.trainer_id,
+            "trainer_name": template.trainer_name,
+            "max_capacity": template.max_capacity,
+            "current_count": 0,
+            "status": "Свободно",
+            "notes": template.notes,
+            "capsule_id": template.capsule_id,
+            "capsule_name": template.capsule_name,
+            "template_id": template.id,
+        }
+
+    async def _get_model(self, public_id: str) -> ScheduleTemplateModel | None:
+        return await self.session.scalar(
+            select(ScheduleTemplateModel).where(ScheduleTemplateModel.public_id == public_id)
+        )
+
+    @staticmethod
+    def _check_period(valid_from: date, valid_until: date | None) -> None:
+        if valid_until is not None and valid_until < valid_from:
+            raise HTTPException(status_code=400, detail="valid_until must not be earlier than valid_from")
+
+    @staticmethod
+    def _to_schema(model: ScheduleTemplateModel) -> ScheduleTemplateSchema:
+        return ScheduleTemplateSchema(
+            id=model.public_id,
+            category=model.category,
+            service_name=model.service_name,
+            weekdays=list(model.weekdays),
+            start_time=model.start_time.strftime("%H:%M"),
+            trainer_id=model.trainer_id,
+            trainer_name=model.trainer_name,
+            max_capacity=model.max_capacity,
+            notes=model.notes,
+            capsule_id=model.capsule_id,
+            capsule_name=model.capsule_name,
+            valid_from=model.valid_from.isoformat(),
+            valid_until=model.valid_until.isoformat() if model.valid_until else None,
+            is_active=model.is_active,
+        )
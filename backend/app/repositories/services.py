@@ -6,6 +6,7 @@ from sqlalchemy import Select, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.service import Service as ServiceModel
+from app.repositories.categories import CategoryRepository
 from app.schemas.service import Service as ServiceSchema
 from app.schemas.service import ServiceCreate, ServiceUpdate
 
@@ -34,6 +35,7 @@ class ServiceRepository:
             public_id=str(uuid4()),
             name=data.name,
             category=data.category,
+            category_id=await CategoryRepository(self.session).resolve_id(data.category),
             direction=data.direction,
             duration_minutes=data.duration_minutes,
             price=data.price,
@@ -51,6 +53,8 @@ class ServiceRepository:
             return None
         for field, value in data.model_dump(exclude_unset=True).items():
             setattr(model, field, value)
+        if data.category is not None:
+            model.category_id = await CategoryRepository(self.session).resolve_id(data.category)
         await self.session.commit()
         await self.session.refresh(model)
         return self._to_schema(model)
@@ -19,10 +19,30 @@ class Stage(str, Enum):
 
 
 class ChatMessage(BaseModel):
-    id: str
+    # Границы совпадают с колонками application_messages (String(64) / String(32))
+    id: str = Field(..., max_length=64)
     role: Literal["user", "assistant"]
     content: str
-    timestamp: str
+    timestamp: str = Field(..., max_length=32)
+
+
+class ChatMessagesAppend(BaseModel):
+    """Новые сообщения переписки (только те, что ещё не отправлялись)"""
+    messages: list[ChatMessage] = Field(..., min_length=1)
+
+
+class ChatMessagesAppended(BaseModel):
+    """Сколько сообщений реально добавлено (повторы по id пропускаются)"""
+    appended: int
+
+
+class ChatMessagesPage(BaseModel):
+    """Страница истории переписки в хронологическом порядке"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    items: list[ChatMessage]
+    # Передать в `before`, чтобы получить более ранние сообщения; None — история закончилась
+    nextBefore: int | None = Field(None, alias="next_before")
 
 
 class ApplicationCreate(BaseModel):
@@ -39,13 +59,28 @@ class ApplicationCreate(BaseModel):
     telegram_chat_id: int | None = None
 
 
+class ApplicationTelegramUpsert(BaseModel):
+    """Схема для upsert заявки из Telegram-бота по chat_id.
+
+    При создании заполняются все поля; у существующей заявки обновляются
+    stage, message и budget (если передан), а `messages` дописываются в историю.
+    """
+    name: str
+    username: str | None = None
+    phone: str | None = None
+    stage: Stage
+    message: str
+    budget: str | None = None
+    owner: str = "CRM-бот"
+    messages: list[ChatMessage] = Field(default_factory=list)
+
+
 class ApplicationUpdate(BaseModel):
     """Схема для обновления заявки"""
     stage: Stage | None = None
     message: str | None = None
     budget: str | None = None
     owner: str | None = None
-    chat_history: list[ChatMessage] | None = None
 
 
 class Application(BaseModel):
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class BotConversationMessage(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class BotConversation(BaseModel):
+    """Контекст диалога бота.
+
+    `version` = 0 — сохранённого диалога нет (или он истёк по неактивности).
+    """
+
+    chat_id: int
+    messages: list[BotConversationMessage] = Field(default_factory=list)
+    version: int = Field(0, description="Передаётся в expected_version при следующей записи")
+
+
+class BotConversationSave(BaseModel):
+    """Новое содержимое диалога.
+
+    Запись применяется, только если сохранённая версия равна `expected_version`;
+    иначе 409 — бот перечитывает диалог и повторяет запись.
+    """
+
+    messages: list[BotConversationMessage] = Field(..., max_length=200)
+    expected_version: int = Field(..., ge=0, description="Версия из последнего чтения; 0 — диалога ещё нет")
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+CategoryDirection = Literal["Body", "Coworking", "Coffee", "Kids"]
+
 
 class Category(BaseModel):
     id: str = Field(..., description="Public identifier")
     name: str
     icon: str | None = None
     accent: str | None = None
+    direction: CategoryDirection | None = Field(None, description="Направление для аналитики")
 
     model_config = {"from_attributes": True}
 
@@ -16,10 +21,12 @@ class CategoryCreate(BaseModel):
     name: str
     icon: str | None = None
     accent: str | None = None
+    # Не указано — определяется по названию
+    direction: CategoryDirection | None = None
 
 
 class CategoryUpdate(BaseModel):
     name: str | None = None
     icon: str | None = None
     accent: str | None = None
-
+    direction: CategoryDirection | None = None
@@ -20,6 +20,8 @@ class PaymentBase(BaseModel):
     hours: int | None = Field(default=None, ge=1)
     comment: str | None = None
     status: Literal["pending", "completed", "cancelled"] = "completed"
+    # Абонемент или разовая продажа; при создании без значения определяется по услуге
+    kind: Literal["subscription", "single"] | None = None
 
 
 class PaymentCreate(PaymentBase):
@@ -40,6 +42,7 @@ class PaymentUpdate(BaseModel):
     hours: int | None = Field(None, ge=1)
     comment: str | None = None
     status: Literal["pending", "completed", "cancelled"] | None = None
+    kind: Literal["subscription", "single"] | None = None
 
 
 class Payment(PaymentBase):
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+PaymentServiceKind = Literal["subscription", "single"]
+
 
 class PaymentServiceCategoryBase(BaseModel):
     name: str
@@ -37,6 +41,7 @@ class PaymentServiceBase(BaseModel):
     description: str | None = None
     duration: str | None = Field(None, description="Длительность в виде количества занятий/визитов (например: '12 занятий', '8 визитов')")
     trainer: str | None = Field(None, description="Тренер (не используется в форме создания/редактирования)")
+    kind: PaymentServiceKind | None = Field(None, description="Абонемент или разовая услуга; не указано — определяется по названию и длительности")
 
 
 class PaymentServiceCreate(PaymentServiceBase):
@@ -58,6 +63,7 @@ class PaymentServiceUpdate(BaseModel):
     description: str | None = None
     duration: str | None = Field(None, description="Длительность в виде количества занятий/визитов (например: '12 занятий', '8 визитов')")
     trainer: str | None = Field(None, description="Тренер (не используется в форме редактирования)")
+    kind: PaymentServiceKind | None = Field(None, description="Абонемент или разовая услуга")
 
 
 class PaymentService(PaymentServiceBase):
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Literal
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.schemas.schedule_booking import ScheduleBooking
+
+
+def _normalize_weekdays(value: list[int]) -> list[int]:
+    days = sorted(set(value))
+    if not days:
+        raise ValueError("weekdays must not be empty")
+    if days[0] < 0 or days[-1] > 6:
+        raise ValueError("weekdays must be between 0 (Monday) and 6 (Sunday)")
+    return days
+
+
+class ScheduleTemplate(BaseModel):
+    """Шаблон повторяющегося занятия.
+
+    `weekdays` — дни недели, 0 — понедельник … 6 — воскресенье.
+    """
+
+    id: str = Field(..., description="Уникальный идентификатор шаблона")
+    category: str = Field(..., example="Pilates Reformer")
+    service_name: str | None = None
+    weekdays: list[int] = Field(..., description="Дни недели: 0 — понедельник … 6 — воскресенье", example=[0, 2, 4])
+    start_time: str = Field(..., description="Время начала в формате HH:MM", example="09:00")
+    trainer_id: str | None = None
+    trainer_name: str | None = None
+    max_capacity: int = Field(..., example=4)
+    notes: str | None = None
+    capsule_id: str | None = None
+    capsule_name: str | None = None
+    valid_from: str = Field(..., description="Первый день действия шаблона (YYYY-MM-DD)")
+    valid_until: str | None = Field(None, description="Последний день действия шаблона (YYYY-MM-DD); null — бессрочно")
+    is_active: bool = True
+
+
+class ScheduleTemplateCreate(BaseModel):
+    """Схема для создания шаблона.
+
+    **Пример:** Reformer по понедельникам, средам и пятницам в 09:00, 4 места.
+    ```json
+    {
+      "category": "Pilates Reformer",
+      "weekdays": [0, 2, 4],
+      "start_time": "09:00",
+      "trainer_id": "1cefeb98-9f2e-44fd-9566-8c1363212b4b",
+      "trainer_name": "Анастасия П.",
+      "max_capacity": 4,
+      "valid_from": "2025-12-15"
+    }
+    ```
+    """
+
+    category: str = Field(..., min_length=1, max_length=128)
+    service_name: str | None = None
+    weekdays: list[int] = Field(..., description="Дни недели: 0 — понедельник … 6 — воскресенье")
+    start_time: str = Field(..., pattern=r"^([01]\d|2[0-3]):[0-5]\d$", description="Время начала в формате HH:MM")
+    trainer_id: str | None = None
+    trainer_name: str | None = None
+    max_capacity: int = Field(1, ge=1)
+    notes: str | None = None
+    capsule_id: str | None = None
+    capsule_name: str | None = None
+    valid_from: date
+    valid_until: date | None = None
+    is_active: bool = True
+
+    @field_validator("weekdays")
+    @classmethod
+    def _weekdays(cls, value: list[int]) -> list[int]:
+        return _normalize_weekdays(value)
+
+
+class ScheduleTemplateUpdate(BaseModel):
+    """Схема для обновления шаблона. Уже созданные слоты не меняются."""
+
+    category: str | None = Field(None, min_length=1, max_length=128)
+    service_name: str | None = None
+    weekdays: list[int] | None = None
+    start_time: str | None = Field(None, pattern=r"^([01]\d|2[0-3]):[0-5]\d$")
+    trainer_id: str | None = None
+    trainer_name: str | None = None
+    max_capacity: int | None = Field(None, ge=1)
+    notes: str | None = None
+    capsule_id: str | None = None
+    capsule_name: str | None = None
+    valid_from: date | None = None
+    valid_until: date | None = None
+    is_active: bool | None = None
+
+    @field_validator("weekdays")
+    @classmethod
+    def _weekdays(cls, value: list[int] | None) -> list[int] | None:
+        return None if value is None else _normalize_weekdays(value)
+
+
+class ScheduleMaterializeRequest(BaseModel):
+    """Период, на который нужно создать слоты по шаблонам (включительно)."""
+
+    start_date: date = Field(..., example="2025-12-15")
+    end_date: date = Field(..., example="2026-01-11")
+    template_ids: list[str] | None = Field(
+        None, description="Какие шаблоны разворачивать; по умолчанию — все активные"
+    )
+    dry_run: bool = Field(False, description="Только посчитать слоты и конфликты, ничего не создавая")
+
+
+class ScheduleMaterializeConflict(BaseModel):
+    """Слот шаблона, который не был создан."""
+
+    template_id: str
+    booking_date: str
+    booking_time: str
+    reason: Literal["exists", "trainer_busy", "capsule_busy"] = Field(
+        ...,
+        description=(
+            "exists — слот этого шаблона на эту дату уже создан; "
+            "trainer_busy / capsule_busy — тренер или капсула уже заняты в это время"
+        ),
+    )
+    booking_id: str | None = Field(None, description="Слот, с которым случился конфликт")
+
+
+class ScheduleMaterializeResult(BaseModel):
+    created_count: int = Field(0, description="Сколько слотов создано (при dry_run — было бы создано)")
+    created: list[ScheduleBooking] = Field(default_factory=list, description="Созданные слоты; пусто при dry_run")
+    conflicts: list[ScheduleMaterializeConflict] = Field(default_factory=list)
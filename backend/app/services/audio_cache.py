@@ -0,0 +1,180 @@
+"""Дисковый кэш синтезированной речи (ElevenLabs).
+
+Файлы адресуются хэшем всех параметров синтеза (голос, модель, настройки,
+формат, текст), поэтому одинаковые запросы отдаются с диска без обращения к
+апстриму. Размер кэша ограничен: при превышении удаляются давно не читанные
+файлы (LRU по mtime, который обновляется при каждом попадании).
+
+Все методы работают с диском синхронно: из async-кода их вызывают через
+asyncio.to_thread, вытеснение — фоновой задачей после ответа.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from app.core.config import get_settings
+
+
+class AudioCache:
+    SUFFIX = ".mp3"
+    # Временный файл (.part, .pin) старше этого (секунды) остался от упавшего процесса
+    STALE_TEMP_AGE = 3600
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._remove_stale_temp_files()
+        self._size = sum(path.stat().st_size for path in self._files())
+        self._size_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(**params: Any) -> str:
+        encoded = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Path | None:
+        path = self._path(key)
+        try:
+            # Обновляем mtime: файл становится «свежим» для LRU-вытеснения
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def pin(self, key: str) -> Path | None:
+        """Жёсткая ссылка на файл кэша для одного ответа; None — промах.
+
+        Вытеснение может удалить файл в любой момент, а ссылка держит его
+        содержимое, пока ответ не отправлен. После ответа ссылку удаляет
+        unpin(). OSError, кроме FileNotFoundError, — ФС без жёстких ссылок.
+        """
+        path = self.get(key)
+        if path is None:
+            return None
+        pinned = path.with_name(f".{key}.{uuid.uuid4().hex}.pin")
+        try:
+            os.link(path, pinned)
+        except FileNotFoundError:
+            return None
+        return pinned
+
+    @staticmethod
+    def unpin(pinned: Path) -> None:
+        pinned.unlink(missing_ok=True)
+
+    def open(self, key: str) -> BinaryIO | None:
+        """Открыть файл из кэша; None — промах. Запасной вариант для ФС без жёстких ссылок."""
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            return None
+
+    def open_writer(self, key: str) -> "AudioCacheWriter":
+        return AudioCacheWriter(self, key)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{self.SUFFIX}"
+
+    def _files(self) -> list[Path]:
+        return list(self.directory.glob(f"*/*{self.SUFFIX}"))
+
+    def evict_if_needed(self) -> None:
+        """Вытеснить старые файлы, если кэш превысил лимит.
+
+        Сканирует весь каталог, поэтому вызывается вне event loop (фоновой
+        задачей ответа), а не при записи файла.
+        """
+        if self._size <= self.max_bytes:
+            return
+        # Вытеснение уже идёт в другом потоке — оно освободит место и за нас
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            self._evict()
+        finally:
+            self._evict_lock.release()
+
+    def _remove_stale_temp_files(self) -> None:
+        # Свежие временные файлы могут принадлежать другому воркеру прямо сейчас — их не трогаем
+        cutoff = time.time() - self.STALE_TEMP_AGE
+        for pattern in ("*/.*.part", "*/.*.pin"):
+            for path in self.directory.glob(pattern):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except FileNotFoundError:
+                    continue
+
+    def _commit(self, temp_path: Path, key: str) -> None:
+        path = self._path(key)
+        size = temp_path.stat().st_size
+        # rename атомарен: читатели видят либо старый файл, либо полный новый
+        os.replace(temp_path, path)
+        with self._size_lock:
+            self._size += size
+
+    def _evict(self) -> None:
+        files = []
+        for path in self._files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        size = sum(size for _, size, _ in files)
+
+        # Освобождаем с запасом до 90% лимита, чтобы не чистить на каждой записи
+        target = int(self.max_bytes * 0.9)
+        for _, file_size, path in sorted(files):
+            if size <= target:
+                break
+            path.unlink(missing_ok=True)
+            size -= file_size
+        with self._size_lock:
+            self._size = size
+
+
+class AudioCacheWriter:
+    """Запись файла в кэш по частям; в кэш попадает только полностью записанный файл.
+
+    Конструктор и методы блокируют на диске — из async-кода через asyncio.to_thread.
+    """
+
+    def __init__(self, cache: AudioCache, key: str):
+        self.cache = cache
+        self.key = key
+        target = cache._path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        self._temp_path = target.with_name(f".{key}.{uuid.uuid4().hex}.part")
+        self._file = open(self._temp_path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    def commit(self) -> None:
+        self._file.close()
+        self.cache._commit(self._temp_path, self.key)
+
+    def discard(self) -> None:
+        self._file.close()
+        self._temp_path.unlink(missing_ok=True)
+
+
+@lru_cache
+def get_audio_cache() -> AudioCache:
+    settings = get_settings()
+    return AudioCache(Path(settings.tts_cache_dir), settings.tts_cache_max_bytes)
@@ -0,0 +1,236 @@
+"""In-process индекс для поиска клиентов по мере ввода (type-ahead).
+
+Индекс держит в памяти только ключи поиска: имя в casefold (в том числе
+кириллица), цифры телефона и инстаграм без «@». Имена и телефоны разложены
+в триграммные списки, ники — в отсортированный список для поиска по префиксу.
+Семантика совпадения та же, что у `ClientRepository._filter_mock_clients`:
+подстрока имени, подстрока цифр телефона, префикс ника.
+
+Индекс строится при старте приложения, обновляется хуками
+`ClientRepository.create_client`/`update_client` и периодически целиком
+сверяется с базой. Пока индекс не построен, поиск идёт через SQL.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextlib
+import heapq
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models.client import Client as ClientModel
+
+logger = logging.getLogger(__name__)
+
+NGRAM = 3
+
+
+@dataclass(frozen=True, slots=True)
+class ClientSearchEntry:
+    public_id: str
+    name: str
+    phone_digits: str
+    handle: str
+    direction: str
+    status: str
+
+    @classmethod
+    def build(
+        cls,
+        public_id: str,
+        name: str,
+        phone: str | None,
+        instagram: str | None,
+        direction: str,
+        status: str,
+    ) -> ClientSearchEntry:
+        return cls(
+            public_id=public_id,
+            name=name.casefold(),
+            phone_digits="".join(filter(str.isdigit, phone or "")),
+            handle=(instagram or "").casefold().lstrip("@"),
+            direction=direction,
+            status=status,
+        )
+
+
+def _ngrams(value: str) -> set[str]:
+    return {value[i : i + NGRAM] for i in range(len(value) - NGRAM + 1)}
+
+
+class _IndexData:
+    """Структуры одного поколения индекса; заменяются целиком при сверке."""
+
+    def __init__(self) -> None:
+        self.entries: dict[str, ClientSearchEntry] = {}
+        self.name_grams: dict[str, set[str]] = {}
+        self.phone_grams: dict[str, set[str]] = {}
+        # (ник, public_id), отсортировано — префикс ищется через bisect
+        self.handles: list[tuple[str, str]] = []
+
+    def upsert(self, entry: ClientSearchEntry) -> None:
+        self.remove(entry.public_id)
+        self.entries[entry.public_id] = entry
+        for gram in _ngrams(entry.name):
+            self.name_grams.setdefault(gram, set()).add(entry.public_id)
+        for gram in _ngrams(entry.phone_digits):
+            self.phone_grams.setdefault(gram, set()).add(entry.public_id)
+        if entry.handle:
+            bisect.insort(self.handles, (entry.handle, entry.public_id))
+
+    def remove(self, public_id: str) -> None:
+        entry = self.entries.pop(public_id, None)
+        if entry is None:
+            return
+        for grams, value in ((self.name_grams, entry.name), (self.phone_grams, entry.phone_digits)):
+            for gram in _ngrams(value):
+                ids = grams.get(gram)
+                if ids is not None:
+                    ids.discard(public_id)
+                    if not ids:
+                        del grams[gram]
+        if entry.handle:
+            position = bisect.bisect_left(self.handles, (entry.handle, public_id))
+            if position < len(self.handles) and self.handles[position] == (entry.handle, public_id):
+                del self.handles[position]
+
+    def substring_candidates(self, grams: dict[str, set[str]], needle: str) -> Iterable[str]:
+        if len(needle) < NGRAM:
+            # Короткий запрос не раскладывается на триграммы — проверяем всех
+            return self.entries.keys()
+        postings = sorted((grams.get(gram, set()) for gram in _ngrams(needle)), key=len)
+        return set.intersection(*postings) if postings else set()
+
+    def prefix_matches(self, prefix: str) -> list[str]:
+        # Все ники с префиксом лежат подряд: от bisect(prefix) до bisect(prefix + max_char)
+        start = bisect.bisect_left(self.handles, (prefix,))
+        end = bisect.bisect_left(self.handles, (prefix + "\U0010ffff",), lo=start)
+        return [public_id for _, public_id in self.handles[start:end]]
+
+
+class ClientSearchIndex:
+    def __init__(self, reconcile_interval: float):
+        self.reconcile_interval = reconcile_interval
+        self._data: _IndexData | None = None
+        # Изменения, пришедшие во время перестроения; применяются к новому поколению
+        self._pending: list[ClientSearchEntry] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._data is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self._data = None
+        self._pending = None
+
+    def upsert(self, entry: ClientSearchEntry) -> None:
+        """Хук репозитория: клиент создан или изменён (после commit)."""
+        if self._task is None:
+            return
+        if self._pending is not None:
+            self._pending.append(entry)
+        if self._data is not None:
+            self._data.upsert(entry)
+
+    def search(
+        self,
+        query: str,
+        direction: str | None = None,
+        status: str | None = None,
+        limit: int | None = None,
+    ) -> list[str]:
+        """public_id подходящих клиентов по релевантности (как `_apply_ranking` в SQL)."""
+        data = self._data
+        if data is None:
+            raise RuntimeError("Client search index is not ready")
+
+        q = query.strip().casefold()
+        digits = "".join(filter(str.isdigit, q))
+        handle = q.lstrip("@")
+
+        # public_id -> ранг, меньше — выше в выдаче
+        ranks: dict[str, int] = {}
+        if digits:
+            for public_id in data.substring_candidates(data.phone_grams, digits):
+                phone = data.entries[public_id].phone_digits
+                if digits in phone:
+                    if len(digits) < 3:
+                        ranks[public_id] = 4
+                    else:
+                        ranks[public_id] = 0 if phone == digits else 1 if phone.startswith(digits) else 2
+        for public_id in data.substring_candidates(data.name_grams, q):
+            name = data.entries[public_id].name
+            if q in name:
+                rank = 3 if name.startswith(q) else 4
+                ranks[public_id] = min(rank, ranks.get(public_id, rank))
+        if handle:
+            for public_id in data.prefix_matches(handle):
+                ranks[public_id] = min(3, ranks.get(public_id, 3))
+
+        keys = []
+        for public_id, rank in ranks.items():
+            entry = data.entries[public_id]
+            if (direction and entry.direction != direction) or (status and entry.status != status):
+                continue
+            keys.append((rank, entry.name, public_id))
+        # Для type-ahead нужна только первая страница — полная сортировка не нужна
+        keys = heapq.nsmallest(limit, keys) if limit is not None else sorted(keys)
+        return [public_id for _, _, public_id in keys]
+
+    async def rebuild(self) -> None:
+        """Перечитать ключи поиска всех клиентов и заменить индекс целиком."""
+        self._pending = []
+        try:
+            data = _IndexData()
+            async with SessionLocal() as session:
+                rows = await session.execute(
+                    select(
+                        ClientModel.public_id,
+                        ClientModel.name,
+                        ClientModel.phone,
+                        ClientModel.instagram,
+                        ClientModel.direction,
+                        ClientModel.status,
+                    )
+                )
+                for row in rows:
+                    data.upsert(ClientSearchEntry.build(*row))
+            # Изменения, закоммиченные во время чтения, могли не попасть в выборку
+            for entry in self._pending:
+                data.upsert(entry)
+            self._data = data
+        finally:
+            self._pending = None
+        logger.info("Client search index rebuilt: %s clients", len(data.entries))
+
+    async def _reconcile_loop(self) -> None:
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                # Остаёмся на прошлом поколении индекса (или на SQL, если его нет)
+                logger.warning("Client search index rebuild failed: %s", e)
+            await asyncio.sleep(self.reconcile_interval)
+
+
+@lru_cache
+def get_client_search_index() -> ClientSearchIndex:
+    return ClientSearchIndex(reconcile_interval=get_settings().client_search_index_reconcile_interval)
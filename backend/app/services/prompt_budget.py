@@ -0,0 +1,103 @@
+"""Бюджет промпта AI-ассистента.
+
+Задержка и цена ответа Timeweb/OpenAI растут с числом токенов в запросе,
+а клиент присылает всю историю диалога. Здесь промпт оценивается в токенах
+и укладывается в бюджет: свежие сообщения остаются как есть, более старые
+сворачиваются в одну строку памяти, данные CRM идут компактным JSON.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import math
+import re
+from collections.abc import Callable
+from functools import lru_cache
+
+# Точный подсчёт — если установлен tiktoken (pip install tiktoken), иначе оценка по словам
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+
+# Служебные токены роли и разметки одного сообщения в chat-формате
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]|\n+")
+
+
+@lru_cache
+def _encoding():
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Словарь не скачался (нет сети) — работаем на оценке
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Число токенов в тексте: tiktoken или оценка с запасом.
+
+    Оценка: латиница — ~4 символа на токен, кириллица и прочее — ~3,
+    каждый знак препинания, эмодзи и перевод строки — отдельный токен.
+    """
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    tokens = 0
+    for word in _WORD_RE.findall(text):
+        tokens += math.ceil(len(word) / (4 if word.isascii() else 3))
+    return tokens
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+
+def compact_json(data: object) -> str:
+    """JSON без отступов и пробелов после разделителей."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def clean_history(history: list[dict] | None) -> list[dict]:
+    """Только role/content реплик пользователя и ассистента — остальные поля клиента в промпт не идут."""
+    return [
+        {"role": message["role"], "content": str(message.get("content", ""))}
+        for message in history or []
+        if isinstance(message, dict) and message.get("role") in ("user", "assistant")
+    ]
+
+
+def fit_history(
+    system_prompt: str,
+    history: list[dict],
+    user_message: str,
+    budget: int,
+    summarize: Callable[[list[dict]], str | None],
+) -> tuple[str, list[dict]]:
+    """Уложить системный промпт, историю и запрос в `budget` токенов.
+
+    Оставляет самые свежие сообщения истории; не поместившиеся сворачиваются
+    через `summarize` в строку памяти, которая дописывается к системному
+    промпту. Возвращает системный промпт и оставшуюся историю.
+    """
+    base = estimate_tokens(system_prompt) + estimate_tokens(user_message) + 2 * MESSAGE_OVERHEAD_TOKENS
+    kept = list(history)
+    used = base + sum(message_tokens(message) for message in kept)
+    dropped: list[dict] = []
+    memory = None
+    while kept:
+        memory = summarize(dropped) if dropped else None
+        if used + (estimate_tokens(memory) if memory else 0) <= budget:
+            break
+        message = kept.pop(0)
+        dropped.append(message)
+        used -= message_tokens(message)
+    else:
+        memory = summarize(dropped) if dropped else None
+
+    if memory:
+        system_prompt = f"{system_prompt}\n\n{memory}"
+    return system_prompt, kept
@@ -1,9 +1,28 @@
 """Сервис для работы с Timeweb Cloud AI API."""
 
+import json
+from collections.abc import AsyncIterator
+
 import httpx
 from typing import Optional
 
 from app.core.config import get_settings
+from app.core.http import http_clients
+
+
+async def iter_completion_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    """Разобрать SSE-поток OpenAI-совместимого chat/completions и вернуть фрагменты текста."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            break
+        chunk = json.loads(payload)
+        for choice in chunk.get("choices") or []:
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
 
 
 class TimewebAIService:
@@ -39,46 +58,28 @@ class TimewebAIService:
         if not self.is_configured():
             raise ValueError("Timeweb AI не настроен. Проверьте TIMEWEB_API_TOKEN и TIMEWEB_AGENT_ACCESS_ID")
         
-        # Формируем сообщения для API
-        messages = []
-        
-        # Добавляем системный промпт, если есть
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        
-        # Добавляем историю разговора
-        if conversation_history:
-            messages.extend(conversation_history)
-        
-        # Добавляем текущее сообщение пользователя
-        messages.append({"role": "user", "content": message})
-        
-        # URL для OpenAI-совместимого endpoint
-        url = f"{self.BASE_URL}/api/v1/cloud-ai/agents/{self.agent_access_id}/v1/chat/completions"
+        messages = self._build_messages(message, conversation_history, system_prompt)
         
         try:
-            async with httpx.AsyncClient(timeout=40.0) as client:
-                response = await client.post(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_token}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": "gpt-4",  # Модель игнорируется, но нужна для совместимости
-                        "messages": messages,
-                    },
-                )
-                
-                response.raise_for_status()
-                data = response.json()
+            client = http_clients.get("timeweb")
+            response = await client.post(
+                self._completions_url(),
+                headers=self._headers(),
+                json={
+                    "model": "gpt-4",  # Модель игнорируется, но нужна для совместимости
+                    "messages": messages,
+                },
+            )
+            
+            response.raise_for_status()
+            data = response.json()
+            
+            # Извлекаем ответ агента
+            if data.get("choices") and len(data["choices"]) > 0:
+                return data["choices"][0]["message"]["content"].strip()
+            else:
+                raise ValueError("Пустой ответ от Timeweb AI")
                 
-                # Извлекаем ответ агента
-                if data.get("choices") and len(data["choices"]) > 0:
-                    return data["choices"][0]["message"]["content"].strip()
-                else:
-                    raise ValueError("Пустой ответ от Timeweb AI")
-                    
         except httpx.HTTPStatusError as e:
             error_text = e.response.text if e.response else str(e)
             raise Exception(f"Ошибка Timeweb AI API: {e.response.status_code} - {error_text}")
@@ -87,6 +88,41 @@ class TimewebAIService:
         except Exception as e:
             raise Exception(f"Ошибка при обращении к Timeweb AI: {str(e)}")
     
+    async def stream_agent(
+        self,
+        message: str,
+        conversation_history: Optional[list[dict]] = None,
+        system_prompt: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Вызвать AI агента в потоковом режиме (`stream: true`).
+        
+        Фрагменты ответа отдаются по мере поступления от Timeweb. Если вызывающий
+        код прекращает итерацию (например, клиент отключился), соединение
+        с апстримом закрывается при выходе из `client.stream`.
+        
+        Raises:
+            httpx.HTTPStatusError, httpx.TimeoutException: ошибки апстрима
+        """
+        if not self.is_configured():
+            raise ValueError("Timeweb AI не настроен. Проверьте TIMEWEB_API_TOKEN и TIMEWEB_AGENT_ACCESS_ID")
+        
+        client = http_clients.get("timeweb")
+        async with client.stream(
+            "POST",
+            self._completions_url(),
+            headers=self._headers(),
+            json={
+                "model": "gpt-4",  # Модель игнорируется, но нужна для совместимости
+                "messages": self._build_messages(message, conversation_history, system_prompt),
+                "stream": True,
+            },
+        ) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for delta in iter_completion_deltas(response):
+                yield delta
+    
     async def call_agent_simple(
         self,
         message: str,
@@ -102,4 +138,28 @@ class TimewebAIService:
             Ответ агента
         """
         return await self.call_agent(message, conversation_history=None, system_prompt=system_prompt)
-
+    
+    def _completions_url(self) -> str:
+        # URL для OpenAI-совместимого endpoint
+        return f"{self.BASE_URL}/api/v1/cloud-ai/agents/{self.agent_access_id}/v1/chat/completions"
+    
+    def _headers(self) -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json",
+        }
+    
+    @staticmethod
+    def _build_messages(
+        message: str,
+        conversation_history: Optional[list[dict]],
+        system_prompt: Optional[str],
+    ) -> list[dict]:
+        """Сформировать сообщения для API: системный промпт, история, запрос пользователя."""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        if conversation_history:
+            messages.extend(conversation_history)
+        messages.append({"role": "user", "content": message})
+        return messages
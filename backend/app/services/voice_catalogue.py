@@ -0,0 +1,161 @@
+"""Каталог голосов ElevenLabs в памяти с фоновым обновлением.
+
+Список голосов загружается один раз и обновляется в фоне раз в
+`VOICE_CATALOGUE_REFRESH_INTERVAL` секунд. Если ElevenLabs недоступен или
+отвечает медленно, отдаётся последний успешно загруженный каталог.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from app.core.config import get_settings
+from app.core.http import http_clients
+
+logger = logging.getLogger(__name__)
+
+VOICES_URL = "https://api.elevenlabs.io/v1/voices"
+
+# Голоса с такими именами считаем подходящими, даже если акцент не указан
+RUSSIAN_FRIENDLY_NAMES = ["calm", "soft", "professional", "friendly"]
+
+
+def is_female(voice: dict) -> bool:
+    return (voice.get("labels") or {}).get("gender", "").lower() == "female"
+
+
+def is_russian(voice: dict) -> bool:
+    # Проверяем, есть ли русский язык в поддерживаемых языках
+    language = (voice.get("labels") or {}).get("accent", "").lower()
+    return "russian" in language or "ru" in language
+
+
+def short_voice(voice: dict) -> dict:
+    return {
+        "voice_id": voice.get("voice_id"),
+        "name": voice.get("name"),
+        "description": voice.get("description"),
+        "labels": voice.get("labels") or {},
+    }
+
+
+@dataclass
+class VoiceCatalogueSnapshot:
+    voices: list[dict]
+    # Короткий хэш содержимого — основа ETag
+    version: str
+    fetched_at: float
+    russian_female_voices: list[dict] = field(init=False)
+    recommended: dict | None = field(init=False)
+    _rendered: dict[tuple, bytes] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.russian_female_voices = [
+            short_voice(voice)
+            for voice in self.voices
+            if is_female(voice)
+            and (is_russian(voice) or voice.get("name", "").lower() in RUSSIAN_FRIENDLY_NAMES)
+        ]
+        self.recommended = self.russian_female_voices[0] if self.russian_female_voices else None
+
+    def etag(self, russian: bool | None, female: bool | None, recommended: bool) -> str:
+        flags = "".join({None: "x", True: "1", False: "0"}[value] for value in (russian, female, recommended))
+        return f'W/"{self.version}-{flags}"'
+
+    def render(self, russian: bool | None, female: bool | None, recommended: bool) -> bytes:
+        """JSON ответа для набора фильтров; сериализуется один раз на снимок."""
+        key = (russian, female, recommended)
+        body = self._rendered.get(key)
+        if body is None:
+            voices = self.voices
+            if recommended:
+                voices = [self.recommended] if self.recommended else []
+            else:
+                if russian is not None:
+                    voices = [voice for voice in voices if is_russian(voice) == russian]
+                if female is not None:
+                    voices = [voice for voice in voices if is_female(voice) == female]
+            body = json.dumps(
+                {
+                    "all_voices": voices,
+                    "russian_female_voices": self.russian_female_voices,
+                    "recommended": self.recommended,
+                },
+                ensure_ascii=False,
+            ).encode("utf-8")
+            self._rendered[key] = body
+        return body
+
+
+class VoiceCatalogue:
+    def __init__(self, refresh_interval: float, timeout: float):
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self._snapshot: VoiceCatalogueSnapshot | None = None
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def get(self) -> VoiceCatalogueSnapshot:
+        """Текущий каталог; при первом обращении загружает его.
+
+        Raises:
+            httpx.HTTPError: каталог ещё ни разу не загружался и ElevenLabs недоступен
+        """
+        if self._snapshot is not None:
+            return self._snapshot
+        async with self._lock:
+            # Пока ждали блокировку, каталог мог загрузить другой запрос
+            if self._snapshot is None:
+                await self.refresh()
+        return self._snapshot
+
+    async def refresh(self) -> None:
+        settings = get_settings()
+        response = await http_clients.get("elevenlabs").get(
+            VOICES_URL,
+            headers={"xi-api-key": settings.elevenlabs_api_key},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        voices = response.json().get("voices", [])
+        version = hashlib.sha256(response.content).hexdigest()[:16]
+        if self._snapshot is None or self._snapshot.version != version:
+            self._snapshot = VoiceCatalogueSnapshot(voices=voices, version=version, fetched_at=time.time())
+        else:
+            self._snapshot.fetched_at = time.time()
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Оставляем последний известный каталог
+                logger.warning("Voice catalogue refresh failed: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+
+@lru_cache
+def get_voice_catalogue() -> VoiceCatalogue:
+    settings = get_settings()
+    return VoiceCatalogue(
+        refresh_interval=settings.voice_catalogue_refresh_interval,
+        timeout=settings.voice_catalogue_timeout,
+    )
@@ -0,0 +1,147 @@
+"""
+Benchmark BodyScheduleRepository group analytics: legacy per-category queries vs. one grouped query.
+
+Seeds synthetic schedule bookings inside a transaction that is rolled back at the end,
+so the database is left untouched.
+
+Usage:
+    python -m scripts.benchmark_groups_analytics
+    python -m scripts.benchmark_groups_analytics --rows 100000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import Float, String, and_, case, cast, distinct, event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import SessionLocal, engine
+from app.models.schedule_booking import ScheduleBooking as ScheduleBookingModel
+from app.repositories.body_schedule import BodyScheduleRepository
+
+
+SEED_SQL = text("""
+    INSERT INTO schedule_bookings (
+        public_id, booking_date, booking_time, category, service_name,
+        trainer_name, max_capacity, current_count, status, capsule_name
+    )
+    SELECT
+        gen_random_uuid()::text,
+        :start_date + (n % 90),
+        make_time(7 + (n % 14), (n % 2) * 30, 0),
+        (ARRAY['Body Mind', 'Pilates Reformer', 'Коворкинг', 'Eywa Kids'])[1 + n % 4],
+        'Бенчмарк',
+        'Тренер ' || (n % 12),
+        1 + n % 10,
+        n % 5,
+        (ARRAY['Бронь', 'Оплачено', 'Свободно'])[1 + n % 3]::booking_status_enum,
+        'Зал ' || (n % 3)
+    FROM generate_series(1, :rows) AS n
+""")
+
+
+async def legacy_groups_analytics(session: AsyncSession, start_date: date, end_date: date) -> None:
+    """Прежняя реализация: пять запросов на каждую из двух категорий."""
+    for category in ("Body Mind", "Pilates Reformer"):
+        period = and_(
+            ScheduleBookingModel.booking_date >= start_date,
+            ScheduleBookingModel.booking_date <= end_date,
+            ScheduleBookingModel.category == category,
+        )
+        await session.execute(
+            select(
+                func.count(
+                    distinct(
+                        func.concat(
+                            cast(ScheduleBookingModel.booking_date, String),
+                            "-",
+                            cast(ScheduleBookingModel.booking_time, String),
+                        )
+                    )
+                )
+            ).where(period)
+        )
+        await session.execute(select(func.sum(ScheduleBookingModel.current_count)).where(period))
+        await session.execute(
+            select(
+                func.count(ScheduleBookingModel.id),
+                func.count(
+                    case((ScheduleBookingModel.status.in_(["Бронь", "Оплачено"]), 1), else_=None)
+                ),
+            ).where(period)
+        )
+        await session.execute(
+            select(
+                func.avg(
+                    cast(ScheduleBookingModel.current_count, Float)
+                    / cast(ScheduleBookingModel.max_capacity, Float)
+                    * 100
+                )
+            ).where(period, ScheduleBookingModel.max_capacity > 0)
+        )
+        await session.execute(
+            select(distinct(ScheduleBookingModel.trainer_name)).where(
+                period, ScheduleBookingModel.trainer_name.isnot(None)
+            )
+        )
+
+
+async def measure(label: str, run, repeat: int, counter: list[int]) -> None:
+    await run()  # прогрев
+    counter[0] = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await run()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+    print(f"{label:<10} queries/call={counter[0] // repeat:<3} avg={elapsed_ms:.2f} ms")
+
+
+async def benchmark(rows: int, repeat: int) -> None:
+    counter = [0]
+
+    def count_query(*_args, **_kwargs) -> None:
+        counter[0] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+
+    start_date = date.today() - timedelta(days=45)
+    end_date = start_date + timedelta(days=90)
+
+    async with SessionLocal() as session:
+        try:
+            await session.execute(SEED_SQL, {"start_date": start_date, "rows": rows})
+            await session.execute(text("ANALYZE schedule_bookings"))
+            print(f"Seeded {rows} bookings ({start_date} .. {end_date})")
+
+            repo = BodyScheduleRepository(session)
+            await measure(
+                "legacy",
+                lambda: legacy_groups_analytics(session, start_date, end_date),
+                repeat,
+                counter,
+            )
+            await measure(
+                "grouped",
+                lambda: repo.get_groups(start_date, end_date),
+                repeat,
+                counter,
+            )
+        finally:
+            await session.rollback()
+            event.remove(engine.sync_engine, "before_cursor_execute", count_query)
+
+    await engine.dispose()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк аналитики групп BODY")
+    parser.add_argument("--rows", type=int, default=100_000, help="Сколько записей сгенерировать")
+    parser.add_argument("--repeat", type=int, default=20, help="Сколько раз повторить каждый вариант")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(benchmark(args.rows, args.repeat))
@@ -0,0 +1,191 @@
+"""
+Query-plan regression check for schedule_bookings.
+
+Seeds a large synthetic schedule inside a transaction that is rolled back at the end,
+runs the repository queries against it, captures every SELECT they issue and EXPLAINs
+it. The check fails (exit code 1) if any plan reads schedule_bookings or
+schedule_booking_clients with a sequential scan.
+
+Usage:
+    python -m scripts.check_query_plans
+    python -m scripts.check_query_plans --rows 500000 --verbose
+"""
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+from datetime import date, time, timedelta
+from typing import Any
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import SessionLocal, engine
+from app.repositories.body_schedule import BodyScheduleRepository
+from app.repositories.schedule_booking import ScheduleBookingRepository
+
+
+# Таблицы, которые не должны читаться последовательным сканированием
+WATCHED_TABLES = {"schedule_bookings", "schedule_booking_clients"}
+
+SEED_BOOKINGS_SQL = text("""
+    INSERT INTO schedule_bookings (
+        public_id, booking_date, booking_time, category, service_name,
+        trainer_id, trainer_name, max_capacity, current_count, status, capsule_name
+    )
+    SELECT
+        gen_random_uuid()::text,
+        :start_date + (n % 365),
+        make_time(7 + (n % 14), (n % 2) * 30, 0),
+        (ARRAY['Body Mind', 'Pilates Reformer', 'Коворкинг', 'Eywa Kids', 'Массаж', 'Йога'])[1 + n % 6],
+        'План запросов',
+        CASE WHEN n % 4 = 0 THEN NULL ELSE 'plan-trainer-' || (n % 12) END,
+        CASE WHEN n % 4 = 0 THEN NULL ELSE 'Тренер ' || (n % 12) END,
+        1 + n % 10,
+        n % 5,
+        (CASE WHEN n % 10 = 0 THEN 'Свободно' WHEN n % 2 = 0 THEN 'Оплачено' ELSE 'Бронь' END)::booking_status_enum,
+        'Зал ' || (n % 3)
+    FROM generate_series(1, :rows) AS n
+""")
+
+SEED_CLIENTS_SQL = text("""
+    INSERT INTO schedule_booking_clients (booking_id, client_id, client_name)
+    SELECT b.id, 'plan-client-' || ((b.id + k) % :clients), 'Клиент плана'
+    FROM schedule_bookings b
+    CROSS JOIN LATERAL generate_series(1, b.current_count) AS k
+    WHERE b.service_name = 'План запросов'
+    ON CONFLICT DO NOTHING
+""")
+
+
+class StatementRecorder:
+    """Запоминает SELECT-запросы, отправленные в базу, пока включён."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.statements: list[tuple[str, Any]] = []
+
+    def __call__(self, _conn, _cursor, statement, parameters, _context, _executemany) -> None:
+        if self.enabled and statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+
+def walk(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def describe(node: dict) -> str:
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    if "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    return label
+
+
+async def explain(session: AsyncSession, statement: str, parameters: Any) -> dict:
+    connection = await session.connection()
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+    return result.scalar_one()[0]["Plan"]
+
+
+async def check(
+    session: AsyncSession,
+    recorder: StatementRecorder,
+    label: str,
+    run: Callable[[], Awaitable[Any]],
+    verbose: bool,
+) -> bool:
+    recorder.statements.clear()
+    recorder.enabled = True
+    try:
+        await run()
+    finally:
+        recorder.enabled = False
+    statements = list(recorder.statements)
+
+    passed = True
+    for statement, parameters in statements:
+        plan = await explain(session, statement, parameters)
+        scans = [node for node in walk(plan) if "Relation Name" in node]
+        seq_scans = [
+            node["Relation Name"]
+            for node in scans
+            if node["Node Type"] == "Seq Scan" and node["Relation Name"] in WATCHED_TABLES
+        ]
+        passed = passed and not seq_scans
+        print(f"{'OK  ' if not seq_scans else 'FAIL'} {label}: {', '.join(map(describe, scans)) or '-'}")
+        if verbose or seq_scans:
+            print(f"     {' '.join(statement.split())}")
+    if not statements:
+        print(f"FAIL {label}: no queries captured")
+        return False
+    return passed
+
+
+async def run_checks(rows: int, clients: int, verbose: bool) -> bool:
+    recorder = StatementRecorder()
+    event.listen(engine.sync_engine, "before_cursor_execute", recorder)
+
+    start_date = date.today() - timedelta(days=180)
+    week_start = date.today() - timedelta(days=date.today().weekday())
+    week_end = week_start + timedelta(days=6)
+
+    async with SessionLocal() as session:
+        try:
+            await session.execute(SEED_BOOKINGS_SQL, {"start_date": start_date, "rows": rows})
+            await session.execute(SEED_CLIENTS_SQL, {"clients": clients})
+            await session.execute(text("ANALYZE schedule_bookings"))
+            await session.execute(text("ANALYZE schedule_booking_clients"))
+            print(f"Seeded {rows} bookings ({start_date} .. {start_date + timedelta(days=364)})")
+
+            body = BodyScheduleRepository(session)
+            bookings = ScheduleBookingRepository(session)
+            grid_fields = {"id", "booking_date", "booking_time", "category", "current_count", "max_capacity"}
+            first_page = await bookings.list_bookings(start_date=week_start, end_date=week_end, limit=200)
+
+            checks = {
+                "body groups analytics": lambda: body.get_groups(week_start, week_end),
+                "body coaches load": lambda: body._get_coaches_load(week_start, week_end),
+                "schedule grid (week)": lambda: bookings.list_bookings(
+                    start_date=week_start, end_date=week_end, limit=200, fields=grid_fields
+                ),
+                "schedule grid (next page)": lambda: bookings.list_bookings(
+                    start_date=week_start, end_date=week_end, limit=200, cursor=first_page.next_cursor
+                ),
+                "schedule by category": lambda: bookings.list_bookings(
+                    start_date=week_start, end_date=week_end, category="Pilates Reformer", limit=200
+                ),
+                "trainer schedule": lambda: bookings.list_bookings(trainer_id="plan-trainer-3", limit=50),
+                "free slots": lambda: bookings.list_bookings(
+                    start_date=week_start, end_date=week_end, status="Свободно", limit=50
+                ),
+                "client history": lambda: bookings.list_bookings(client_id="plan-client-7", limit=50),
+                "slot by date and time": lambda: bookings.get_by_date_and_time(
+                    week_start, time(9, 0), category="Body Mind"
+                ),
+            }
+            results = [
+                await check(session, recorder, label, run, verbose) for label, run in checks.items()
+            ]
+            return all(results)
+        finally:
+            await session.rollback()
+            event.remove(engine.sync_engine, "before_cursor_execute", recorder)
+            await engine.dispose()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Проверка планов запросов к расписанию")
+    parser.add_argument("--rows", type=int, default=200_000, help="Сколько записей сгенерировать")
+    parser.add_argument("--clients", type=int, default=20_000, help="Сколько разных клиентов записывать на слоты")
+    parser.add_argument("--verbose", action="store_true", help="Печатать текст каждого запроса")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not asyncio.run(run_checks(args.rows, args.clients, args.verbose)):
+        raise SystemExit(1)
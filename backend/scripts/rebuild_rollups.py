@@ -0,0 +1,32 @@
+"""
+Rebuild daily rollup tables (payments, clients, schedule bookings).
+
+Usage:
+    python -m scripts.rebuild_rollups
+    python -m scripts.rebuild_rollups --start 2025-12-01 --end 2025-12-31
+"""
+
+import argparse
+import asyncio
+from datetime import date
+
+from app.db.session import SessionLocal
+from app.repositories.rollups import RollupRepository
+
+
+async def rebuild(start_date: date | None, end_date: date | None) -> None:
+    async with SessionLocal() as session:
+        await RollupRepository(session).rebuild(start_date, end_date)
+        await session.commit()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Пересчитать дневные агрегаты")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="Первый день (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Последний день (YYYY-MM-DD)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(rebuild(args.start, args.end))
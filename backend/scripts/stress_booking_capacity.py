@@ -0,0 +1,123 @@
+"""
+Stress test for atomic seat reservation in ScheduleBookingRepository.add_client.
+
+Creates one slot with a small max_capacity and fires hundreds of simultaneous
+reservations at it, each from its own session and connection. The test fails
+(exit code 1) if the slot ends up overbooked, or if current_count differs from
+the number of attendee rows or from the number of successful reservations.
+The slot is deleted at the end.
+
+Usage:
+    python -m scripts.stress_booking_capacity
+    python -m scripts.stress_booking_capacity --capacity 1 --requests 500 --connections 50
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+from datetime import date
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import get_settings
+from app.models.schedule_booking import ScheduleBooking as ScheduleBookingModel, ScheduleBookingClient
+from app.repositories.schedule_booking import ScheduleBookingRepository
+from app.schemas.schedule_booking import ClientInfo, ScheduleBookingCreate
+
+
+async def reserve(sessions: async_sessionmaker[AsyncSession], booking_id: str, n: int) -> str:
+    async with sessions() as session:
+        client = ClientInfo(client_id=f"stress-{n}", client_name=f"Стресс {n}")
+        try:
+            await ScheduleBookingRepository(session).add_client(booking_id, client)
+        except HTTPException as e:
+            if e.status_code == 409 and e.detail.get("code") == "capacity_exceeded":
+                return "conflict"
+            raise
+        return "reserved"
+
+
+async def stress(capacity: int, requests: int, connections: int) -> bool:
+    engine = create_async_engine(
+        str(get_settings().database_url),
+        pool_size=connections,
+        max_overflow=0,
+        pool_timeout=120,
+    )
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with sessions() as session:
+        booking = await ScheduleBookingRepository(session).create_booking(
+            ScheduleBookingCreate(
+                booking_date=date.today().isoformat(),
+                booking_time="06:00",
+                category="Pilates Reformer",
+                service_name=f"Стресс-тест {uuid4().hex[:8]}",
+                max_capacity=capacity,
+            )
+        )
+    print(f"Slot {booking.id}: capacity={capacity}, requests={requests}, connections={connections}")
+
+    try:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(reserve(sessions, booking.id, n) for n in range(requests)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+
+        outcomes = Counter(result if isinstance(result, str) else type(result).__name__ for result in results)
+        for result in results:
+            if isinstance(result, BaseException):
+                print(f"Unexpected error: {result!r}")
+                break
+
+        async with sessions() as session:
+            booking_pk, current_count, max_capacity = (
+                await session.execute(
+                    select(
+                        ScheduleBookingModel.id,
+                        ScheduleBookingModel.current_count,
+                        ScheduleBookingModel.max_capacity,
+                    ).where(ScheduleBookingModel.public_id == booking.id)
+                )
+            ).one()
+            attendees = await session.scalar(
+                select(func.count()).where(ScheduleBookingClient.booking_id == booking_pk)
+            )
+
+        print(f"Done in {elapsed:.2f} s: {dict(outcomes)}")
+        print(f"current_count={current_count} attendees={attendees} max_capacity={max_capacity}")
+
+        checks = {
+            "no overbooking": current_count <= max_capacity,
+            "slot filled": current_count == min(capacity, requests),
+            "current_count matches attendee rows": current_count == attendees,
+            "current_count matches successful reservations": current_count == outcomes["reserved"],
+            "no unexpected errors": sum(outcomes.values()) == outcomes["reserved"] + outcomes["conflict"],
+        }
+        for name, passed in checks.items():
+            print(f"{'OK  ' if passed else 'FAIL'} {name}")
+        return all(checks.values())
+    finally:
+        async with sessions() as session:
+            await ScheduleBookingRepository(session).delete_booking(booking.id)
+        await engine.dispose()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Стресс-тест резервирования мест в слоте")
+    parser.add_argument("--capacity", type=int, default=1, help="Вместимость слота")
+    parser.add_argument("--requests", type=int, default=300, help="Сколько одновременных записей отправить")
+    parser.add_argument("--connections", type=int, default=30, help="Размер пула соединений")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not asyncio.run(stress(args.capacity, args.requests, args.connections)):
+        raise SystemExit(1)